@@ -1,21 +1,36 @@
 import os # Para interagir com o sistema operacional (variáveis de ambiente, caminhos de arquivo)
-import re # Para operações com expressões regulares (usado para extrair JSON da resposta da IA)
-import json # Para manipulação de objetos JSON (usado para codificar/decodificar a resposta da IA)
 import time # Para adicionar pausas no processamento (ajuda a evitar limites de taxa da API)
 import tkinter as tk # Biblioteca padrão para a criação da interface gráfica (GUI)
-from tkinter import filedialog, messagebox, ttk # Componentes da GUI (diálogo de arquivo, caixas de mensagem, widgets temáticos)
+from tkinter import filedialog, messagebox, simpledialog, ttk # Componentes da GUI (diálogo de arquivo, caixas de mensagem, widgets temáticos)
 import threading # Para executar o processo principal em segundo plano (evita que a GUI trave)
-import PyPDF2 # Biblioteca para ler e extrair texto de arquivos PDF
+from contextlib import nullcontext # Bloco vazio quando o perfilamento está desligado
+from concurrent.futures import ThreadPoolExecutor # Para criar Forms em paralelo quando há várias contas Google
 
 # Adicionado tratamento para não depender de pandas no ambiente de produção do forms
 # import pandas as pd # Comentado, pois não é necessário (a manipulação de dados é feita com listas e dicionários)
 
-from google import genai # O SDK principal do Google GenAI para interagir com o modelo Gemini
 from google.genai.errors import APIError # Para capturar erros específicos da API Gemini
 from google_auth_oauthlib.flow import InstalledAppFlow # Para o fluxo de autenticação OAuth 2.0 (necessário para a Google Forms API)
 from googleapiclient.discovery import build # Para construir o objeto de serviço para interagir com a Google Forms API
 from googleapiclient.errors import HttpError # Para capturar erros de requisições HTTP da Google Forms API (ex: erro de permissão)
 
+from gemini_client import get_gemini_client # Cliente Gemini assíncrono compartilhado (reuso de conexão, concorrência e retry)
+import agendador_gemini # Cotas por minuto do Gemini (padrões do nível gratuito, ajustáveis por variável de ambiente)
+from cache_contexto import get_context_cache # Cache de contexto do Gemini para o documento reenviado nas continuações
+from banco_questoes import BancoQuestoes, BANCO_FILE, fingerprint_questao, hash_trecho # Banco SQLite de questões (evita reprocessar duplicatas)
+from deduplicacao import remover_quase_duplicadas, formatar_relatorio, salvar_relatorio # Quase duplicadas (MinHash/LSH)
+from ui_bridge import UIBridge # Fila de eventos thread-safe entre as threads de trabalho e a GUI
+from cancelamento import CancelToken, Cancelled, DeadlineExceeded, RequestTimeout, run_cancellable # Cancelamento e prazos por etapa
+from pdf_backends import choose_backend # Backends de extração de texto (PyPDF2, pypdfium2, pdfminer)
+from contas_google import PoolContas, custo_formulario # Pool de contas (cotas da Forms API)
+from plano_forms import salvar_plano, reproduzir_plano # Plano offline dos Forms e reprodução com retomada
+from lotes_forms import enviar_lote, formatar_rejeitadas, progresso_parcial # Validação e bisseção de lotes recusados
+from reprocessamento import preparar_segmentos, processar_segmentos # Reprocessamento incremental por páginas
+from core import Question, as_question, build_forms # Modelo de questão e requisições do Forms
+from perfilamento import etapa, perfilar, propagar # Perfilamento por amostragem, separado por etapa do pipeline
+from envio_pdf import extrair_questoes_do_pdf # Envio direto do PDF ao Gemini (sem extração local)
+from continuacao import completar_resposta, extrair_json, lista_de_questoes, prompt_de_continuacao # Respostas truncadas
+
 # ==============================================================================
 # 🔑 CONFIGURAÇÕES ESSENCIAIS
 # ==============================================================================
@@ -25,11 +40,80 @@ from googleapiclient.errors import HttpError # Para capturar erros de requisiç
 GEMINI_API_KEY = "chave" 
 
 # 2. LIMITE DE TEXTO 
+PDF_BACKEND = 'auto' # Backend de extração do PDF: 'auto' (benchmark), 'pypdfium2', 'pdfminer' ou 'pypdf2'
 TEXT_LIMIT = 60000 # Limite de caracteres do texto do PDF enviado para a IA (para evitar exceder o limite do modelo)
 MAX_QUESTIONS_PER_FORM = 30 # Máximo de questões que o script colocará em um único formulário do Google (limite da API ou preferência)
 SCOPES = ['https://www.googleapis.com/auth/forms.body', 'https://www.googleapis.com/auth/forms.body.readonly'] 
 # Escopos de permissão necessários para criar, ler e modificar o corpo de um Google Form
 CREDENTIALS_FILE = 'chave.json' # Nome do arquivo de credenciais JSON do Google Cloud (para Forms API)
+CONTAS_FILE = 'contas.json' # Pool de contas Google (veja contas_google.py); se não existir, usa só o CREDENTIALS_FILE
+
+# 3. BANCO DE QUESTÕES
+# Questões já presentes no banco (mesmo enunciado + alternativas) não são enviadas de novo ao Forms
+SKIP_KNOWN_TEXT = True # Se True, um PDF cujo texto já foi enviado ao Gemini não é reenviado
+# Similaridade mínima (0 a 1) para mesclar questões quase duplicadas com a mesma resposta correta.
+# Desativado (None) por padrão: um limiar baixo pode mesclar questões diferentes; se ativar, use 0.9 ou mais
+NEAR_DUP_THRESHOLD = None
+
+# 4. PRAZOS POR ETAPA (segundos; None = sem prazo)
+STAGE_TIMEOUTS = {
+    'extracao': 120, # Leitura do PDF
+    'gemini': 600, # Chamada à API Gemini (inclui retries)
+    'forms': 1800, # Criação de todos os Forms
+    'reproducao': None, # Reprodução de um plano (pode ser longa; o progresso é retomável)
+}
+FORMS_REQUEST_TIMEOUT = 60 # Prazo de cada chamada execute() da Forms API
+
+# 5. HEDGING DA CHAMADA AO GEMINI
+# Se True, uma cópia da requisição é disparada quando ela passa do percentil das latências
+# recentes (veja hedging.py); a que terminar primeiro vale e a outra é cancelada.
+GEMINI_HEDGING = False
+
+# 6. PLANO OFFLINE DOS FORMS
+# Se True, o pipeline grava as requisições dos Forms em <pdf>_plano.jsonl em vez de criá-los.
+# O plano é executado depois pelo botão "Reproduzir Plano" (ex.: fora do horário de pico).
+FORMS_PLAN_ONLY = False
+
+# 7. CACHE DE CONTEXTO DO GEMINI
+# Se True, quando a resposta vem truncada, as instruções e o texto do PDF ficam num cache de contexto
+# do Gemini e cada pedido de continuação envia só o próprio pedido (veja cache_contexto.py); o cache
+# é apagado ao fim. Documentos abaixo do mínimo de tokens da API são reenviados normalmente.
+GEMINI_CONTEXT_CACHE = True
+
+# 8. REPROCESSAMENTO INCREMENTAL POR PÁGINAS
+# Se True, o PDF é enviado ao Gemini em trechos de páginas e as questões de cada trecho ficam
+# no banco: numa versão revisada do PDF, só as páginas alteradas são extraídas e reenviadas
+# (veja reprocessamento.py). Deixe False para PDFs com gabarito separado das questões (ex.: no
+# final), que precisam do texto inteiro numa única chamada.
+INCREMENTAL_PAGES = False
+
+# 9. COTAS DO GEMINI (por minuto; None desativa o limite)
+# As chamadas esperam numa fila até caber nos limites do seu nível de uso da API, em vez de
+# esbarrar no erro 429; vários PDFs processados ao mesmo tempo dividem a cota (veja agendador_gemini.py).
+# Os padrões (10 RPM, 250.000 TPM) são os do nível GRATUITO do gemini-2.5-flash. Em nível pago, defina
+# as variáveis de ambiente GEMINI_RPM e GEMINI_TPM com os limites do seu projeto ('none' desativa)
+# ou troque os valores abaixo.
+GEMINI_RPM = agendador_gemini.GEMINI_RPM # Requisições por minuto
+GEMINI_TPM = agendador_gemini.GEMINI_TPM # Tokens por minuto (entrada + saída estimada)
+
+# 10. PERFILAMENTO
+# Estado inicial da opção "Perfilar execução". Com ela marcada, cada etapa do pipeline é amostrada
+# e o perfil é gravado ao lado do PDF (<pdf>_perfil.folded para flame graph e <pdf>_perfil.json),
+# do plano reproduzido (<plano>_perfil.*) ou do banco, na criação a partir dele.
+PROFILE_RUNS = False
+
+# 11. ENVIO DIRETO DO PDF AO GEMINI
+# Se True, o PDF vai como arquivo para o modelo (em partes de PDF_PAGES_PER_REQUEST páginas), sem
+# extração local de texto: preserva o layout (colunas, tabelas), mas cada página custa um número
+# fixo de tokens (veja envio_pdf.py). Compare os dois modos no seu tipo de simulado com benchmark_envio.py.
+GEMINI_PDF_INPUT = False
+PDF_PAGES_PER_REQUEST = 10
+
+# 12. LAYOUT DOS FORMS
+# 'partes': um Forms (e um link) para cada MAX_QUESTIONS_PER_FORM questões.
+# 'unico': um só Forms com todas as questões e uma quebra de página a cada MAX_QUESTIONS_PER_FORM;
+# cada parte a menos economiza um create, um updateSettings e os lotes parciais (veja core.build_forms).
+FORMS_LAYOUT = 'partes'
 
 # Define a chave de API para a variável de ambiente (boa prática)
 # O SDK do Gemini geralmente busca a chave aqui se ela não for passada explicitamente
@@ -40,37 +124,53 @@ os.environ['GEMINI_API_KEY'] = GEMINI_API_KEY
 # ⚙️ FUNÇÕES AUXILIARES
 # ==============================================================================
 
-def limpar_texto(texto):
-    """
-    Remove quebras de linha e espaços desnecessários de uma string.
-    É essencial para limpar o texto extraído do PDF e garantir que as 
-    alternativas corretas correspondam exatamente às opções.
-    """
-    if not isinstance(texto, str):
-        texto = str(texto)
-    return texto.replace('\r', ' ').replace('\n', ' ').strip()
-
 # --- FUNÇÕES DA API GEMINI (Extração e Parsing) ---
 
-def extract_text_from_pdf(pdf_path, progress_callback=None):
+# O prompt detalhado é crucial para garantir que o modelo retorne um JSON estrito
+# no formato desejado para fácil parsing posterior. Esta parte é fixa (igual para
+# todo PDF); só o texto do PDF muda a cada chamada.
+EXTRACTION_INSTRUCTIONS = (
+    "Analise o conteúdo extraído do simulado LPIC a seguir. "
+    "Seu objetivo é extrair todas as perguntas, todas as alternativas apresentadas, "
+    "e indicar a alternativa correta. O output DEVE ser um JSON estritamente válido "
+    "que possa ser decodificado diretamente em uma lista (Array). "
+    "Use o formato de lista de objetos JSON:\n"
+    "[\n"
+    "   {\n"
+    "     \"numero\": 1, // número da pergunta (inteiro)\n"
+    "     \"enunciado\": \"texto da pergunta\",\n"
+    "     \"alternativas\": [\"opção A\", \"opção B\", \"opção C\", \"opção D\"],\n"
+    "     \"correta\": \"o texto exato da alternativa correta\"\n"
+    "   },\n"
+    "   // ... outras perguntas\n"
+    "]\n\n"
+)
+
+@etapa('extracao')
+def extract_text_from_pdf(pdf_path, progress_callback=None, cancel_token=None, backend=None):
     """
-    Extrai texto de um arquivo PDF usando PyPDF2.
+    Extrai texto de um arquivo PDF usando o backend configurado (veja pdf_backends.py).
     
     Args:
         pdf_path (str): Caminho para o arquivo PDF.
         progress_callback (function): Função para atualizar o progresso na GUI.
+        cancel_token (CancelToken): Verificado entre as páginas (opcional).
+        backend (str): Backend deste job; usa PDF_BACKEND se None ('auto' escolhe por benchmark).
         
     Returns:
         str: O texto completo extraído do PDF.
     """
     text = ""
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            num_pages = len(reader.pages)
-
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
+        # No modo 'auto', um micro-benchmark escolhe o backend mais rápido com texto de qualidade
+        pdf_backend = choose_backend(pdf_path, backend or PDF_BACKEND)
+        with pdf_backend.open(pdf_path) as doc:
+            num_pages = doc.num_pages
+
+            for i in range(num_pages):
+                if cancel_token:
+                    cancel_token.check() # Interrompe entre páginas se cancelado ou fora do prazo
+                page_text = doc.page_text(i)
                 if page_text:
                     # Adiciona uma quebra de linha entre as páginas para separação lógica
                     text += page_text + "\n"
@@ -82,18 +182,24 @@ def extract_text_from_pdf(pdf_path, progress_callback=None):
 
         return text.strip()
 
+    except Cancelled:
+        raise
     except Exception as e:
         # Lança uma exceção para ser capturada na função principal
         raise Exception(f"Erro ao ler PDF: {e}")
 
 
-def send_to_gemini(pdf_text, progress_callback=None):
+@etapa('gemini')
+def send_to_gemini(pdf_text, progress_callback=None, cancel_token=None, job=None, client=None):
     """
     Envia o texto do PDF para a API Gemini, solicitando uma resposta JSON estruturada.
     
     Args:
         pdf_text (str): O texto extraído do PDF.
         progress_callback (function): Função para atualizar o progresso na GUI.
+        cancel_token (CancelToken): Permite abandonar a chamada em andamento (opcional).
+        job (str): Identifica o trabalho (ex.: nome do PDF) na divisão das cotas do Gemini (opcional).
+        client (GeminiClient): Cliente usado na chamada; padrão: o compartilhado pelo processo.
         
     Returns:
         str: O texto da resposta da IA (deve conter o JSON).
@@ -102,11 +208,9 @@ def send_to_gemini(pdf_text, progress_callback=None):
     if GEMINI_API_KEY == "SUA_CHAVE_AQUI" or not GEMINI_API_KEY:
         raise Exception("Chave da API Gemini ausente. Por favor, insira sua chave em GEMINI_API_KEY.")
 
-    try:
-        # Inicializa o cliente da API. O SDK usará a variável de ambiente GEMINI_API_KEY
-        client = genai.Client() 
-    except Exception:
-        raise Exception("Erro ao inicializar o cliente Gemini. Verifique a chave de API.")
+    # Cliente compartilhado pelo processo: as conexões são reaproveitadas entre chamadas.
+    # O SDK usará a variável de ambiente GEMINI_API_KEY
+    client = client or get_gemini_client(hedging=GEMINI_HEDGING, rpm=GEMINI_RPM, tpm=GEMINI_TPM)
 
     # Limita o texto enviado ao valor de TEXT_LIMIT (60000)
     text_to_send = pdf_text[:TEXT_LIMIT]
@@ -114,36 +218,29 @@ def send_to_gemini(pdf_text, progress_callback=None):
     if progress_callback:
         progress_callback(15, "2/5 - Preparando envio para IA...")
 
-    # O prompt detalhado é crucial para garantir que o modelo retorne um JSON estrito
-    # no formato desejado para fácil parsing posterior.
-    full_prompt = (
-        "Analise o conteúdo extraído do simulado LPIC a seguir. "
-        "Seu objetivo é extrair todas as perguntas, todas as alternativas apresentadas, "
-        "e indicar a alternativa correta. O output DEVE ser um JSON estritamente válido "
-        "que possa ser decodificado diretamente em uma lista (Array). "
-        "Use o formato de lista de objetos JSON:\n"
-        "[\n"
-        "   {\n"
-        "     \"numero\": 1, // número da pergunta (inteiro)\n"
-        "     \"enunciado\": \"texto da pergunta\",\n"
-        "     \"alternativas\": [\"opção A\", \"opção B\", \"opção C\", \"opção D\"],\n"
-        "     \"correta\": \"o texto exato da alternativa correta\"\n"
-        "   },\n"
-        "   // ... outras perguntas\n"
-        "]\n\n"
-        f"CONTEÚDO DO PDF (Primeiros {len(text_to_send)} caracteres):\n\n{text_to_send}"
-    )
+    # Parte variável do prompt: o texto do PDF (as instruções fixas estão em EXTRACTION_INSTRUCTIONS)
+    document_prompt = f"CONTEÚDO DO PDF (Primeiros {len(text_to_send)} caracteres):\n\n{text_to_send}"
 
     try:
         if progress_callback:
             progress_callback(30, "2/5 - Processando na Gemini API (aguarde)...")
 
-        # Chama a API para geração de conteúdo
-        response = client.models.generate_content(
-            model="gemini-2.5-flash", # Modelo rápido e eficiente para tarefas de extração estruturada
-            contents=full_prompt,
-            config={"temperature": 0.1} # Temperatura baixa para respostas determinísticas (JSON estruturado)
-        )
+        def gerar(prompt_documento):
+            # Chama a API para geração de conteúdo (assíncrona por baixo, com timeout e retry)
+            return client.generate_content_sync(
+                model="gemini-2.5-flash", # Modelo rápido e eficiente para tarefas de extração estruturada
+                contents=EXTRACTION_INSTRUCTIONS + prompt_documento,
+                config={"temperature": 0.1}, # Temperatura baixa para respostas determinísticas (JSON estruturado)
+                cancel_token=cancel_token, # Cancelar interrompe a espera e a requisição
+                job=job # Divisão justa das cotas (RPM/TPM) entre PDFs processados ao mesmo tempo
+            )
+
+        response = gerar(document_prompt)
+
+        fila = client.queue_stats()
+        if fila.get('fila') or fila.get('espera_max', 0) >= 1:
+            print(f"ℹ️ Cotas do Gemini: {fila['fila']} chamada(s) na fila, espera média {fila['espera_media']:.1f}s "
+                  f"(p95 {fila['espera_p95']:.1f}s), {fila['tokens_janela']} tokens no último minuto.")
 
         if progress_callback:
             progress_callback(45, "2/5 - Resposta recebida da IA...")
@@ -151,95 +248,98 @@ def send_to_gemini(pdf_text, progress_callback=None):
         if not response.text:
             raise Exception("A resposta da API Gemini está vazia.")
 
-        return response.text.strip()
+        def continuar(ultimo):
+            if GEMINI_CONTEXT_CACHE:
+                # O documento se repete em cada continuação: instruções + PDF vão pelo cache de contexto
+                return get_context_cache(client).generate(
+                    EXTRACTION_INSTRUCTIONS + document_prompt, prompt_de_continuacao(ultimo),
+                    model="gemini-2.5-flash",
+                    config={"temperature": 0.1},
+                    cancel_token=cancel_token,
+                    job=job
+                )
+            return gerar(document_prompt + prompt_de_continuacao(ultimo))
+
+        # Se a saída foi cortada pelo limite de tokens, pede só as questões que faltaram
+        try:
+            return completar_resposta(response, continuar, progress_callback)
+        finally:
+            if GEMINI_CONTEXT_CACHE:
+                get_context_cache(client).descartar("gemini-2.5-flash", EXTRACTION_INSTRUCTIONS + document_prompt)
 
     except APIError as e:
         # Tratamento específico para erros comuns da API
         if "maximum size for a single request" in str(e):
             raise Exception("Erro: O PDF é muito grande. Tente reduzir o limite de caracteres ou usar um modelo maior.")
         raise Exception(f"Erro na API Gemini: {e}")
+    except TimeoutError as e:
+        raise Exception(f"Erro na API Gemini: {e}")
     except Exception as e:
         raise e
 
 
+@etapa('parsing')
 def parse_gemini_response_to_list(gemini_output, progress_callback=None):
     """
     Processa a saída JSON (que pode estar envolvida em markdown) da IA 
-    e retorna uma lista de dicionários de perguntas no formato final para o Forms.
+    e retorna a lista de questões no formato final para o Forms.
     
     Args:
         gemini_output (str): A string de resposta do modelo Gemini.
         progress_callback (function): Função para atualizar o progresso na GUI.
         
     Returns:
-        list: Lista de dicionários, onde cada dicionário é uma questão com 
-              chaves como 'Número', 'Enunciado', 'Correta', 'A', 'B', etc.
+        list: Lista de `Question` (core.py). Cada uma também aceita o acesso antigo
+              por chaves como 'Número', 'Enunciado', 'Correta', 'A', 'B', etc.
     """
 
     if progress_callback:
         progress_callback(50, "3/5 - Processando resposta da IA...")
 
-    # Tenta extrair o JSON envolto em ```json ... ``` (markdown)
-    json_match = re.search(r"```json\s*(\{.*?\}|\[.*?\])\s*```", gemini_output, re.DOTALL)
-    # Se falhar, tenta encontrar qualquer bloco que se pareça com JSON ({...} ou [...])
-    if not json_match:
-        json_match = re.search(r"(\{.*?\}|\[.*?\])", gemini_output, re.DOTALL)
-    if not json_match:
-        raise ValueError("Não foi possível encontrar um JSON válido na resposta da IA.")
+    # Decodifica o JSON (envolto ou não em ```json ... ```); de uma lista truncada, ficam os itens completos
+    data, completo = extrair_json(gemini_output)
+    if not completo:
+        if not data:
+            raise ValueError("Erro ao decodificar JSON: a resposta da IA está incompleta.")
+        print(f"⚠️ JSON da IA incompleto: usando as {len(data)} questões completas.")
 
-    try:
-        json_content = json_match.group(1).strip()
-
-        # Decodifica o JSON para um objeto Python
-        if json_content.startswith('{'):
-            data = json.loads(json_content)
-            # Trata o caso em que o modelo retorna um dicionário com uma chave 'perguntas': [...]
-            if isinstance(data, dict) and any(isinstance(v, list) for v in data.values()):
-                data = next((v for v in data.values() if isinstance(v, list)), [data])
-            elif isinstance(data, dict):
-                # Se for um único objeto de pergunta
-                data = [data]
-        else:
-            # Caso mais comum: o JSON é uma lista diretamente
-            data = json.loads(json_content)
-
-        if not isinstance(data, list):
-            raise TypeError("O JSON decodificado não é uma lista de perguntas válida.")
-            
-        # Converter a lista de objetos do Gemini para o formato de dicionário final
-        # (com as opções A, B, C como chaves)
-        processed_questions = []
-        for item in data:
-            alts = item.get("alternativas", [])
-            q = {
-                "Número": item.get("numero", ""),
-                "Enunciado": item.get("enunciado", "").strip(),
-                "Correta": item.get("correta", "").strip(),
-            }
-            # Adicionar alternativas usando letras como chaves (A, B, C, ...)
-            for i in range(len(alts)):
-                q[chr(65 + i)] = limpar_texto(alts[i]) # 65 é o código ASCII para 'A'
-            processed_questions.append(q)
-
-        return processed_questions
-
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Erro ao decodificar JSON: {e}")
+    # Trata o caso em que o modelo retorna um dicionário com uma chave 'perguntas': [...] ou uma única pergunta
+    data = lista_de_questoes(data)
+
+    # Converter a lista de objetos do Gemini para o modelo compartilhado de questão
+    # (alternativas limpas e gabarito calculados uma única vez)
+    return [Question.from_gemini(item) for item in data]
 
 
 # --- FUNÇÕES DA API GOOGLE FORMS ---
 
-def autenticar_google(progress_callback):
+def autenticar_google(progress_callback, error_callback=None):
     """
     Autentica o usuário com o Google usando o fluxo OAuth 2.0.
     Cria as credenciais e o objeto de serviço para interagir com a Forms API.
+    Se CONTAS_FILE existir, autentica todas as contas do pool (tokens salvos são reaproveitados).
     
+    Args:
+        progress_callback (function): Função para atualizar o progresso na GUI.
+        error_callback (function): Exibe um erro (título, mensagem); padrão: messagebox.showerror.
+        
     Returns:
-        googleapiclient.discovery.Resource or None: O objeto de serviço da Forms API.
+        Resource, PoolContas or None: O objeto de serviço da Forms API (ou o pool de contas).
     """
+    error_callback = error_callback or messagebox.showerror
     progress_callback(55, "4/5 - Autenticando com o Google...")
+    if os.path.exists(CONTAS_FILE):
+        try:
+            contas = PoolContas.carregar(CONTAS_FILE).conectar(
+                SCOPES, lambda texto: progress_callback(57, f"4/5 - {texto}")
+            )
+            progress_callback(60, f"4/5 - {len(contas)} conta(s) autenticada(s). Conectando à API...")
+            return contas
+        except Exception as e:
+            error_callback("Erro de Autenticação", f"Falha ao autenticar as contas de '{CONTAS_FILE}': {e}")
+            return None
     if not os.path.exists(CREDENTIALS_FILE):
-        messagebox.showerror(
+        error_callback(
             "Erro de Credenciais",
             f"Arquivo '{CREDENTIALS_FILE}' não encontrado.\nBaixe suas credenciais JSON da Google Cloud Console."
         )
@@ -252,191 +352,303 @@ def autenticar_google(progress_callback):
         # Constrói o objeto de serviço para a Forms API v1
         return build('forms', 'v1', credentials=creds)
     except Exception as e:
-        messagebox.showerror("Erro de Autenticação", f"Falha ao autenticar: {e}")
+        error_callback("Erro de Autenticação", f"Falha ao autenticar: {e}")
         return None
 
-def get_answer_key(question_row):
+@etapa('deduplicacao')
+def preparar_questoes(questions_list, near_dup_threshold=NEAR_DUP_THRESHOLD, relatorio_path=None):
     """
-    Determina o tipo de questão (RADIO para única escolha, CHECKBOX para múltipla) 
-    e extrai o(s) texto(s) da(s) resposta(s) correta(s).
-    
-    A lógica tenta deduzir se a questão é de múltipla escolha com base no 
-    enunciado (ex: "quais") ou na presença de múltiplos separadores no campo 'Correta'.
-    
+    Converte as questões para `Question` e mescla as quase duplicadas (MinHash/LSH).
+
     Args:
-        question_row (dict): Dicionário de uma única questão.
-        
+        questions_list (list): Lista de `Question` (ou dicts no formato antigo).
+        near_dup_threshold (float): Similaridade mínima para mesclar quase duplicadas (None desativa).
+        relatorio_path (str): Se informado, salva em JSON o relatório dos grupos mesclados.
+
     Returns:
-        tuple: (list de textos corretos, str com o tipo: 'RADIO' ou 'CHECKBOX').
+        list: As questões que seguem para os Forms.
     """
-    correct_text = limpar_texto(question_row.get('Correta', ''))
-    if not correct_text:
-        # Se não houver resposta correta (erro na extração da IA), assume RADIO
-        return None, 'RADIO'
-
-    # Lógica para determinar CHECKBOX
-    separators = [';', ' e ', ',']
-    # Verifica se a resposta correta contém múltiplos separadores
-    is_checkbox = any(sep in correct_text.lower() for sep in separators) and correct_text.count(' ') > 1
-    
-    # Se for de múltipla escolha (dedução)
-    if is_checkbox or limpar_texto(question_row.get('Enunciado', '')).lower().startswith("quais"):
-        question_type = 'CHECKBOX'
-        correct_values = []
-        # Tenta casar cada opção A, B, C... com partes do texto completo da resposta 'Correta'
-        for col in [chr(65 + i) for i in range(26)]:
-            option_text = limpar_texto(question_row.get(col, ''))
-            # Se a opção (ex: "A") estiver contida no texto da 'Correta'
-            if option_text and option_text in correct_text:
-                correct_values.append(option_text)
-        
-        # Fallback: se não encontrou matches (o que pode acontecer se a IA 
-        # formatar mal a 'Correta'), usa o texto completo como a única resposta correta
-        if not correct_values:
-            correct_values = [correct_text] 
-        return correct_values, question_type
-
-    # Caso padrão: escolha única (RADIO)
-    question_type = 'RADIO'
-    return [correct_text], question_type
+    questions_list = [as_question(q) for q in questions_list] # Aceita também dicts do banco de questões
+
+    # Remove questões quase duplicadas (mesma questão com redação levemente diferente)
+    questions_list, relatorio = remover_quase_duplicadas(questions_list, near_dup_threshold)
+    if relatorio:
+        print(formatar_relatorio(relatorio))
+        if relatorio_path:
+            salvar_relatorio(relatorio, relatorio_path)
+    return questions_list
+
+def planejar_forms_google(form_title, questions_list, plan_path, progress_callback,
+                          near_dup_threshold=NEAR_DUP_THRESHOLD, relatorio_path=None, ao_publicar=None):
+    """
+    Modo de planejamento: grava todas as requisições dos Forms (create e batchUpdate) em
+    um plano JSONL, sem acessar a rede. O plano é executado depois por `reproduzir_plano`.
 
+    Args:
+        form_title (str): Título base do formulário.
+        questions_list (list): Lista de `Question` (ou dicts no formato antigo).
+        plan_path (str): Caminho do arquivo de plano.
+        progress_callback (function): Função para atualizar o progresso na GUI.
+        near_dup_threshold (float): Similaridade mínima para mesclar quase duplicadas (None desativa).
+        relatorio_path (str): Se informado, salva em JSON o relatório dos grupos mesclados.
+        ao_publicar (function): Recebe as questões depois que o plano foi gravado (ex.: `RegistroBanco`).
 
-def criar_forms_google(service, form_title, questions_list, progress_callback):
+    Returns:
+        tuple: (int Forms planejados, int total de questões).
+    """
+    questions_list = preparar_questoes(questions_list, near_dup_threshold, relatorio_path)
+    progress_callback(65, "5/5 - Gravando o plano dos Forms...")
+    with etapa('requisicoes'):
+        forms = salvar_plano(questions_list, form_title, plan_path, MAX_QUESTIONS_PER_FORM, FORMS_LAYOUT)
+    if ao_publicar:
+        ao_publicar(questions_list)
+    progress_callback(100, "5/5 - Plano dos Forms gravado.")
+    return len(forms), len(questions_list)
+
+def criar_forms_google(service, form_title, questions_list, progress_callback,
+                       near_dup_threshold=NEAR_DUP_THRESHOLD, relatorio_path=None, error_callback=None,
+                       cancel_token=None, ao_publicar=None):
     """
     Cria um ou mais Forms do Google, dividindo as questões em lotes de 
-    MAX_QUESTIONS_PER_FORM. Para cada Forms, ativa o modo Quiz e adiciona as questões.
+    MAX_QUESTIONS_PER_FORM (ou, com FORMS_LAYOUT 'unico', um só Forms com uma quebra de
+    página a cada MAX_QUESTIONS_PER_FORM). Para cada Forms, ativa o modo Quiz e adiciona as questões.
+    Antes da divisão, questões quase duplicadas são mescladas (MinHash/LSH).
     
     Args:
-        service (Resource): O objeto de serviço da Google Forms API.
+        service (Resource or PoolContas): O objeto de serviço da Google Forms API ou um pool de
+                                          contas; cada Forms vai inteiro para a conta com mais cota.
         form_title (str): Título base do formulário.
-        questions_list (list): Lista de dicionários de questões extraídas.
+        questions_list (list): Lista de `Question` (ou dicts no formato antigo) extraídas.
         progress_callback (function): Função para atualizar o progresso na GUI.
+        near_dup_threshold (float): Similaridade mínima para mesclar quase duplicadas (None desativa).
+        relatorio_path (str): Se informado, salva em JSON o relatório dos grupos mesclados.
+        error_callback (function): Exibe um erro (título, mensagem); padrão: messagebox.showerror.
+        cancel_token (CancelToken): Verificado entre Forms e entre lotes; cada execute() respeita
+                                    o token e FORMS_REQUEST_TIMEOUT (opcional).
+        ao_publicar (function): Recebe as questões de cada Forms criado com todos os lotes
+                                enviados (ex.: `RegistroBanco`, que as registra no banco).
         
     Returns:
         tuple: (list de links dos Forms criados, int total de questões).
     """
+    error_callback = error_callback or messagebox.showerror
+    questions_list = preparar_questoes(questions_list, near_dup_threshold, relatorio_path)
+
+    # Um objeto de serviço vira um pool de uma conta só; com várias contas, os Forms são distribuídos
+    contas = service if isinstance(service, PoolContas) else PoolContas.de_servico(service)
+
+    # Monta antes as requisições de todos os Forms (o custo de cada um decide a conta)
+    with etapa('requisicoes'):
+        partes = build_forms(questions_list, form_title, MAX_QUESTIONS_PER_FORM, layout=FORMS_LAYOUT)
+    num_forms = len(partes)
+    total_requests_all = sum(len(batch['requests']) for parte in partes for batch in parte['batches'][1:])
 
-    # Calcula quantos Forms serão necessários
-    num_forms = (len(questions_list) + MAX_QUESTIONS_PER_FORM - 1) // MAX_QUESTIONS_PER_FORM
-    all_form_links = []
-    
     # Define a faixa de progresso para esta etapa (65% a 100%)
     PROGRESS_RANGE_START = 65
     PROGRESS_RANGE_END = 100
     TOTAL_PROGRESS_POINTS = PROGRESS_RANGE_END - PROGRESS_RANGE_START
-    
-    # Itera sobre os lotes de questões para criar múltiplos Forms
-    for i in range(num_forms):
-        start = i * MAX_QUESTIONS_PER_FORM
-        end = min(len(questions_list), start + MAX_QUESTIONS_PER_FORM)
-        # O FATIAMENTO É FEITO AQUI: Seleciona o lote de questões
-        part_questions = questions_list[start:end] 
-        
-        # Cálculo de progresso para este formulário
-        progress_per_form = TOTAL_PROGRESS_POINTS / num_forms
-        current_form_start_progress = PROGRESS_RANGE_START + (i * progress_per_form)
-        
-        # Título personalizado para cada parte
-        title = f"{form_title} - Parte {i + 1} ({len(part_questions)} Q)"
-        
-        # --- 1. Criar Forms e ativar Quiz ---
-        try:
-            progress_callback(int(current_form_start_progress), f"5/5 - Criando Forms {i + 1}/{num_forms}...")
-            # Cria o formulário com o título
-            form = service.forms().create(body={'info': {'title': limpar_texto(title)}}).execute()
-            form_id = form['formId']
-        except HttpError as e:
-            messagebox.showerror("Erro de Criação", f"Não foi possível criar o Forms: {e}")
-            continue
-
-        # Requisita a atualização para ativar o modo Quiz no Forms
-        service.forms().batchUpdate(
-            formId=form_id,
-            body={'requests': [{'updateSettings': {'settings': {'quizSettings': {'isQuiz': True}}, 'updateMask': 'quizSettings.isQuiz'}}]}
-        ).execute()
-
-        # --- 2. Preparar Requisições Batch ---
-        requests = []
-        index = 0
-        
-        # Itera sobre as questões do lote para montar as requisições de criação
-        for question_row in part_questions: # Usando a lista FATIADA
-            title_text = limpar_texto(f"Q{str(question_row.get('Número', '')).strip()}: {question_row.get('Enunciado', '')}")
-            correct_values, question_type = get_answer_key(question_row)
-
-            options = []
-            option_cols = [col for col in question_row.keys() if len(col) == 1 and 'A' <= col <= 'Z']
-            option_set = set() # Usado para evitar opções duplicadas
-
-            for col in option_cols:
-                option_text = question_row.get(col, '')
-                if not option_text or not str(option_text).strip():
+    progresso = {'questoes': 0} # Questões adicionadas em todos os Forms (compartilhado entre as contas)
+    progresso_lock = threading.Lock()
+
+    @etapa('forms')
+    def criar_parte(i, parte):
+        """Cria um Forms inteiro na conta atribuída pelo escalonador. Retorna o link ou None."""
+        if cancel_token:
+            cancel_token.check()
+        title = parte['title']
+        quiz_batch, item_batches = parte['batches'][0], parte['batches'][1:]
+        with contas.conta_para(custo_formulario(parte), cancel_token) as conta:
+            forms = conta.service.forms()
+
+            # --- 1. Criar Forms e ativar Quiz ---
+            try:
+                progress_callback(
+                    int(PROGRESS_RANGE_START + TOTAL_PROGRESS_POINTS * progresso['questoes'] / max(total_requests_all, 1)),
+                    f"5/5 - Criando Forms {i + 1}/{num_forms} (conta {conta.nome})..."
+                )
+                # Cria o formulário com o título
+                form = run_cancellable(forms.create(body=parte['create']).execute, cancel_token, FORMS_REQUEST_TIMEOUT)
+                form_id = form['formId']
+            except (HttpError, RequestTimeout) as e: # Uma requisição lenta falha só este Forms
+                error_callback("Erro de Criação", f"Não foi possível criar o Forms: {e}")
+                return None
+            contas.registrar_dono(form_id, conta, title) # Guarda qual conta é dona do Forms
+
+            falhas = 0
+            # Requisita a atualização para ativar o modo Quiz no Forms
+            try:
+                run_cancellable(forms.batchUpdate(formId=form_id, body=quiz_batch).execute, cancel_token, FORMS_REQUEST_TIMEOUT)
+            except (HttpError, RequestTimeout) as e:
+                print(f"⚠️ Erro ao ativar o modo Quiz no Forms {i+1}: {e}")
+                falhas += 1
+
+            # --- 2. Enviar as Requisições em Lotes (BATCH_SIZE por chamada; PACKED_BATCH_SIZE no Forms único) e Atualizar Progresso ---
+            def enviar(batch_requests):
+                run_cancellable(
+                    forms.batchUpdate(formId=form_id, body={'requests': batch_requests}).execute,
+                    cancel_token, FORMS_REQUEST_TIMEOUT
+                )
+
+            created_count = 0
+            for j, batch in enumerate(item_batches):
+                if cancel_token:
+                    cancel_token.check() # Interrompe entre lotes se cancelado ou fora do prazo
+                try:
+                    # Itens inválidos não são enviados; se o lote for recusado, ele é dividido
+                    # ao meio até isolar os itens ruins (os bons são criados normalmente)
+                    criadas, rejeitadas = enviar_lote(enviar, batch['requests'], created_count, erros=(HttpError,))
+                    created_count += criadas
+                    if rejeitadas:
+                        print(formatar_rejeitadas(rejeitadas, title))
+
+                    # Progresso calculado sobre as questões de todos os Forms
+                    with progresso_lock:
+                        progresso['questoes'] += len(batch['requests'])
+                        done = progresso['questoes']
+                    current_overall_progress = PROGRESS_RANGE_START + TOTAL_PROGRESS_POINTS * done / total_requests_all
+
+                    progress_callback(int(current_overall_progress), f"5/5 - Criando Forms {i + 1}/{num_forms}: {done}/{total_requests_all} questões...")
+                    time.sleep(0.3) # Pequena pausa para evitar sobrecarga
+                except (HttpError, RequestTimeout) as e:
+                    print(f"⚠️ Erro ao adicionar lote {j+1} ao Forms {i+1}: {e}")
+                    # Itens criados antes da interrupção contam para os índices dos próximos lotes
+                    created_count += progresso_parcial(e)[0]
+                    falhas += 1
                     continue
-                option_text = limpar_texto(option_text)
-                if option_text not in option_set:
-                    options.append({'value': option_text})
-                    option_set.add(option_text)
-
-            if not options: continue
-
-            # Filtra as opções que correspondem ao texto correto
-            answer_key_texts = [opt['value'] for opt in options if correct_values and opt['value'] in correct_values]
-
-            # Objeto de pontuação (Grading)
-            grading = {
-                'pointValue': 1,
-                'correctAnswers': {'answers': [{'value': v} for v in answer_key_texts]}
-            } if answer_key_texts else None # Se não houver resposta correta, não adiciona 'grading'
-
-            # Corpo da questão (Question Body)
-            question_body = {
-                'required': True,
-                'choiceQuestion': {
-                    'type': question_type, # 'RADIO' ou 'CHECKBOX'
-                    'options': options,
-                    'shuffle': True # Misturar a ordem das opções
-                }
-            }
-            if grading: question_body['grading'] = grading
-
-            # Requisição de criação de item
-            requests.append({
-                'createItem': {
-                    'item': {'title': title_text, 'questionItem': {'question': question_body}},
-                    'location': {'index': index}
-                }
-            })
-            index += 1
-        
-        # --- 3. Enviar Requisições em Lotes e Atualizar Progresso ---
-        created_count = 0
-        total_requests = len(requests)
-        # Divide as requisições em lotes de 10 para otimizar a chamada à API (Batch Update)
-        for j in range(0, total_requests, 10):
-            batch = requests[j:j + 10]
+
+            link = f"https://docs.google.com/forms/d/{form_id}/edit"
+            print(f"✅ Formulário '{title}' criado na conta '{conta.nome}' ({created_count} questões). Link: {link}")
+            if ao_publicar and not falhas:
+                # Com lotes perdidos, as questões ficam fora do banco e voltam na próxima execução
+                inicio, fim = parte['intervalo']
+                ao_publicar(questions_list[inicio:fim])
+            return link
+
+    # Com uma conta, os Forms são criados em sequência; com várias, um Forms por conta em paralelo
+    if len(contas) > 1 and num_forms > 1:
+        with ThreadPoolExecutor(max_workers=len(contas), thread_name_prefix="forms-conta") as executor:
+            futures = [executor.submit(propagar(criar_parte), i, parte) for i, parte in enumerate(partes)]
             try:
-                service.forms().batchUpdate(formId=form_id, body={'requests': batch}).execute()
-                created_count += len(batch)
-                
-                # Cálculo de progresso dentro do Form atual
-                progress_in_form = (created_count / total_requests) * progress_per_form
-                current_overall_progress = current_form_start_progress + progress_in_form
-                
-                progress_callback(int(current_overall_progress), f"5/5 - Criando Forms {i + 1}/{num_forms}: {created_count}/{total_requests} questões...")
-                time.sleep(0.3) # Pequena pausa para evitar sobrecarga
-            except HttpError as e:
-                print(f"⚠️ Erro ao adicionar lote {j//10+1} ao Forms {i+1}: {e}")
-                continue
-
-        link = f"https://docs.google.com/forms/d/{form_id}/edit"
-        print(f"✅ Formulário '{title}' criado ({created_count} questões). Link: {link}")
-        all_form_links.append(link)
+                links = [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel() # Não inicia os Forms que ainda estavam na fila
+                raise
+    else:
+        links = [criar_parte(i, parte) for i, parte in enumerate(partes)]
+    all_form_links = [link for link in links if link]
 
     # Última atualização de progresso
     progress_callback(PROGRESS_RANGE_END, "5/5 - Criação de Forms concluída.") 
     return all_form_links, len(questions_list)
 
 
+def extrair_questoes_pdf(pdf_path, banco, progress_callback, token, job=None):
+    """
+    Etapas 1 a 3 do pipeline: extrai o texto do PDF, envia ao Gemini (ou reaproveita o banco),
+    converte a resposta em questões e separa as que já estão no banco. Nada é registrado
+    aqui: as questões só entram no banco depois de publicadas (veja `RegistroBanco`).
+
+    Args:
+        pdf_path (str): Caminho do PDF.
+        banco (BancoQuestoes): Banco de questões (duplicatas exatas são separadas).
+        progress_callback (function): Recebe (valor 0-55, texto).
+        token (CancelToken): Cancelamento e prazos por etapa (STAGE_TIMEOUTS).
+        job (str): Identificação do trabalho nas cotas do Gemini; padrão: nome do arquivo.
+
+    Returns:
+        tuple: (list de `Question` novas, list das duplicadas já presentes no banco,
+                str texto extraído do PDF ou None, para o `RegistroBanco`).
+    """
+    origem = os.path.basename(pdf_path)
+    job = job or origem
+
+    raw_text = None
+    reaproveitadas = False # Questões lidas do banco para este mesmo texto (já publicadas antes)
+    filtro = {} # Exceções do filtro de duplicatas para as versões anteriores do mesmo PDF
+    if GEMINI_PDF_INPUT:
+        # 1-3. O PDF vai direto para a IA, sem extração local de texto (10% a 55%)
+        with token.stage('gemini', STAGE_TIMEOUTS.get('gemini')), etapa('gemini'):
+            questions_list = extrair_questoes_do_pdf(
+                pdf_path, EXTRACTION_INSTRUCTIONS, parse_gemini_response_to_list,
+                get_gemini_client(hedging=GEMINI_HEDGING, rpm=GEMINI_RPM, tpm=GEMINI_TPM),
+                progress_callback, token, job=job, paginas_por_parte=PDF_PAGES_PER_REQUEST
+            )
+    elif INCREMENTAL_PAGES:
+        # 1-3. Só as páginas alteradas desde a última versão do PDF vão para a IA (0% a 55%)
+        with token.stage('extracao', STAGE_TIMEOUTS.get('extracao')), etapa('extracao'):
+            segmentos = preparar_segmentos(
+                pdf_path, banco, choose_backend(pdf_path, PDF_BACKEND), progress_callback, token
+            )
+        # As questões dos segmentos inalterados são deste mesmo documento: não são filtradas, e as
+        # dos alterados só contam como duplicadas de outros documentos (não das versões anteriores)
+        inalterados = [s for s in segmentos if not s.alterado]
+        filtro = {
+            'manter': {fingerprint_questao(q) for s in inalterados for q in s.questoes},
+            'ignorar_origens': {origem} | banco.origens_dos_segmentos(s.chave for s in inalterados),
+        }
+        with token.stage('gemini', STAGE_TIMEOUTS.get('gemini')):
+            questions_list = processar_segmentos(
+                segmentos,
+                lambda texto: parse_gemini_response_to_list(send_to_gemini(texto, cancel_token=token, job=job)),
+                banco, origem, progress_callback, token
+            )
+    else:
+        # 1. Extrair texto do PDF (0% a 10%)
+        with token.stage('extracao', STAGE_TIMEOUTS.get('extracao')):
+            raw_text = extract_text_from_pdf(pdf_path, progress_callback, token)
+
+        if SKIP_KNOWN_TEXT and banco.trecho_processado(raw_text):
+            # O mesmo texto já foi extraído antes: não paga de novo a chamada ao modelo
+            progress_callback(50, "3/5 - Texto já processado, usando o banco de questões...")
+            questions_list = banco.questoes_do_trecho(raw_text)
+            reaproveitadas = True
+        else:
+            # 2. Enviar para Gemini (10% a 50%)
+            with token.stage('gemini', STAGE_TIMEOUTS.get('gemini')):
+                gemini_response = send_to_gemini(raw_text, progress_callback, token, job=job)
+
+            # 3. Processar resposta da Gemini (50% a 55%)
+            questions_list = parse_gemini_response_to_list(gemini_response, progress_callback)
+
+    # 3.1 Separar as questões novas das que já estão no banco (as do próprio texto já processado
+    # vêm do banco e não são filtradas: o PDF é publicado de novo, sem pagar o Gemini)
+    if reaproveitadas:
+        return questions_list, [], raw_text
+    with etapa('banco'):
+        questions_list, duplicadas = banco.filtrar_novas(questions_list, **filtro)
+    return questions_list, duplicadas, raw_text
+
+
+class RegistroBanco:
+    """
+    Registra no banco as questões já publicadas (Forms criado ou plano gravado), e só elas:
+    se a autenticação, a criação dos Forms ou o plano falharem (ou o usuário cancelar), a
+    próxima execução encontra as questões como novas. Usado como `ao_publicar`.
+    """
+    def __init__(self, banco, origem, raw_text=None):
+        self.banco = banco
+        self.origem = origem
+        self.raw_text = raw_text
+        self.trecho = hash_trecho(raw_text) if raw_text is not None else None
+        self.registradas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, questions_list):
+        with etapa('banco'):
+            self.banco.adicionar(questions_list, origem=self.origem, trecho=self.trecho)
+        with self._lock:
+            self.registradas += len(questions_list)
+
+    def concluir(self, total):
+        """
+        Marca o texto do PDF como processado (SKIP_KNOWN_TEXT) se as `total` questões foram
+        registradas; com Forms faltando, o texto volta a ser enviado na próxima execução.
+        """
+        if self.raw_text is not None and self.registradas >= total:
+            self.banco.registrar_trecho(self.raw_text, self.origem)
+
+
 # --- LÓGICA PRINCIPAL E UI ---
 
 class PipelineApp:
@@ -446,7 +658,7 @@ class PipelineApp:
     def __init__(self, master):
         self.master = master
         master.title("LPIC PDF → IA (Gemini) → Google Forms")
-        master.geometry("450x250") # Tamanho fixo da janela
+        master.geometry("450x410") # Tamanho fixo da janela
         master.resizable(False, False) # Impede redimensionamento
 
         # Configuração de estilo para a barra de progresso
@@ -477,6 +689,45 @@ class PipelineApp:
         )
         self.btn_start.pack(pady=10)
 
+        # Botão para montar Forms a partir de uma consulta ao banco de questões
+        self.btn_bank = tk.Button(
+            master,
+            text="🗄️ Criar Forms a partir do Banco",
+            command=self.run_bank_in_thread,
+            padx=20,
+            pady=5
+        )
+        self.btn_bank.pack()
+
+        # Botão para executar um plano gravado no modo FORMS_PLAN_ONLY (retoma de onde parou)
+        self.btn_replay = tk.Button(
+            master,
+            text="📼 Reproduzir Plano de Forms",
+            command=self.run_replay_in_thread,
+            padx=20,
+            pady=5
+        )
+        self.btn_replay.pack(pady=5)
+
+        # Botão para cancelar a execução em andamento (habilitado apenas durante o processamento)
+        self.btn_cancel = tk.Button(
+            master,
+            text="⛔ Cancelar",
+            command=self.cancel_run,
+            state=tk.DISABLED,
+            padx=20,
+            pady=5
+        )
+        self.btn_cancel.pack(pady=5)
+        self.cancel_token = None # Token da execução atual
+
+        # Opção de perfilamento: grava <pdf>_perfil.folded / .json ao lado do PDF
+        self.profile_var = tk.BooleanVar(value=PROFILE_RUNS)
+        tk.Checkbutton(master, text="🔬 Perfilar execução (tempo por etapa)", variable=self.profile_var).pack()
+
+        # Banco de questões compartilhado entre execuções
+        self.banco = BancoQuestoes(BANCO_FILE)
+
         # Barra de progresso (determinate = mostra o progresso de 0 a 100)
         self.progress_bar = ttk.Progressbar(
             master,
@@ -491,34 +742,169 @@ class PipelineApp:
         self.status_label = tk.Label(master, text="Aguardando início...", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(fill=tk.X)
 
+        # Ponte de eventos: as threads de trabalho nunca tocam nos widgets diretamente
+        self.ui = UIBridge(master)
+        self.ui.set_progress_handler(self._apply_progress)
+
     def update_progress(self, value, text):
         """
-        Atualiza a barra de progresso e o rótulo de status na thread principal da GUI.
-        'self.master.after(0, ...)' garante que a atualização ocorra de forma segura.
+        Publica o progresso para a GUI. Pode ser chamada de qualquer thread: a thread
+        principal aplica apenas o valor mais recente a cada quadro (veja UIBridge).
+        """
+        self.ui.post_progress(value, text)
+
+    def _apply_progress(self, value, text):
+        """Aplica o progresso na barra e no rótulo de status (executada na thread principal)."""
+        self.progress_bar.config(value=value)
+        self.status_label.config(text=text)
+
+    def show_error(self, title, message):
+        """Exibe uma caixa de erro na thread principal, a partir de uma thread de trabalho."""
+        self.ui.call(messagebox.showerror, title, message)
+
+    def _set_buttons_state(self, state):
+        self.btn_start.config(state=state)
+        self.btn_bank.config(state=state)
+        self.btn_replay.config(state=state)
+        # O botão Cancelar fica habilitado justamente quando os demais estão desabilitados
+        self.btn_cancel.config(state=tk.NORMAL if state == tk.DISABLED else tk.DISABLED)
+
+    def _new_cancel_token(self):
+        """Cria o token de cancelamento de uma nova execução."""
+        self.cancel_token = CancelToken()
+        return self.cancel_token
+
+    def cancel_run(self):
+        """
+        Cancela a execução atual. A thread de trabalho é liberada na próxima verificação
+        do token (no máximo POLL_INTERVAL segundos) e as conexões registradas são fechadas.
         """
-        self.master.after(0, lambda: [
-            self.progress_bar.config(value=value),
-            self.status_label.config(text=text),
-            self.master.update_idletasks() # Força a atualização da interface
-        ])
+        if self.cancel_token:
+            self.update_progress(self.progress_bar['value'], "Cancelando...")
+            self.btn_cancel.config(state=tk.DISABLED)
+            self.cancel_token.cancel()
+
+    def _register_service(self, service, token):
+        """Fecha as conexões HTTP da Forms API se a execução for cancelada."""
+        if service is not None and hasattr(service, 'close'):
+            token.on_cancel(service.close)
+
+    def _finish_run(self):
+        """Reabilita os botões e zera a barra de progresso (executada na thread principal)."""
+        self._set_buttons_state(tk.NORMAL)
+        self.progress_bar.config(value=0)
+
+    def _run_with_profile(self, profile_base, target, *args):
+        """
+        Executa `target(*args)` (na thread de trabalho). Se `profile_base` não for None, a
+        execução é perfilada e o perfil é gravado em <profile_base>_perfil.folded / .json.
+        """
+        with perfilar(profile_base) if profile_base else nullcontext():
+            target(*args)
 
-    def run_creation_logic(self):
+    def run_creation_logic(self, pdf_path, token):
         """
         Função que contém a lógica completa do pipeline, executada em uma thread separada.
         Gerencia o fluxo de trabalho e o tratamento de erros.
+        Toda interação com a GUI passa por self.ui (post/call).
+        Cada etapa tem um prazo (STAGE_TIMEOUTS) e pode ser cancelada pelo `token`.
+        """
+        try:
+            questions_list, duplicadas, raw_text = extrair_questoes_pdf(pdf_path, self.banco, self.update_progress, token)
+            registro = RegistroBanco(self.banco, os.path.basename(pdf_path), raw_text)
+            if duplicadas:
+                print(f"ℹ️ {len(duplicadas)} questão(ões) já presentes no banco foram ignoradas.")
+            if not questions_list:
+                self.update_progress(100, "Nenhuma questão nova.")
+                self.ui.call(
+                    messagebox.showinfo,
+                    "Aviso",
+                    f"Todas as {len(duplicadas)} questões deste PDF já estão no banco.\n"
+                    "Use 'Criar Forms a partir do Banco' para gerar os Forms novamente."
+                )
+                return
+
+            form_title_base = os.path.basename(pdf_path).replace('.pdf', '')
+            relatorio_path = os.path.splitext(pdf_path)[0] + "_duplicadas.json"
+
+            if FORMS_PLAN_ONLY:
+                # 4/5. Modo de planejamento: grava as requisições dos Forms sem acessar a rede
+                plan_path = os.path.splitext(pdf_path)[0] + "_plano.jsonl"
+                num_forms, num_questions = planejar_forms_google(
+                    form_title_base, questions_list, plan_path, self.update_progress,
+                    relatorio_path=relatorio_path, ao_publicar=registro
+                )
+                registro.concluir(num_questions)
+                self.ui.call(
+                    messagebox.showinfo,
+                    "Plano Gravado",
+                    f"📝 {num_questions} questões planejadas em {num_forms} Forms(s).\n\n"
+                    f"Plano: {plan_path}\n"
+                    "Use 'Reproduzir Plano' para criar os Forms."
+                )
+                return
+
+            # 4. Autenticar Google Forms (55% a 65%)
+            token.check()
+            service = autenticar_google(self.update_progress, self.show_error)
+            if not service:
+                return # Retorna se a autenticação falhar
+            self._register_service(service, token)
+
+            # 5. Criar Google Forms (65% a 100%)
+            with token.stage('forms', STAGE_TIMEOUTS.get('forms')):
+                form_links, num_questions = criar_forms_google(
+                    service, 
+                    form_title_base, 
+                    questions_list, 
+                    self.update_progress,
+                    relatorio_path=relatorio_path,
+                    error_callback=self.show_error,
+                    cancel_token=token,
+                    ao_publicar=registro
+                )
+            registro.concluir(num_questions)
+
+            # 6. Exibir sucesso
+            self.update_progress(100, "Concluído com sucesso!")
+            self.ui.call(
+                messagebox.showinfo,
+                "Sucesso",
+                f"✅ Extraídas e Criadas {num_questions} questões em {len(form_links)} Forms(s).\n"
+                f"Duplicadas ignoradas: {len(duplicadas)}\n\n"
+                f"Links dos Forms:\n{'\n'.join(form_links)}"
+            )
+
+        except DeadlineExceeded as e:
+            self.update_progress(0, "Erro: " + str(e))
+            self.show_error("Tempo Esgotado", str(e))
+
+        except Cancelled:
+            self.update_progress(0, "Processo cancelado.")
+
+        except Exception as e:
+            # Captura e exibe qualquer erro ocorrido em qualquer etapa
+            self.update_progress(0, "Erro: " + str(e))
+            self.show_error("Erro", f"Falha no processamento:\n{str(e)}")
+
+        finally:
+            # Bloco executado sempre, reabilita os botões e zera a barra de progresso
+            self.ui.post(self._finish_run)
+
+    def run_process_in_thread(self):
+        """
+        Faz as checagens e a seleção do PDF na thread principal e inicia a função
+        run_creation_logic em uma thread separada.
+        Isso é crucial para que a Interface Gráfica (GUI) permaneça responsiva 
+        enquanto as chamadas de API de longa duração (Gemini e Forms) estão em execução.
         """
-        
         # Checagem inicial da chave de API
         if GEMINI_API_KEY == "SUA_CHAVE_AQUI" or not GEMINI_API_KEY:
-             messagebox.showwarning(
-                 "Chave da API ausente",
-                 "⚠️ Por favor, edite o código e insira sua chave da API Gemini na variável GEMINI_API_KEY."
-             )
-             self.btn_start.config(state=tk.NORMAL)
-             return
-             
-        self.update_progress(0, "Iniciando o processo...")
-        self.btn_start.config(state=tk.DISABLED) # Desabilita o botão para evitar cliques múltiplos
+            messagebox.showwarning(
+                "Chave da API ausente",
+                "⚠️ Por favor, edite o código e insira sua chave da API Gemini na variável GEMINI_API_KEY."
+            )
+            return
 
         # Diálogo para selecionar o arquivo PDF
         pdf_path = filedialog.askopenfilename(
@@ -526,59 +912,151 @@ class PipelineApp:
             filetypes=[("Arquivos PDF", "*.pdf")]
         )
         if not pdf_path:
-            self.btn_start.config(state=tk.NORMAL)
             self.update_progress(0, "Processo cancelado.")
             return
 
-        try:
-            # 1. Extrair texto do PDF (0% a 10%)
-            raw_text = extract_text_from_pdf(pdf_path, self.update_progress)
-            
-            # 2. Enviar para Gemini (10% a 50%)
-            gemini_response = send_to_gemini(raw_text, self.update_progress)
+        self._set_buttons_state(tk.DISABLED) # Desabilita os botões para evitar cliques múltiplos
+        self.update_progress(0, "Iniciando o processo...")
+        token = self._new_cancel_token()
+        profile_base = os.path.splitext(pdf_path)[0] if self.profile_var.get() else None
+        threading.Thread(
+            target=self._run_with_profile, args=(profile_base, self.run_creation_logic, pdf_path, token), daemon=True
+        ).start()
 
-            # 3. Processar resposta da Gemini (50% a 55%)
-            questions_list = parse_gemini_response_to_list(gemini_response, self.update_progress)
-            
-            # 4. Autenticar Google Forms (55% a 65%)
-            service = autenticar_google(self.update_progress)
+    def run_bank_logic(self, termo, token):
+        """
+        Cria Forms a partir de uma consulta ao banco de questões (sem PDF e sem Gemini),
+        executada em uma thread separada.
+
+        Args:
+            termo (str): Texto para filtrar os enunciados (vazio = todas as questões).
+            token (CancelToken): Token de cancelamento da execução.
+        """
+        try:
+            self.update_progress(50, "3/5 - Consultando banco de questões...")
+            with etapa('banco'):
+                questions_list = self.banco.buscar(termo=termo or None)
+            if not questions_list:
+                self.ui.call(messagebox.showinfo, "Aviso", "Nenhuma questão encontrada no banco.")
+                return
+
+            service = autenticar_google(self.update_progress, self.show_error)
             if not service:
-                return # Retorna se a autenticação falhar
+                return
+            self._register_service(service, token)
 
-            # 5. Criar Google Forms (65% a 100%)
-            form_title_base = os.path.basename(pdf_path).replace('.pdf', '')
-            form_links, num_questions = criar_forms_google(
-                service, 
-                form_title_base, 
-                questions_list, 
-                self.update_progress 
-            )
+            form_title_base = f"Banco - {termo}" if termo else "Banco de Questões"
+            with token.stage('forms', STAGE_TIMEOUTS.get('forms')):
+                form_links, num_questions = criar_forms_google(
+                    service, form_title_base, questions_list, self.update_progress,
+                    error_callback=self.show_error, cancel_token=token
+                )
 
-            # 6. Exibir sucesso
             self.update_progress(100, "Concluído com sucesso!")
-            messagebox.showinfo(
+            self.ui.call(
+                messagebox.showinfo,
                 "Sucesso",
-                f"✅ Extraídas e Criadas {num_questions} questões em {len(form_links)} Forms(s).\n\n"
-                f"Links dos Forms:\n{'\n'.join(form_links)}"
+                f"✅ Criadas {num_questions} questões do banco em {len(form_links)} Forms(s).\n\n"
+                "Links dos Forms:\n" + "\n".join(form_links)
             )
 
+        except DeadlineExceeded as e:
+            self.update_progress(0, "Erro: " + str(e))
+            self.show_error("Tempo Esgotado", str(e))
+
+        except Cancelled:
+            self.update_progress(0, "Processo cancelado.")
+
         except Exception as e:
-            # Captura e exibe qualquer erro ocorrido em qualquer etapa
             self.update_progress(0, "Erro: " + str(e))
-            messagebox.showerror("Erro", f"Falha no processamento:\n{str(e)}")
+            self.show_error("Erro", f"Falha no processamento:\n{str(e)}")
 
         finally:
-            # Bloco executado sempre, reabilita o botão e zera a barra de progresso
-            self.btn_start.config(state=tk.NORMAL)
-            self.progress_bar.config(value=0)
+            self.ui.post(self._finish_run)
+
+    def run_bank_in_thread(self):
+        """Pede o filtro na thread principal e inicia a criação de Forms a partir do banco em uma thread separada."""
+        termo = simpledialog.askstring(
+            "Banco de Questões",
+            f"{self.banco.total()} questões no banco.\nFiltrar enunciados contendo (vazio = todas):",
+            parent=self.master
+        )
+        if termo is None:
+            self.update_progress(0, "Processo cancelado.")
+            return
 
-    def run_process_in_thread(self):
+        self._set_buttons_state(tk.DISABLED)
+        token = self._new_cancel_token()
+        # Perfil ao lado do banco: banco_questoes_perfil.folded / .json
+        profile_base = os.path.splitext(BANCO_FILE)[0] if self.profile_var.get() else None
+        threading.Thread(
+            target=self._run_with_profile, args=(profile_base, self.run_bank_logic, termo.strip(), token), daemon=True
+        ).start()
+
+    def run_replay_logic(self, plan_path, token):
         """
-        Inicia a função run_creation_logic em uma thread separada.
-        Isso é crucial para que a Interface Gráfica (GUI) permaneça responsiva 
-        enquanto as chamadas de API de longa duração (Gemini e Forms) estão em execução.
+        Executa um plano de Forms gravado no modo FORMS_PLAN_ONLY, em uma thread separada.
+        O progresso fica em <plano>.estado.jsonl: se interrompida, a reprodução retoma de onde parou.
+
+        Args:
+            plan_path (str): Caminho do plano (.jsonl).
+            token (CancelToken): Token de cancelamento da execução.
         """
-        threading.Thread(target=self.run_creation_logic).start()
+        try:
+            service = autenticar_google(self.update_progress, self.show_error)
+            if not service:
+                return
+            self._register_service(service, token)
+
+            with token.stage('reproducao', STAGE_TIMEOUTS.get('reproducao')):
+                resultados = reproduzir_plano(
+                    plan_path, service,
+                    progress_callback=lambda value, text: self.update_progress(value, "Reproduzindo plano: " + text),
+                    cancel_token=token, request_timeout=FORMS_REQUEST_TIMEOUT
+                )
+
+            form_links = [r['link'] for r in resultados if r['link']]
+            falhas = sum(r['falhas'] for r in resultados)
+            self.update_progress(100, "Concluído com sucesso!" if not falhas else "Concluído com falhas.")
+            self.ui.call(
+                messagebox.showinfo,
+                "Plano Reproduzido",
+                f"✅ {len(form_links)} Forms(s) do plano criados.\n"
+                f"Lotes com falha: {falhas} (reproduza o plano de novo para tentar novamente)\n\n"
+                "Links dos Forms:\n" + "\n".join(form_links)
+            )
+
+        except DeadlineExceeded as e:
+            self.update_progress(0, "Erro: " + str(e))
+            self.show_error("Tempo Esgotado", str(e))
+
+        except Cancelled:
+            self.update_progress(0, "Processo cancelado. Reproduza o plano de novo para continuar.")
+
+        except Exception as e:
+            self.update_progress(0, "Erro: " + str(e))
+            self.show_error("Erro", f"Falha ao reproduzir o plano:\n{str(e)}")
+
+        finally:
+            self.ui.post(self._finish_run)
+
+    def run_replay_in_thread(self):
+        """Pede o arquivo de plano na thread principal e inicia a reprodução em uma thread separada."""
+        plan_path = filedialog.askopenfilename(
+            title="Selecione o plano de Forms",
+            filetypes=[("Plano de Forms", "*.jsonl")]
+        )
+        if not plan_path:
+            self.update_progress(0, "Processo cancelado.")
+            return
+
+        self._set_buttons_state(tk.DISABLED)
+        self.update_progress(0, "Iniciando a reprodução do plano...")
+        token = self._new_cancel_token()
+        profile_base = os.path.splitext(plan_path)[0] if self.profile_var.get() else None
+        threading.Thread(
+            target=self._run_with_profile, args=(profile_base, self.run_replay_logic, plan_path, token), daemon=True
+        ).start()
 
 
 if __name__ == '__main__':
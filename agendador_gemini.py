@@ -0,0 +1,239 @@
+"""
+Agendador das chamadas ao Gemini com orçamentos de requisições e tokens por minuto.
+
+Antes de cada chamada, os tokens de entrada e de saída são estimados e a chamada
+entra numa fila. Ela só é liberada quando cabe nos orçamentos da janela de um minuto
+(RPM = requisições por minuto, TPM = tokens por minuto), em vez de descobrir o limite
+por um erro 429 depois do envio. Quando a resposta chega, a estimativa é trocada pela
+contagem real (`usage_metadata`).
+
+Vários jobs (ex.: um PDF por usuário) dividem o orçamento de forma justa: a próxima
+chamada liberada é sempre a do job que menos consumiu tokens na janela atual.
+Profundidade da fila e tempos de espera ficam disponíveis em `metrics()`.
+
+Os limites padrão (GEMINI_RPM, GEMINI_TPM) são os do nível GRATUITO do gemini-2.5-flash.
+Em projetos de nível pago, que têm cotas bem maiores, eles só atrasariam as chamadas:
+defina as variáveis de ambiente GEMINI_RPM e GEMINI_TPM com os limites do seu nível
+(ou 'none' para desativar um limite) ou troque os valores em App.py (seção 9).
+
+Roda dentro do event loop do GeminiClient (veja gemini_client.py).
+"""
+import asyncio
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+def limite_do_ambiente(nome, padrao):
+    """Limite por minuto da variável de ambiente `nome` ('none' ou 0 desativam), ou `padrao`."""
+    valor = os.environ.get(nome, '').strip()
+    if not valor:
+        return padrao
+    if valor.lower() in ('none', '0'):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        print(f"⚠️ {nome}='{valor}' não é um número; usando o padrão ({padrao}).")
+        return padrao
+
+
+# Padrões do nível gratuito do gemini-2.5-flash; sobrescritos pelas variáveis de ambiente de mesmo nome
+GEMINI_RPM = limite_do_ambiente('GEMINI_RPM', 10) # Requisições por minuto
+GEMINI_TPM = limite_do_ambiente('GEMINI_TPM', 250000) # Tokens por minuto (entrada + saída estimada)
+RATE_WINDOW = 60 # Janela (segundos) dos orçamentos
+CHARS_PER_TOKEN = 4 # Estimativa grosseira de caracteres por token
+TOKENS_PER_PDF_PAGE = 258 # Custo fixo de cada página de PDF enviada como arquivo ao modelo
+OUTPUT_TOKENS_RATIO = 0.5 # Saída estimada como fração da entrada (o JSON repete boa parte do texto)
+MIN_OUTPUT_TOKENS = 256
+WAIT_SAMPLES = 200 # Esperas recentes guardadas para as métricas
+DEFAULT_JOB = 'padrão'
+
+
+def estimar_tokens(texto):
+    """Estimativa de tokens de um texto (sem chamada à API)."""
+    return math.ceil(len(texto) / CHARS_PER_TOKEN)
+
+
+def estimar_tokens_pedido(contents, config=None):
+    """
+    Estima os tokens (entrada + saída) de uma chamada. Partes que não são texto são
+    estimadas pelo tamanho da sua representação.
+    """
+    partes = contents if isinstance(contents, (list, tuple)) else [contents]
+    entrada = sum(estimar_tokens(p if isinstance(p, str) else str(p)) for p in partes)
+    saida = max(MIN_OUTPUT_TOKENS, int(entrada * OUTPUT_TOKENS_RATIO))
+    max_saida = (config or {}).get('max_output_tokens') if isinstance(config, dict) else None
+    if max_saida:
+        saida = min(saida, max_saida)
+    return entrada + saida
+
+
+def estimar_tokens_pdf(num_paginas, prompt=''):
+    """Estima os tokens (entrada + saída) de uma chamada com um PDF de `num_paginas` páginas anexado."""
+    entrada = num_paginas * TOKENS_PER_PDF_PAGE + estimar_tokens(prompt)
+    return entrada + max(MIN_OUTPUT_TOKENS, int(entrada * OUTPUT_TOKENS_RATIO))
+
+
+def tokens_da_resposta(response):
+    """Tokens reais de uma resposta (entrada + saída), ou None se a API não informar."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None
+    total = getattr(usage, 'total_token_count', None)
+    if total:
+        return total
+    partes = [getattr(usage, nome, None) or 0 for nome in ('prompt_token_count', 'candidates_token_count', 'thoughts_token_count')]
+    return sum(partes) or None
+
+
+class _Pedido:
+    __slots__ = ('job', 'tokens', 'future', 'chegada', 'seq')
+
+    def __init__(self, job, tokens, future, seq):
+        self.job = job
+        self.tokens = tokens
+        self.future = future
+        self.chegada = time.monotonic()
+        self.seq = seq
+
+
+class AgendadorGemini:
+    """
+    Fila de chamadas com orçamentos RPM/TPM e divisão justa entre jobs.
+    `adquirir` e `liberar` devem ser chamados no event loop do cliente.
+    """
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, window=RATE_WINDOW):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._pendentes = {} # job -> deque de _Pedido, em ordem de chegada
+        self._janela = deque() # [instante, tokens, job] de cada chamada liberada na janela
+        self._seq = itertools.count()
+        self._timer = None
+        self._lock = threading.Lock() # As métricas são lidas de outras threads
+        self._esperas = deque(maxlen=WAIT_SAMPLES)
+        self.atendidas = 0
+
+    # --- Orçamento ---
+
+    def _limpar_janela(self, agora):
+        while self._janela and self._janela[0][0] <= agora - self.window:
+            self._janela.popleft()
+
+    def _uso(self):
+        return len(self._janela), sum(entrada[1] for entrada in self._janela)
+
+    def _cabe(self, tokens):
+        requisicoes, usados = self._uso()
+        if self.rpm and requisicoes >= self.rpm:
+            return False
+        # Uma chamada maior que o orçamento inteiro só precisa da janela vazia
+        return not self.tpm or usados + min(tokens, self.tpm) <= self.tpm
+
+    def _espera_para(self, tokens, agora):
+        """Segundos até a chamada caber, simulando a saída das entradas mais antigas."""
+        requisicoes, usados = self._uso()
+        for instante, usados_entrada, _ in self._janela:
+            requisicoes -= 1
+            usados -= usados_entrada
+            cabe_rpm = not self.rpm or requisicoes < self.rpm
+            cabe_tpm = not self.tpm or usados + min(tokens, self.tpm) <= self.tpm
+            if cabe_rpm and cabe_tpm:
+                return max(0.0, instante + self.window - agora)
+        return 0.0
+
+    def _servido(self, job):
+        return sum(entrada[1] for entrada in self._janela if entrada[2] == job)
+
+    # --- Fila ---
+
+    async def adquirir(self, tokens, job=None):
+        """
+        Espera a vez da chamada (`tokens` estimados) e a registra na janela.
+
+        Returns:
+            list: A entrada da janela, a ser passada para `liberar`.
+        """
+        loop = asyncio.get_running_loop()
+        pedido = _Pedido(job or DEFAULT_JOB, tokens, loop.create_future(), next(self._seq))
+        with self._lock:
+            self._pendentes.setdefault(pedido.job, deque()).append(pedido)
+        self._despachar()
+        try:
+            return await pedido.future
+        except asyncio.CancelledError:
+            with self._lock:
+                fila = self._pendentes.get(pedido.job)
+                if fila and pedido in fila:
+                    fila.remove(pedido)
+                    if not fila:
+                        del self._pendentes[pedido.job]
+            self._despachar()
+            raise
+
+    def liberar(self, entrada, tokens_reais=None):
+        """Troca a estimativa da chamada pelos tokens reais e reavalia a fila."""
+        if tokens_reais is not None:
+            with self._lock:
+                entrada[1] = tokens_reais
+        self._despachar()
+
+    def _despachar(self):
+        """Libera as chamadas que cabem no orçamento, sempre do job menos servido."""
+        loop = asyncio.get_running_loop()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._lock:
+            agora = time.monotonic()
+            self._limpar_janela(agora)
+            while self._pendentes:
+                job = min(self._pendentes, key=lambda j: (self._servido(j), self._pendentes[j][0].seq))
+                fila = self._pendentes[job]
+                pedido = fila[0]
+                if pedido.future.done(): # Cancelado enquanto esperava
+                    fila.popleft()
+                    if not fila:
+                        del self._pendentes[job]
+                    continue
+                if not self._cabe(pedido.tokens):
+                    espera = self._espera_para(pedido.tokens, agora)
+                    self._timer = loop.call_later(max(espera, 0.05), self._despachar)
+                    return
+                fila.popleft()
+                if not fila:
+                    del self._pendentes[job]
+                entrada = [agora, pedido.tokens, job]
+                self._janela.append(entrada)
+                self._esperas.append(agora - pedido.chegada)
+                self.atendidas += 1
+                pedido.future.set_result(entrada)
+
+    # --- Métricas ---
+
+    def metrics(self):
+        """
+        Returns:
+            dict: 'fila' (chamadas esperando), 'fila_por_job', 'espera_media', 'espera_p95' e
+                  'espera_max' (segundos, nas esperas recentes), 'requisicoes_janela',
+                  'tokens_janela' e 'atendidas'.
+        """
+        with self._lock:
+            self._limpar_janela(time.monotonic())
+            esperas = sorted(self._esperas)
+            requisicoes, tokens = self._uso()
+            fila_por_job = {job: len(fila) for job, fila in self._pendentes.items()}
+        return {
+            'fila': sum(fila_por_job.values()),
+            'fila_por_job': fila_por_job,
+            'espera_media': sum(esperas) / len(esperas) if esperas else 0.0,
+            'espera_p95': esperas[max(0, math.ceil(0.95 * len(esperas)) - 1)] if esperas else 0.0,
+            'espera_max': esperas[-1] if esperas else 0.0,
+            'requisicoes_janela': requisicoes,
+            'tokens_janela': tokens,
+            'atendidas': self.atendidas,
+        }
@@ -1,13 +1,19 @@
 import os
-import re
-import json
+import threading
+from contextlib import nullcontext
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import PyPDF2
 import pandas as pd
-from google import genai
 from google.genai.errors import APIError
 
+from gemini_client import get_gemini_client
+from cache_contexto import get_context_cache
+from core import Question
+from ui_bridge import UIBridge
+from pdf_backends import choose_backend
+from perfilamento import etapa, perfilar
+from continuacao import completar_resposta, extrair_json, lista_de_questoes, prompt_de_continuacao
+
 # 🔑 SUBSTITUA PELA SUA CHAVE DA API GEMINI
 GEMINI_API_KEY = "chave"  # <-- ALTERE ISSO!
 
@@ -17,17 +23,23 @@ os.environ['GEMINI_API_KEY'] = GEMINI_API_KEY
 # Aumentamos o limite de caracteres para capturar todas as 60 questões
 TEXT_LIMIT = 60000
 
+# Backend de extração do PDF: 'auto' (benchmark), 'pypdfium2', 'pdfminer' ou 'pypdf2'
+PDF_BACKEND = 'auto'
+
+# Instruções fixas do prompt pelo cache de contexto do Gemini (veja cache_contexto.py)
+GEMINI_CONTEXT_CACHE = True
+
 
-def extract_text_from_pdf(pdf_path, progress_callback=None):
-    """Extrai texto de um arquivo PDF, simulando progresso por página."""
+@etapa('extracao')
+def extract_text_from_pdf(pdf_path, progress_callback=None, backend=None):
+    """Extrai texto de um arquivo PDF com o backend configurado, simulando progresso por página."""
     text = ""
     try:
-        with open(pdf_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            num_pages = len(reader.pages)
+        with choose_backend(pdf_path, backend or PDF_BACKEND).open(pdf_path) as doc:
+            num_pages = doc.num_pages
 
-            for i, page in enumerate(reader.pages):
-                page_text = page.extract_text()
+            for i in range(num_pages):
+                page_text = doc.page_text(i)
                 if page_text:
                     text += page_text + "\n"
 
@@ -42,20 +54,19 @@ def extract_text_from_pdf(pdf_path, progress_callback=None):
         raise Exception(f"Erro ao ler PDF: {e}")
 
 
-def send_to_gemini(pdf_text, progress_callback=None):
-    """Envia o texto do PDF para a API Gemini para extração estruturada."""
+@etapa('gemini')
+def send_to_gemini(pdf_text, progress_callback=None, job=None):
+    """Envia o texto do PDF para a API Gemini para extração estruturada (`job` identifica o PDF nas cotas)."""
 
-    try:
-        client = genai.Client()
-    except Exception:
-        raise Exception("Erro ao inicializar o cliente Gemini. Verifique a chave de API.")
+    client = get_gemini_client()
 
     text_to_send = pdf_text[:TEXT_LIMIT]
 
     if progress_callback:
         progress_callback(50, "Preparando envio para IA...")
 
-    full_prompt = (
+    # Instruções fixas (iguais para todo PDF): podem ir pelo cache de contexto
+    instructions = (
         "Analise o conteúdo extraído do simulado LPIC a seguir. "
         "Seu objetivo é extrair todas as perguntas, todas as alternativas apresentadas, "
         "e indicar a alternativa correta. O output DEVE ser um JSON estritamente válido. "
@@ -69,18 +80,26 @@ def send_to_gemini(pdf_text, progress_callback=None):
         "  },\n"
         "  // ... outras perguntas\n"
         "]\n\n"
-        f"CONTEÚDO DO PDF (Primeiros {len(text_to_send)} caracteres):\n\n{text_to_send}"
     )
+    document_prompt = f"CONTEÚDO DO PDF (Primeiros {len(text_to_send)} caracteres):\n\n{text_to_send}"
 
     try:
         if progress_callback:
             progress_callback(75, "Processando na Gemini API (aguarde)...")
 
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=full_prompt,
-            config={"temperature": 0.1}
-        )
+        def gerar(prompt_documento):
+            if GEMINI_CONTEXT_CACHE:
+                return get_context_cache(client).generate(
+                    instructions, prompt_documento, model="gemini-2.5-flash", config={"temperature": 0.1}, job=job
+                )
+            return client.generate_content_sync(
+                model="gemini-2.5-flash",
+                contents=instructions + prompt_documento,
+                config={"temperature": 0.1},
+                job=job
+            )
+
+        response = gerar(document_prompt)
 
         if progress_callback:
             progress_callback(95, "Resposta recebida...")
@@ -88,64 +107,47 @@ def send_to_gemini(pdf_text, progress_callback=None):
         if not response.text:
             raise Exception("A resposta da API Gemini está vazia.")
 
-        return response.text.strip()
+        # Saída cortada pelo limite de tokens: pede só as questões que faltaram
+        return completar_resposta(response, lambda ultimo: gerar(document_prompt + prompt_de_continuacao(ultimo)))
 
     except APIError as e:
         if "maximum size for a single request" in str(e):
             raise Exception("Erro: O PDF é muito grande. Tente reduzir o limite de caracteres ou usar um modelo maior.")
         raise Exception(f"Erro na API Gemini: {e}")
+    except TimeoutError as e:
+        raise Exception(f"Erro na API Gemini: {e}")
     except Exception as e:
         raise e
 
 
+@etapa('parsing')
 def parse_gemini_response_to_excel(gemini_output, output_excel, progress_callback=None):
-    """Processa a saída JSON da IA e salva em um arquivo Excel."""
+    """
+    Processa a saída JSON da IA e salva em um arquivo Excel. As questões não vão para o
+    banco aqui: quem as registra é o appForms.py, ao publicá-las no Forms.
+    """
 
     if progress_callback:
         progress_callback(97, "Convertendo para Excel...")
 
-    json_match = re.search(r"```json\s*(\{.*?\}|\[.*?\])\s*```", gemini_output, re.DOTALL)
-    if not json_match:
-        json_match = re.search(r"(\{.*?\}|\[.*?\])", gemini_output, re.DOTALL)
-    if not json_match:
-        raise ValueError("Não foi possível encontrar um JSON válido na resposta da IA.")
+    data, completo = extrair_json(gemini_output)
+    if not completo and not data:
+        raise ValueError("Erro ao decodificar JSON: a resposta da IA está incompleta.")
+    data = lista_de_questoes(data)
 
-    try:
-        data = json.loads(json_match.group(1))
-        if isinstance(data, dict) and "perguntas" in data:
-            data = data["perguntas"]
-        elif isinstance(data, dict):
-            data = [data]
-        elif not isinstance(data, list):
-            raise TypeError("O JSON decodificado não é uma lista de perguntas.")
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Erro ao decodificar JSON: {e}")
-
-    rows = []
-    for item in data:
-        alts = item.get("alternativas", [])
-        row = {
-            "Número": item.get("numero", ""),
-            "Enunciado": item.get("enunciado", "").strip(),
-        }
-
-        for i in range(len(alts)):
-            row[chr(65 + i)] = alts[i]
-
-        row["Correta"] = item.get("correta", "").strip()
-        rows.append(row)
-
-    df = pd.DataFrame(rows)
+    questions = [Question.from_gemini(item) for item in data]
+
+    df = pd.DataFrame([q.to_dict() for q in questions])
     df.to_excel(output_excel, index=False)
 
     if progress_callback:
         progress_callback(100, "Concluído!")
 
-    return len(rows)
+    return len(questions)
 
 
-def process_with_gemini(root, btn, progress_bar, status_label):
-    """Função principal com a lógica de extração e API, atualizando a UI."""
+def process_with_gemini(root, btn, progress_bar, status_label, ui, profile_var=None):
+    """Valida a chave, pede o PDF e inicia o pipeline em uma thread separada."""
 
     if GEMINI_API_KEY == "SUA_CHAVE_AQUI" or not GEMINI_API_KEY:
         messagebox.showwarning(
@@ -168,25 +170,41 @@ def process_with_gemini(root, btn, progress_bar, status_label):
         status_label.config(text="Processo cancelado.")
         return
 
-    def update_progress(value, text):
-        progress_bar['value'] = value
-        status_label.config(text=text)
-        root.update_idletasks()  # Força atualização da interface
+    # Extração e chamada à IA fora da thread principal: a janela continua respondendo
+    # Com a opção de perfilamento, o perfil é gravado ao lado do PDF (<pdf>_perfil.folded / .json)
+    profile_base = os.path.splitext(pdf_path)[0] if profile_var is not None and profile_var.get() else None
+
+    def executar():
+        with perfilar(profile_base) if profile_base else nullcontext():
+            run_pipeline(pdf_path, btn, progress_bar, ui)
+
+    threading.Thread(target=executar, daemon=True).start()
+
+
+def run_pipeline(pdf_path, btn, progress_bar, ui):
+    """Lógica de extração e API, executada em thread separada; a UI é atualizada via `ui`."""
+
+    update_progress = ui.post_progress
+
+    def finish():
+        btn.config(state=tk.NORMAL)
+        progress_bar['value'] = 0
 
     try:
         # 1. Extrair texto do PDF
         update_progress(0, "Iniciando extração do PDF...")
         raw_text = extract_text_from_pdf(pdf_path, update_progress)
         if not raw_text:
-            messagebox.showerror("Erro", "Não foi possível extrair texto do PDF.")
+            ui.call(messagebox.showerror, "Erro", "Não foi possível extrair texto do PDF.")
             return
 
         # 2. Enviar para Gemini
-        gemini_response = send_to_gemini(raw_text, update_progress)
+        gemini_response = send_to_gemini(raw_text, update_progress, job=os.path.basename(pdf_path))
 
         # 3. Salvar resposta bruta em .txt
         update_progress(96, "Salvando resposta da IA...")
-        txt_path = filedialog.asksaveasfilename(
+        txt_path = ui.call(
+            filedialog.asksaveasfilename,
             defaultextension=".txt",
             filetypes=[("Texto", "*.txt")],
             title="Salvar resposta bruta da IA (JSON) como..."
@@ -202,7 +220,8 @@ def process_with_gemini(root, btn, progress_bar, status_label):
         num_questions = parse_gemini_response_to_excel(gemini_response, excel_path, update_progress)
 
         # 5. Exibir sucesso
-        messagebox.showinfo(
+        ui.call(
+            messagebox.showinfo,
             "Sucesso",
             f"✅ Extraídas {num_questions} questões.\n"
             f"Resposta bruta salva em:\n{txt_path}\n"
@@ -211,17 +230,16 @@ def process_with_gemini(root, btn, progress_bar, status_label):
 
     except Exception as e:
         update_progress(0, "Erro: " + str(e))
-        messagebox.showerror("Erro", f"Falha no processamento:\n{str(e)}")
+        ui.call(messagebox.showerror, "Erro", f"Falha no processamento:\n{str(e)}")
 
     finally:
-        btn.config(state=tk.NORMAL)
-        progress_bar['value'] = 0
+        ui.post(finish)
 
 
 # --- Interface Gráfica ---
 root = tk.Tk()
 root.title("LPIC PDF → IA (Gemini) → Excel")
-root.geometry("450x230")
+root.geometry("450x260")
 root.resizable(False, False)
 
 # Estilo da barra de progresso
@@ -244,7 +262,7 @@ label.pack()
 btn = tk.Button(
     root,
     text="📁 Selecionar PDF e Processar com IA (Gemini)",
-    command=lambda: process_with_gemini(root, btn, progress_bar, status_label),
+    command=lambda: process_with_gemini(root, btn, progress_bar, status_label, ui, profile_var),
     padx=20,
     pady=10,
     bg="#3B82F6",
@@ -252,6 +270,10 @@ btn = tk.Button(
 )
 btn.pack(pady=5)
 
+# Perfilamento da execução (tempo por etapa, grava <pdf>_perfil.folded / .json)
+profile_var = tk.BooleanVar(value=False)
+tk.Checkbutton(root, text="🔬 Perfilar execução", variable=profile_var).pack()
+
 # Barra de progresso
 progress_bar = ttk.Progressbar(
     root,
@@ -272,4 +294,8 @@ status_label = tk.Label(
 )
 status_label.pack(fill=tk.X)
 
+# Ponte de eventos entre a thread do pipeline e a interface
+ui = UIBridge(root)
+ui.set_progress_handler(lambda value, text: (progress_bar.config(value=value), status_label.config(text=text)))
+
 root.mainloop()
@@ -2,34 +2,39 @@ import pandas as pd
 import time
 import os
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 import threading
+from contextlib import nullcontext
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from banco_questoes import BancoQuestoes, BANCO_FILE
+from lotes_forms import enviar_lote, formatar_rejeitadas, progresso_parcial
+from core import Question, build_forms
+from deduplicacao import remover_quase_duplicadas, formatar_relatorio
+from perfilamento import etapa, perfilar
+from ui_bridge import UIBridge
+
 # Configurações gerais
 SCOPES = ['https://www.googleapis.com/auth/forms.body', 'https://www.googleapis.com/auth/forms.body.readonly']
 CREDENTIALS_FILE = 'chave.json'
 MAX_QUESTIONS_PER_FORM = 30
-
-
-def limpar_texto(texto):
-    """Remove quebras de linha e espaços desnecessários."""
-    if not isinstance(texto, str):
-        texto = str(texto)
-    return texto.replace('\r', ' ').replace('\n', ' ').strip()
+FORMS_LAYOUT = 'partes'  # 'partes': um Forms por MAX_QUESTIONS_PER_FORM; 'unico': um Forms com uma página a cada MAX_QUESTIONS_PER_FORM
+PROFILE_RUNS = False  # Estado inicial de "Perfilar execução": grava <planilha>_perfil.folded / .json
+NEAR_DUP_THRESHOLD = None  # Similaridade mínima para mesclar questões quase duplicadas (None desativa; se ativar, use 0.9 ou mais)
 
 
 class FormsCreatorApp:
     def __init__(self, master):
         self.master = master
         master.title("Criador de Google Forms Automatizado")
-        master.geometry("450x250")
+        master.geometry("450x330")
         master.resizable(False, False)
 
         self.service = None
         self.excel_file = None
+        self.banco = BancoQuestoes(BANCO_FILE)
 
         style = ttk.Style()
         style.theme_use('clam')
@@ -56,6 +61,18 @@ class FormsCreatorApp:
         )
         self.btn_start.pack(pady=10)
 
+        self.btn_bank = tk.Button(
+            master,
+            text="🗄️ Criar Forms a partir do Banco",
+            command=self.run_bank_in_thread,
+            padx=20,
+            pady=5
+        )
+        self.btn_bank.pack()
+
+        self.profile_var = tk.BooleanVar(value=PROFILE_RUNS)
+        tk.Checkbutton(master, text="🔬 Perfilar execução (tempo por etapa)", variable=self.profile_var).pack()
+
         self.progress_bar = ttk.Progressbar(
             master,
             orient='horizontal',
@@ -68,17 +85,36 @@ class FormsCreatorApp:
         self.status_label = tk.Label(master, text="Aguardando início...", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(fill=tk.X)
 
+        # Threads de trabalho publicam eventos; a thread principal os aplica a cada quadro
+        self.ui = UIBridge(master)
+        self.ui.set_progress_handler(self._apply_progress)
+
     def update_progress(self, value, text):
-        self.master.after(0, lambda: [
-            self.progress_bar.config(value=value),
-            self.status_label.config(text=text),
-            self.master.update_idletasks()
-        ])
+        self.ui.post_progress(value, text)
+
+    def _apply_progress(self, value, text):
+        self.progress_bar.config(value=value)
+        self.status_label.config(text=text)
+
+    def show_error(self, title, message):
+        self.ui.call(messagebox.showerror, title, message)
+
+    def _set_buttons_state(self, state):
+        self.btn_start.config(state=state)
+        self.btn_bank.config(state=state)
+
+    def _finish_run(self):
+        self._set_buttons_state(tk.NORMAL)
+
+    def _run_with_profile(self, profile_base, target, *args):
+        # Com `profile_base`, a execução é perfilada e o perfil vai para <profile_base>_perfil.*
+        with perfilar(profile_base) if profile_base else nullcontext():
+            target(*args)
 
     def autenticar_google(self):
         self.update_progress(10, "1/5 - Autenticando com o Google...")
         if not os.path.exists(CREDENTIALS_FILE):
-            messagebox.showerror(
+            self.show_error(
                 "Erro de Credenciais",
                 f"Arquivo '{CREDENTIALS_FILE}' não encontrado.\nBaixe suas credenciais JSON da Google Cloud Console."
             )
@@ -89,167 +125,162 @@ class FormsCreatorApp:
             self.update_progress(30, "2/5 - Autenticação concluída. Conectando à API...")
             return build('forms', 'v1', credentials=creds)
         except Exception as e:
-            messagebox.showerror("Erro de Autenticação", f"Falha ao autenticar: {e}")
+            self.show_error("Erro de Autenticação", f"Falha ao autenticar: {e}")
             return None
 
-    def get_answer_key(self, question_row):
-        correct_text = limpar_texto(question_row.get('Correta', ''))
-        if not correct_text:
-            return None, 'RADIO'
-
-        separators = [';', ' e ', ',']
-        is_checkbox = any(sep in correct_text.lower() for sep in separators) and correct_text.count(' ') > 1
-
-        if is_checkbox or limpar_texto(question_row.get('Enunciado', '')).lower().startswith("quais"):
-            question_type = 'CHECKBOX'
-            correct_values = []
-            for col in [chr(65 + i) for i in range(26)]:
-                option_text = limpar_texto(question_row.get(col, ''))
-                if pd.notna(option_text) and option_text and option_text in correct_text:
-                    correct_values.append(option_text)
-            if not correct_values:
-                correct_values = [correct_text]
-            return correct_values, question_type
-
-        question_type = 'RADIO'
-        return [correct_text], question_type
-
-    def criar_forms_google(self, service, form_title, questions_df, form_total_start_progress, form_total_end_progress):
+    @etapa('forms')
+    def criar_forms_google(self, service, form, form_total_start_progress, form_total_end_progress):
+        """
+        Cria um Forms planejado por `core.build_forms` e envia seus lotes.
+
+        Returns:
+            tuple: (form_id ou None, int questões criadas, int lotes que falharam).
+        """
         try:
-            form = service.forms().create(body={'info': {'title': limpar_texto(form_title)}}).execute()
-            form_id = form['formId']
+            form_id = service.forms().create(body=form['create']).execute()['formId']
         except HttpError as e:
-            messagebox.showerror("Erro de Criação", f"Não foi possível criar o Forms: {e}")
-            return None, 0
-
-        # Ativar modo quiz
-        service.forms().batchUpdate(
-            formId=form_id,
-            body={'requests': [{
-                'updateSettings': {
-                    'settings': {'quizSettings': {'isQuiz': True}},
-                    'updateMask': 'quizSettings.isQuiz'
-                }
-            }]}
-        ).execute()
-
-        # Dentro da função criar_forms_google
-        requests = []
-        index = 0  # índice crescente
-
-        for _, question_row in questions_df.iterrows():
-            title_text = limpar_texto(f"Q{str(question_row.get('Número', '')).strip()}: {question_row.get('Enunciado', '')}")
-            correct_values, question_type = self.get_answer_key(question_row)
-
-            options = []
-            option_cols = [col for col in question_row.index if len(col) == 1 and 'A' <= col <= 'Z']
-            option_set = set()
-
-            for col in option_cols:
-                option_text = question_row.get(col, '')
-                if pd.isna(option_text) or not str(option_text).strip():
-                    continue  # pula valores vazios ou NaN
-                option_text = limpar_texto(option_text)
-                if option_text not in option_set:
-                    options.append({'value': option_text})
-                    option_set.add(option_text)
-
-            if not options:
-                continue  # pula questões sem opções válidas
-
-            answer_key_texts = [opt['value'] for opt in options if correct_values and opt['value'] in correct_values]
-
-            grading = {
-                'pointValue': 1,
-                'correctAnswers': {'answers': [{'value': v} for v in answer_key_texts]}
-            } if answer_key_texts else None
-
-            question_body = {
-                'required': True,
-                'choiceQuestion': {
-                    'type': question_type,
-                    'options': options,
-                    'shuffle': True
-                }
-            }
-            if grading:
-                question_body['grading'] = grading
-
-            requests.append({
-                'createItem': {
-                    'item': {
-                        'title': title_text,
-                        'questionItem': {'question': question_body}
-                    },
-                    'location': {'index': index}  # índice crescente
-                }
-            })
-            index += 1  # incrementa para próxima pergunta
+            self.show_error("Erro de Criação", f"Não foi possível criar o Forms: {e}")
+            return None, 0, 0
+
+        # O primeiro lote ativa o modo quiz
+        quiz_batch, *item_batches = form['batches']
+        service.forms().batchUpdate(formId=form_id, body=quiz_batch).execute()
+
+        def enviar(batch_requests):
+            service.forms().batchUpdate(formId=form_id, body={'requests': batch_requests}).execute()
 
         created_count = 0
-        total_requests = len(requests)
+        falhas = 0
+        total_requests = sum(len(batch['requests']) for batch in item_batches)
+        enviados = 0
 
-        # Envia em blocos maiores (10 por vez) e continua mesmo se alguma falhar
-        for i in range(0, total_requests, 10):
-            batch = requests[i:i + 10]
+        # Continua mesmo se algum lote falhar; itens recusados são isolados por bisseção e só eles ficam de fora
+        for j, batch in enumerate(item_batches):
+            enviados += len(batch['requests'])
             try:
-                service.forms().batchUpdate(formId=form_id, body={'requests': batch}).execute()
-                created_count += len(batch)
-                progress = form_total_start_progress + (created_count / total_requests) * (form_total_end_progress - form_total_start_progress)
+                criadas, rejeitadas = enviar_lote(enviar, batch['requests'], created_count, erros=(HttpError,))
+                created_count += criadas
+                if rejeitadas:
+                    print(formatar_rejeitadas(rejeitadas, form['title']))
+                progress = form_total_start_progress + (enviados / total_requests) * (form_total_end_progress - form_total_start_progress)
                 self.update_progress(progress, f"Adicionando questões: {created_count}/{total_requests}...")
                 time.sleep(0.3)
             except HttpError as e:
-                print(f"⚠️ Erro ao adicionar lote {i//10+1}: {e}")
+                print(f"⚠️ Erro ao adicionar lote {j + 1}: {e}")
+                created_count += progresso_parcial(e)[0] # Itens criados antes da interrupção
+                falhas += 1
                 continue  # Não para o processo — apenas pula o lote problemático
 
-        return form_id, created_count
-
-    def run_creation_logic(self):
-        self.btn_start.config(state=tk.DISABLED)
-        self.progress_bar.config(value=0)
-
-        file_path = filedialog.askopenfilename(
-            title="Selecione o arquivo Excel de Questões",
-            filetypes=[("Arquivos Excel", "*.xlsx")]
-        )
-        if not file_path:
-            self.btn_start.config(state=tk.NORMAL)
-            return
+        return form_id, created_count, falhas
 
-        self.service = self.autenticar_google()
-        if not self.service:
-            self.btn_start.config(state=tk.NORMAL)
-            return
+    def run_creation_logic(self, file_path):
+        try:
+            self.service = self.autenticar_google()
+            if not self.service:
+                return
+
+            with etapa('extracao'):
+                df = pd.read_excel(file_path)
+                df = df[df['Enunciado'].notna()]
+                questions = [Question.from_dict(row) for row in df.to_dict('records')]
+
+            # Ignora questões que já estão no banco (as novas só são registradas depois de publicadas)
+            with etapa('banco'):
+                novas, duplicadas = self.banco.filtrar_novas(questions)
+            if duplicadas:
+                print(f"ℹ️ {len(duplicadas)} questão(ões) já presentes no banco foram ignoradas.")
+
+            if not novas:
+                self.ui.call(messagebox.showinfo, "Aviso", "Nenhuma questão nova encontrada.")
+                return
+
+            form_links = self.criar_forms_em_partes(
+                os.path.basename(file_path).replace('.xlsx', ''), novas, origem=os.path.basename(file_path)
+            )
 
-        df = pd.read_excel(file_path)
-        df = df[df['Enunciado'].notna()]
-        total = len(df)
-        if total == 0:
-            messagebox.showinfo("Aviso", "Nenhuma questão válida encontrada.")
-            self.btn_start.config(state=tk.NORMAL)
-            return
+            self.update_progress(100, "Processo concluído com sucesso ✅")
+            if form_links:
+                self.ui.call(messagebox.showinfo, "Sucesso", "\n".join(form_links))
+        finally:
+            self.ui.post(self._finish_run)
+
+    def criar_forms_em_partes(self, base_title, questions, origem=None):
+        """
+        Cria os Forms das questões. Com `origem` (planilha de onde vieram), as questões de cada
+        Forms criado sem lotes perdidos são registradas no banco.
+        """
+        # Mescla questões quase duplicadas antes de dividir em partes
+        with etapa('deduplicacao'):
+            questions, relatorio = remover_quase_duplicadas(questions, NEAR_DUP_THRESHOLD)
+        if relatorio:
+            print(formatar_relatorio(relatorio))
 
-        num_forms = (total + MAX_QUESTIONS_PER_FORM - 1) // MAX_QUESTIONS_PER_FORM
         form_links = []
 
-        for i in range(num_forms):
-            start = i * MAX_QUESTIONS_PER_FORM
-            end = min(total, start + MAX_QUESTIONS_PER_FORM)
-            part_df = df.iloc[start:end]
-            title = f"{os.path.basename(file_path).replace('.xlsx','')} - Parte {i + 1} ({len(part_df)} Q)"
-            form_id, created = self.criar_forms_google(self.service, title, part_df, 40, 90)
+        # Mesma divisão, títulos e lotes do App.py (um Forms por parte ou um Forms único paginado)
+        with etapa('requisicoes'):
+            forms = build_forms(questions, base_title, MAX_QUESTIONS_PER_FORM, layout=FORMS_LAYOUT)
+        for form in forms:
+            form_id, created, falhas = self.criar_forms_google(self.service, form, 40, 90)
             if form_id:
                 link = f"https://docs.google.com/forms/d/{form_id}/edit"
-                print(f"✅ Formulário '{title}' criado ({created} questões). Link: {link}")
+                print(f"✅ Formulário '{form['title']}' criado ({created} questões). Link: {link}")
                 form_links.append(link)
+                if origem and not falhas:
+                    inicio, fim = form['intervalo']
+                    with etapa('banco'):
+                        self.banco.adicionar(questions[inicio:fim], origem=origem)
 
-        self.update_progress(100, "Processo concluído com sucesso ✅")
-        if form_links:
-            messagebox.showinfo("Sucesso", "\n".join(form_links))
-        self.btn_start.config(state=tk.NORMAL)
+        return form_links
+
+    def run_bank_logic(self, termo):
+        try:
+            with etapa('banco'):
+                questions = [Question.from_dict(row) for row in self.banco.buscar(termo=termo or None)]
+            if not questions:
+                self.ui.call(messagebox.showinfo, "Aviso", "Nenhuma questão encontrada no banco.")
+                return
+
+            self.service = self.autenticar_google()
+            if self.service:
+                form_links = self.criar_forms_em_partes(f"Banco - {termo}" if termo else "Banco de Questões", questions)
+                self.update_progress(100, "Processo concluído com sucesso ✅")
+                if form_links:
+                    self.ui.call(messagebox.showinfo, "Sucesso", "\n".join(form_links))
+        finally:
+            self.ui.post(self._finish_run)
 
     def run_process_in_thread(self):
-        threading.Thread(target=self.run_creation_logic).start()
+        # Diálogos ficam na thread principal; só o trabalho pesado vai para a thread
+        file_path = filedialog.askopenfilename(
+            title="Selecione o arquivo Excel de Questões",
+            filetypes=[("Arquivos Excel", "*.xlsx")]
+        )
+        if not file_path:
+            return
+
+        self._set_buttons_state(tk.DISABLED)
+        self.progress_bar.config(value=0)
+        profile_base = os.path.splitext(file_path)[0] if self.profile_var.get() else None
+        threading.Thread(
+            target=self._run_with_profile, args=(profile_base, self.run_creation_logic, file_path), daemon=True
+        ).start()
+
+    def run_bank_in_thread(self):
+        termo = simpledialog.askstring(
+            "Banco de Questões",
+            f"{self.banco.total()} questões no banco.\nFiltrar enunciados contendo (vazio = todas):",
+            parent=self.master
+        )
+        if termo is None:
+            return
+
+        self._set_buttons_state(tk.DISABLED)
+        self.progress_bar.config(value=0)
+        profile_base = os.path.splitext(BANCO_FILE)[0] if self.profile_var.get() else None
+        threading.Thread(
+            target=self._run_with_profile, args=(profile_base, self.run_bank_logic, termo.strip()), daemon=True
+        ).start()
 
 
 if __name__ == '__main__':
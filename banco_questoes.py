@@ -0,0 +1,314 @@
+"""
+Banco de questões persistente (SQLite) com índice por impressão digital normalizada.
+
+Cada questão é identificada por um hash do enunciado + alternativas normalizados
+(sem acentos, caixa, pontuação e espaços extras; alternativas em ordem alfabética),
+de modo que a mesma questão vinda de simulados diferentes seja reconhecida e não
+seja enviada de novo ao Gemini nem ao Google Forms.
+
+As questões usam o mesmo formato de dicionário do pipeline:
+chaves 'Número', 'Enunciado', 'Correta', 'A', 'B', ...
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import closing
+
+BANCO_FILE = 'banco_questoes.db' # Arquivo SQLite padrão do banco de questões
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL,
+    numero TEXT,
+    enunciado TEXT NOT NULL,
+    alternativas TEXT NOT NULL,
+    correta TEXT,
+    origem TEXT,
+    trecho TEXT,
+    criado_em REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questoes_fingerprint ON questoes (fingerprint);
+CREATE INDEX IF NOT EXISTS idx_questoes_origem ON questoes (origem);
+CREATE INDEX IF NOT EXISTS idx_questoes_trecho ON questoes (trecho);
+CREATE TABLE IF NOT EXISTS trechos (
+    hash TEXT PRIMARY KEY,
+    origem TEXT,
+    criado_em REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segmentos (
+    hash TEXT PRIMARY KEY,
+    questoes TEXT NOT NULL,
+    origem TEXT,
+    criado_em REAL NOT NULL
+);
+"""
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza um texto para comparação: remove acentos, converte para minúsculas,
+    troca pontuação por espaço e colapsa espaços repetidos.
+    """
+    if texto is None or (isinstance(texto, float) and texto != texto): # None ou NaN (pandas)
+        return ""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'\W+', ' ', texto.lower())
+    return texto.strip()
+
+
+def alternativas_da_questao(question_row):
+    """Retorna a lista de alternativas (colunas 'A'..'Z', em ordem) não vazias de uma questão."""
+    if hasattr(question_row, 'options'): # core.Question: alternativas já limpas numa tupla
+        return list(question_row.options)
+    alternativas = []
+    for col in [chr(65 + i) for i in range(26)]:
+        valor = question_row.get(col, '')
+        if valor is None or (isinstance(valor, float) and valor != valor) or not str(valor).strip():
+            continue
+        alternativas.append(str(valor).strip())
+    return alternativas
+
+
+def fingerprint_questao(question_row):
+    """
+    Calcula a impressão digital (SHA-1) de uma questão a partir do enunciado
+    e das alternativas normalizados. A ordem das alternativas não importa.
+    """
+    enunciado = normalizar_texto(question_row.get('Enunciado', ''))
+    alternativas = sorted(normalizar_texto(a) for a in alternativas_da_questao(question_row))
+    chave = enunciado + '\x1f' + '\x1f'.join(alternativas)
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()
+
+
+def hash_trecho(texto):
+    """Hash de um trecho de texto (ex.: o texto do PDF enviado ao Gemini), após normalização."""
+    return hashlib.sha1(normalizar_texto(texto).encode('utf-8')).hexdigest()
+
+
+class BancoQuestoes:
+    """
+    Acesso ao banco SQLite de questões. Cada operação abre sua própria conexão,
+    portanto a mesma instância pode ser usada pela thread da GUI e pelas threads de trabalho.
+    """
+    def __init__(self, path=BANCO_FILE):
+        self.path = path
+        self._lock = threading.Lock() # Serializa escritas concorrentes do mesmo processo
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # --- Consulta de duplicatas ---
+
+    def contem(self, question_row):
+        """Indica se a questão (ou uma idêntica após normalização) já está no banco."""
+        return bool(self.fingerprints_existentes([fingerprint_questao(question_row)]))
+
+    def fingerprints_existentes(self, fingerprints, ignorar_origens=()):
+        """
+        Retorna o subconjunto de `fingerprints` que já está no banco, desconsiderando as
+        questões registradas com uma das `ignorar_origens`.
+        """
+        fingerprints = list(fingerprints)
+        ignorar_origens = list(ignorar_origens)
+        filtro_origem = ""
+        if ignorar_origens:
+            filtro_origem = f" AND (origem IS NULL OR origem NOT IN ({','.join('?' * len(ignorar_origens))}))"
+        existentes = set()
+        with closing(self._connect()) as conn:
+            # Consulta em blocos para respeitar o limite de parâmetros do SQLite
+            for i in range(0, len(fingerprints), 500):
+                bloco = fingerprints[i:i + 500]
+                placeholders = ','.join('?' * len(bloco))
+                cur = conn.execute(
+                    f"SELECT fingerprint FROM questoes WHERE fingerprint IN ({placeholders}){filtro_origem}",
+                    bloco + ignorar_origens
+                )
+                existentes.update(row[0] for row in cur)
+        return existentes
+
+    def filtrar_novas(self, questions_list, ignorar_origens=(), manter=()):
+        """
+        Separa as questões que ainda não estão no banco das duplicatas exatas.
+        Duplicatas dentro da própria lista também são descartadas.
+
+        Args:
+            questions_list (list): Questões a filtrar.
+            ignorar_origens (iterable): Origens cujas questões não contam como duplicatas
+                                        (ex.: versões anteriores do mesmo PDF).
+            manter (iterable): Impressões digitais que nunca são tratadas como duplicatas do
+                               banco (ex.: questões reaproveitadas do cache de segmentos).
+
+        Returns:
+            tuple: (list de questões novas, list de questões duplicadas).
+        """
+        fingerprints = [fingerprint_questao(q) for q in questions_list]
+        vistos = self.fingerprints_existentes(fingerprints, ignorar_origens) - set(manter)
+        novas, duplicadas = [], []
+        for q, fp in zip(questions_list, fingerprints):
+            if fp in vistos:
+                duplicadas.append(q)
+            else:
+                vistos.add(fp)
+                novas.append(q)
+        return novas, duplicadas
+
+    # --- Inserção ---
+
+    def adicionar(self, questions_list, origem=None, trecho=None):
+        """
+        Insere as questões no banco, ignorando as que já existem.
+
+        Args:
+            questions_list (list): Lista de dicionários de questões.
+            origem (str): Identificação do arquivo de origem (ex.: nome do PDF).
+            trecho (str): Hash do trecho de texto que originou as questões (opcional).
+
+        Returns:
+            int: Quantidade de questões efetivamente inseridas.
+        """
+        agora = time.time()
+        linhas = [
+            (
+                fingerprint_questao(q),
+                str(q.get('Número', '')).strip(),
+                str(q.get('Enunciado', '')).strip(),
+                json.dumps(alternativas_da_questao(q), ensure_ascii=False),
+                str(q.get('Correta', '') or '').strip(),
+                origem,
+                trecho,
+                agora,
+            )
+            for q in questions_list
+        ]
+        with self._lock, closing(self._connect()) as conn:
+            antes = conn.total_changes
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO questoes "
+                    "(fingerprint, numero, enunciado, alternativas, correta, origem, trecho, criado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    linhas
+                )
+            return conn.total_changes - antes
+
+    # --- Trechos já enviados ao Gemini ---
+
+    def trecho_processado(self, texto):
+        """Indica se este trecho de texto já foi enviado ao Gemini anteriormente."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute("SELECT 1 FROM trechos WHERE hash = ?", (hash_trecho(texto),))
+            return cur.fetchone() is not None
+
+    def registrar_trecho(self, texto, origem=None):
+        """Marca o trecho como processado e retorna seu hash."""
+        h = hash_trecho(texto)
+        with self._lock, closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO trechos (hash, origem, criado_em) VALUES (?, ?, ?)",
+                    (h, origem, time.time())
+                )
+        return h
+
+    def questoes_do_trecho(self, texto):
+        """Retorna as questões que foram extraídas de um trecho já processado."""
+        return self._consultar("WHERE trecho = ?", (hash_trecho(texto),))
+
+    # --- Segmentos de páginas (reprocessamento incremental, veja reprocessamento.py) ---
+
+    def questoes_do_segmento(self, chave):
+        """Questões extraídas de um segmento de páginas já processado (None se o segmento é desconhecido)."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT questoes FROM segmentos WHERE hash = ?", (chave,)).fetchone()
+        if row is None:
+            return None
+        questions = []
+        for numero, enunciado, alternativas, correta in json.loads(row[0]):
+            q = {"Número": numero, "Enunciado": enunciado, "Correta": correta or ""}
+            for i, alt in enumerate(alternativas):
+                q[chr(65 + i)] = alt
+            questions.append(q)
+        return questions
+
+    def origens_dos_segmentos(self, chaves):
+        """Origens (nomes de arquivo) registradas junto dos segmentos `chaves` já processados."""
+        chaves = list(chaves)
+        origens = set()
+        with closing(self._connect()) as conn:
+            for i in range(0, len(chaves), 500):
+                bloco = chaves[i:i + 500]
+                placeholders = ','.join('?' * len(bloco))
+                cur = conn.execute(f"SELECT DISTINCT origem FROM segmentos WHERE hash IN ({placeholders})", bloco)
+                origens.update(row[0] for row in cur if row[0])
+        return origens
+
+    def registrar_segmento(self, chave, questions_list, origem=None):
+        """Guarda as questões extraídas de um segmento de páginas (mesmo que nenhuma)."""
+        linhas = [
+            [str(q.get('Número', '')), str(q.get('Enunciado', '')), alternativas_da_questao(q), str(q.get('Correta', '') or '')]
+            for q in questions_list
+        ]
+        with self._lock, closing(self._connect()) as conn:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO segmentos (hash, questoes, origem, criado_em) VALUES (?, ?, ?, ?)",
+                    (chave, json.dumps(linhas, ensure_ascii=False), origem, time.time())
+                )
+
+    # --- Consultas para montar Forms a partir do banco ---
+
+    def buscar(self, termo=None, origem=None, limite=None):
+        """
+        Consulta questões do banco.
+
+        Args:
+            termo (str): Texto a procurar no enunciado (LIKE, sem diferenciar caixa).
+            origem (str): Filtra pela origem (nome do arquivo).
+            limite (int): Máximo de questões retornadas.
+
+        Returns:
+            list: Lista de dicionários no formato do pipeline.
+        """
+        condicoes, params = [], []
+        if termo:
+            condicoes.append("enunciado LIKE ?")
+            params.append(f"%{termo}%")
+        if origem:
+            condicoes.append("origem = ?")
+            params.append(origem)
+        where = ("WHERE " + " AND ".join(condicoes)) if condicoes else ""
+        return self._consultar(where, params, limite)
+
+    def origens(self):
+        """Lista as origens (arquivos) presentes no banco."""
+        with closing(self._connect()) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT origem FROM questoes WHERE origem IS NOT NULL ORDER BY origem")]
+
+    def total(self):
+        """Quantidade de questões no banco."""
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM questoes").fetchone()[0]
+
+    def _consultar(self, where, params, limite=None):
+        sql = f"SELECT numero, enunciado, alternativas, correta FROM questoes {where} ORDER BY id"
+        params = list(params)
+        if limite:
+            sql += " LIMIT ?"
+            params.append(int(limite))
+        with closing(self._connect()) as conn:
+            cur = conn.execute(sql, params)
+            questions = []
+            for numero, enunciado, alternativas, correta in cur:
+                q = {"Número": numero, "Enunciado": enunciado, "Correta": correta or ""}
+                for i, alt in enumerate(json.loads(alternativas)):
+                    q[chr(65 + i)] = alt
+                questions.append(q)
+            return questions
@@ -0,0 +1,307 @@
+"""
+Benchmark do envio de texto x envio direto do PDF ao Gemini (GEMINI_PDF_INPUT no App.py).
+
+Para cada PDF, roda os dois caminhos de extração do pipeline e mede:
+- a latência ponta a ponta (extração local + chamadas + continuações + mesclagem);
+- a acurácia contra um gabarito: questões encontradas, enunciado igual e resposta
+  correta igual, comparando pelo número da questão. O gabarito é lido de
+  <pdf>.gabarito.json (lista no mesmo formato JSON pedido ao Gemini). Sem gabarito,
+  o caminho de texto serve de referência para o do PDF.
+
+Por padrão as chamadas vão para `ClienteGeminiSimulado`, que responde sem rede: lê as
+questões do texto recebido (ou das páginas do PDF anexado) e devolve o JSON com uma
+latência modelada pelos tokens de entrada e de saída, truncando a saída acima de
+`max_saida` tokens. Assim se mede o custo do encanamento de cada modo (extração local,
+divisão em partes, sobreposição, continuação) sem gastar cota. Como o simulado lê as
+questões localmente nos dois modos, essa rodada não diz nada sobre a acurácia do envio
+direto: ela é marcada como simulação e só a latência é informada. A acurácia só é medida
+com --real, em que as chamadas vão para o cliente Gemini compartilhado, para escolher o
+modo por tipo de documento (ex.: PDFs com colunas, tabelas ou escaneados).
+
+Uso:
+    python benchmark_envio.py simulado1.pdf simulado2.pdf [--real] [--paginas 10] [--saida resultado.json]
+"""
+import argparse
+import difflib
+import io
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+import PyPDF2
+
+import App as pipeline
+from agendador_gemini import TOKENS_PER_PDF_PAGE, estimar_tokens
+from banco_questoes import normalizar_texto
+from core import Question
+from envio_pdf import PDF_PAGES_PER_PART, extrair_questoes_do_pdf
+from gemini_client import get_gemini_client
+
+GABARITO_SUFFIX = '.gabarito.json'
+SIMILARIDADE_ENUNCIADO = 0.9 # Razão mínima (difflib) para considerar o enunciado igual
+
+# Modelo de latência do cliente simulado (segundos)
+LATENCIA_BASE = 0.8 # Ida e volta + fila do modelo
+LATENCIA_POR_TOKEN_ENTRADA = 0.00002 # Leitura do prompt (~50 mil tokens/s)
+LATENCIA_POR_TOKEN_SAIDA = 0.004 # Geração (~250 tokens/s)
+MAX_SAIDA_SIMULADA = 8192 # Tokens de saída antes de truncar (finish_reason MAX_TOKENS)
+
+_QUESTAO = re.compile(r'^\s*(\d{1,4})\s*[.)-]\s*(.*)$')
+_ALTERNATIVA = re.compile(r'^\s*\(?([A-Ea-e])\s*[.)-]\s*(.*)$')
+_RESPOSTA = re.compile(r'^\s*(?:resposta|gabarito|correta)\s*:\s*\(?([A-Ea-e])\b', re.IGNORECASE)
+_CONTINUACAO = re.compile(r'número maior que (\d+)')
+
+
+def questoes_do_texto(texto):
+    """
+    Lê questões num layout simples ("12. enunciado", "A) alternativa", "Resposta: B"),
+    no formato JSON pedido ao Gemini. É o "modelo" do cliente simulado.
+    """
+    questoes = []
+    atual = None
+    campo = None
+    for linha in texto.splitlines():
+        if not linha.strip():
+            continue
+        resposta = _RESPOSTA.match(linha)
+        questao = _QUESTAO.match(linha)
+        alternativa = _ALTERNATIVA.match(linha)
+        if resposta and atual is not None:
+            atual['_letra'] = resposta.group(1).upper()
+            campo = None
+        elif questao:
+            atual = {'numero': int(questao.group(1)), 'enunciado': questao.group(2).strip(), 'alternativas': []}
+            questoes.append(atual)
+            campo = 'enunciado'
+        elif alternativa and atual is not None:
+            atual['alternativas'].append(alternativa.group(2).strip())
+            campo = 'alternativa'
+        elif atual is not None and campo == 'enunciado':
+            atual['enunciado'] += ' ' + linha.strip()
+        elif atual is not None and campo == 'alternativa':
+            atual['alternativas'][-1] += ' ' + linha.strip()
+
+    for questao in questoes:
+        letra = questao.pop('_letra', None)
+        indice = ord(letra) - ord('A') if letra else -1
+        questao['correta'] = questao['alternativas'][indice] if 0 <= indice < len(questao['alternativas']) else ''
+    return questoes
+
+
+class ClienteGeminiSimulado:
+    """
+    Substituto do GeminiClient (mesma interface `generate_content_sync`) que responde
+    sem rede, com latência proporcional aos tokens.
+    """
+    def __init__(self, escala=1.0, max_saida=MAX_SAIDA_SIMULADA):
+        self.escala = escala
+        self.max_saida = max_saida
+        self.chamadas = 0
+        self.tokens_entrada = 0
+        self.tokens_saida = 0
+
+    def _ler_pedido(self, contents):
+        """Texto do documento e tokens de entrada, para prompt de texto ou com PDF anexado."""
+        if isinstance(contents, str):
+            _, _, documento = contents.partition("CONTEÚDO DO PDF")
+            return contents, documento, estimar_tokens(contents)
+        prompt = ''.join(p for p in contents if isinstance(p, str))
+        documento = ''
+        tokens = estimar_tokens(prompt)
+        for parte in contents:
+            dados = getattr(getattr(parte, 'inline_data', None), 'data', None)
+            if dados:
+                reader = PyPDF2.PdfReader(io.BytesIO(dados))
+                documento += '\n'.join((page.extract_text() or '') for page in reader.pages)
+                tokens += len(reader.pages) * TOKENS_PER_PDF_PAGE
+        return prompt, documento, tokens
+
+    def generate_content_sync(self, contents, model=None, config=None, cancel_token=None, **kwargs):
+        prompt, documento, entrada = self._ler_pedido(contents)
+        questoes = questoes_do_texto(documento)
+        continuacao = _CONTINUACAO.search(prompt)
+        if continuacao:
+            questoes = [q for q in questoes if q['numero'] > int(continuacao.group(1))]
+
+        texto = "```json\n" + json.dumps(questoes, ensure_ascii=False, indent=2) + "\n```"
+        saida = estimar_tokens(texto)
+        motivo = 'STOP'
+        if self.max_saida and saida > self.max_saida:
+            texto = texto[:self.max_saida * 4] # Mesma razão de caracteres por token do agendador
+            saida = self.max_saida
+            motivo = 'MAX_TOKENS'
+
+        latencia = LATENCIA_BASE + entrada * LATENCIA_POR_TOKEN_ENTRADA + saida * LATENCIA_POR_TOKEN_SAIDA
+        if cancel_token:
+            cancel_token.check()
+        time.sleep(latencia * self.escala)
+        self.chamadas += 1
+        self.tokens_entrada += entrada
+        self.tokens_saida += saida
+        return SimpleNamespace(text=texto, candidates=[SimpleNamespace(finish_reason=motivo)])
+
+    def queue_stats(self):
+        return {}
+
+
+# --- Caminhos comparados ---
+
+def caminho_texto(pdf_path, client):
+    """Extração local do texto + envio da string (fluxo padrão do App.py)."""
+    texto = pipeline.extract_text_from_pdf(pdf_path)
+    resposta = pipeline.send_to_gemini(texto, client=client, job='benchmark-texto')
+    return pipeline.parse_gemini_response_to_list(resposta)
+
+
+def caminho_pdf(pdf_path, client, paginas_por_parte=PDF_PAGES_PER_PART):
+    """PDF (ou partes dele) anexado à chamada (GEMINI_PDF_INPUT)."""
+    return extrair_questoes_do_pdf(
+        pdf_path, pipeline.EXTRACTION_INSTRUCTIONS, pipeline.parse_gemini_response_to_list, client,
+        job='benchmark-pdf', paginas_por_parte=paginas_por_parte
+    )
+
+
+# --- Acurácia ---
+
+def carregar_gabarito(pdf_path):
+    """Questões esperadas de <pdf>.gabarito.json, ou None se o arquivo não existir."""
+    caminho = os.path.splitext(pdf_path)[0] + GABARITO_SUFFIX
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as f:
+        return [Question.from_gemini(item) for item in json.load(f)]
+
+
+def _enunciado_igual(a, b):
+    a, b = normalizar_texto(a), normalizar_texto(b)
+    return a == b or difflib.SequenceMatcher(None, a, b).ratio() >= SIMILARIDADE_ENUNCIADO
+
+
+def comparar(esperadas, obtidas):
+    """
+    Compara as questões pelo número.
+
+    Returns:
+        dict: 'esperadas', 'encontradas', 'enunciado_ok', 'correta_ok', 'extras' (números
+              obtidos que não estão no gabarito) e 'acuracia' (fração com enunciado e
+              resposta corretos).
+    """
+    por_numero = {str(q.numero).strip(): q for q in obtidas}
+    encontradas = enunciado_ok = correta_ok = acertos = 0
+    for esperada in esperadas:
+        obtida = por_numero.get(str(esperada.numero).strip())
+        if obtida is None:
+            continue
+        encontradas += 1
+        enunciado = _enunciado_igual(esperada.enunciado, obtida.enunciado)
+        correta = normalizar_texto(esperada.correta) == normalizar_texto(obtida.correta)
+        enunciado_ok += enunciado
+        correta_ok += correta
+        acertos += enunciado and correta
+    numeros_esperados = {str(q.numero).strip() for q in esperadas}
+    return {
+        'esperadas': len(esperadas),
+        'encontradas': encontradas,
+        'enunciado_ok': enunciado_ok,
+        'correta_ok': correta_ok,
+        'extras': len(set(por_numero) - numeros_esperados),
+        'acuracia': round(acertos / len(esperadas), 3) if esperadas else 0.0,
+    }
+
+
+# --- Execução ---
+
+def medir(funcao, *args):
+    """Executa um caminho. Returns: (questões ou None, segundos, erro ou None)."""
+    inicio = time.perf_counter()
+    try:
+        questoes = funcao(*args)
+        return questoes, time.perf_counter() - inicio, None
+    except Exception as e:
+        return None, time.perf_counter() - inicio, str(e)
+
+
+def benchmark_pdf(pdf_path, client, paginas_por_parte=PDF_PAGES_PER_PART, simulado=False):
+    """Roda os dois modos num PDF e devolve a latência de cada um e, fora da simulação, a acurácia."""
+    gabarito = carregar_gabarito(pdf_path)
+    resultados = {}
+    for modo, funcao, args in (('texto', caminho_texto, (pdf_path, client)),
+                               ('pdf', caminho_pdf, (pdf_path, client, paginas_por_parte))):
+        print(f"ℹ️ {os.path.basename(pdf_path)}: modo {modo}...")
+        questoes, segundos, erro = medir(funcao, *args)
+        resultados[modo] = {'segundos': round(segundos, 3), 'questoes': len(questoes or []), 'erro': erro,
+                            '_questoes': questoes}
+
+    if simulado:
+        # O cliente simulado extrai localmente nos dois modos: acurácia não seria do envio direto
+        for resultado in resultados.values():
+            resultado.pop('_questoes')
+        return {'pdf': pdf_path, 'gabarito': gabarito is not None, 'simulado': True, 'modos': resultados}
+
+    referencia = gabarito
+    if referencia is None:
+        # Sem gabarito: o modo de texto é a referência do modo PDF
+        referencia = resultados['texto']['_questoes']
+        print(f"⚠️ Sem {os.path.splitext(os.path.basename(pdf_path))[0] + GABARITO_SUFFIX}; "
+              "comparando o modo PDF com o de texto.")
+    for modo, resultado in resultados.items():
+        questoes = resultado.pop('_questoes')
+        if referencia is not None and questoes is not None and (gabarito is not None or modo == 'pdf'):
+            resultado['acuracia'] = comparar(referencia, questoes)
+    return {'pdf': pdf_path, 'gabarito': gabarito is not None, 'simulado': False, 'modos': resultados}
+
+
+def formatar_resultado(resultado):
+    """Texto legível do resultado de um PDF."""
+    if resultado.get('simulado'):
+        nota = " (SIMULAÇÃO: só latência; a acurácia exige --real)"
+    else:
+        nota = "" if resultado['gabarito'] else " (sem gabarito: PDF comparado ao texto)"
+    linhas = [f"📄 {os.path.basename(resultado['pdf'])}{nota}"]
+    for modo, dados in resultado['modos'].items():
+        if dados['erro']:
+            linhas.append(f"   {modo:>5}: falhou após {dados['segundos']:.2f}s — {dados['erro']}")
+            continue
+        linha = f"   {modo:>5}: {dados['segundos']:.2f}s, {dados['questoes']} questões"
+        acuracia = dados.get('acuracia')
+        if acuracia:
+            linha += (f", acurácia {acuracia['acuracia']:.0%} ({acuracia['encontradas']}/{acuracia['esperadas']} encontradas, "
+                      f"{acuracia['correta_ok']} respostas certas, {acuracia['extras']} a mais)")
+        linhas.append(linha)
+    return "\n".join(linhas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o envio de texto e o envio direto do PDF ao Gemini.")
+    parser.add_argument('pdfs', nargs='+', help="PDFs de teste (gabarito opcional em <pdf>.gabarito.json)")
+    parser.add_argument('--real', action='store_true', help="Usa o Gemini de verdade (consome cota)")
+    parser.add_argument('--paginas', type=int, default=PDF_PAGES_PER_PART, help="Páginas por chamada no modo PDF")
+    parser.add_argument('--escala', type=float, default=1.0,
+                        help="Multiplica a latência do cliente simulado (ex.: 0.1 para rodar mais rápido)")
+    parser.add_argument('--saida', help="Grava os resultados em JSON")
+    args = parser.parse_args()
+
+    if args.real:
+        client = get_gemini_client(hedging=pipeline.GEMINI_HEDGING, rpm=pipeline.GEMINI_RPM, tpm=pipeline.GEMINI_TPM)
+    else:
+        client = ClienteGeminiSimulado(escala=args.escala)
+        pipeline.GEMINI_CONTEXT_CACHE = False # O cache de contexto exige o cliente real
+        print("⚠️ Rodada simulada (sem --real): as respostas vêm de extração local nos dois modos, "
+              "então só a latência do encanamento é comparada, não a acurácia.")
+
+    resultados = []
+    for pdf_path in args.pdfs:
+        resultado = benchmark_pdf(pdf_path, client, args.paginas, simulado=not args.real)
+        resultados.append(resultado)
+        print(formatar_resultado(resultado))
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+        print(f"✅ Resultados salvos em: {args.saida}")
+
+
+if __name__ == '__main__':
+    main()
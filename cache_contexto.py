@@ -0,0 +1,191 @@
+"""
+Cache de contexto do Gemini para o documento reenviado nas continuações.
+
+Quando a resposta do modelo vem truncada (veja continuacao.py), cada pedido de
+continuação repete as instruções e o texto inteiro do PDF só para acrescentar uma
+linha no fim. Com o cache de contexto do Gemini, esse prefixo (instruções + documento)
+é enviado uma vez (`caches.create`) e as continuações passam só o próprio pedido mais o
+nome do cache (`cached_content`). Terminadas as continuações, o cache é apagado
+(`descartar`), para não pagar o armazenamento até a validade.
+
+Um registro local (CACHE_REGISTRY_FILE) guarda o nome e a validade de cada cache,
+por modelo e prefixo. Prefixos menores que o mínimo aceito pela API (CACHE_MIN_TOKENS)
+e falhas na criação caem no envio normal do prompt completo.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from google.genai.errors import APIError
+
+from agendador_gemini import estimar_tokens
+
+CACHE_REGISTRY_FILE = 'cache_contexto.json' # Registro local dos caches criados (nome e validade)
+CACHE_TTL = 600 # Validade (segundos) de cada cache criado no Gemini (as continuações levam minutos)
+CACHE_REFRESH_MARGIN = 120 # Caches que expiram em menos que isso não são mais usados
+CACHE_RETRY_AFTER = 3600 # Após uma falha de criação, espera isso antes de tentar de novo
+CACHE_MIN_TOKENS = 1024 # Mínimo de tokens aceito pelo cache de contexto (gemini-2.5-flash)
+CACHE_MISS_STATUS_CODES = {403, 404} # Erros de uma chamada cujo cache sumiu no servidor
+# Um 400 só é falta de cache se a mensagem apontar o cache (expirado/inexistente); os demais são erros reais
+CACHE_MISS_MESSAGE = re.compile(r'cached\s*content.*(expired|not\s*found|does\s*not\s*exist)', re.IGNORECASE | re.DOTALL)
+
+
+def cache_ausente(erro):
+    """Se `erro` (APIError) indica que o cache usado na chamada expirou ou não existe mais."""
+    codigo = getattr(erro, 'code', None)
+    if codigo in CACHE_MISS_STATUS_CODES:
+        return True
+    return codigo == 400 and bool(CACHE_MISS_MESSAGE.search(str(erro)))
+
+
+def chave_do_prefixo(model, prefixo):
+    """Chave do registro: modelo + hash do prefixo."""
+    return f"{model}:{hashlib.sha1(prefixo.encode('utf-8')).hexdigest()}"
+
+
+class RegistroCaches:
+    """Registro persistente (JSON) dos caches de contexto: chave -> nome e validade."""
+    def __init__(self, path=CACHE_REGISTRY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entradas = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entradas = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Registro de caches '{path}' ilegível, começando vazio: {e}")
+
+    def _salvar(self):
+        if not self.path:
+            return
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self._entradas, f, ensure_ascii=False, indent=2)
+
+    def obter(self, chave, agora=None):
+        """
+        A entrada válida da chave (dict com 'nome' e 'expira_em'), ou None. Uma entrada
+        com 'nome' None indica que o cache está indisponível até 'expira_em'.
+        """
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada and entrada['expira_em'] - CACHE_REFRESH_MARGIN > agora:
+                return entrada
+            return None
+
+    def registrar(self, chave, nome, expira_em, modelo=None):
+        with self._lock:
+            # Descarta as entradas vencidas enquanto isso
+            agora = time.time()
+            self._entradas = {k: v for k, v in self._entradas.items() if v['expira_em'] > agora}
+            self._entradas[chave] = {'nome': nome, 'expira_em': expira_em, 'modelo': modelo}
+            self._salvar()
+
+    def remover(self, chave):
+        with self._lock:
+            if self._entradas.pop(chave, None) is not None:
+                self._salvar()
+
+    def entradas(self):
+        with self._lock:
+            return dict(self._entradas)
+
+
+class GeminiCacheBackend:
+    """Cria e apaga caches de contexto no Gemini pelo cliente compartilhado."""
+    def __init__(self, client):
+        self.client = client # gemini_client.GeminiClient
+
+    def criar(self, model, prefixo, ttl):
+        """Cria o cache com o prefixo. Returns: (nome, expira_em em segundos desde a época)."""
+        cache = self.client.sdk_client.caches.create(
+            model=model,
+            config={'contents': [prefixo], 'ttl': f"{int(ttl)}s", 'display_name': 'appforms-extracao'}
+        )
+        expira_em = cache.expire_time.timestamp() if getattr(cache, 'expire_time', None) else time.time() + ttl
+        return cache.name, expira_em
+
+    def apagar(self, nome):
+        self.client.sdk_client.caches.delete(name=nome)
+
+
+class CacheContexto:
+    """
+    Decide, por chamada, se o prefixo vai pelo cache de contexto ou junto do documento,
+    criando o cache quando preciso e recuperando-se de caches que sumiram no servidor.
+    """
+    def __init__(self, client, backend=None, registro=None, ttl=CACHE_TTL, min_tokens=CACHE_MIN_TOKENS):
+        self.client = client
+        self.backend = backend or GeminiCacheBackend(client)
+        self.registro = registro if registro is not None else RegistroCaches()
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._lock = threading.Lock() # Evita criar o mesmo cache duas vezes em paralelo
+
+    def nome_do_cache(self, model, prefixo):
+        """Nome do cache válido para o prefixo (criando-o se preciso), ou None para enviar o prompt completo."""
+        if estimar_tokens(prefixo) < self.min_tokens:
+            return None # Abaixo do mínimo da API: o cache seria recusado
+        chave = chave_do_prefixo(model, prefixo)
+        with self._lock:
+            entrada = self.registro.obter(chave)
+            if entrada is not None:
+                return entrada['nome']
+            try:
+                nome, expira_em = self.backend.criar(model, prefixo, self.ttl)
+            except Exception as e:
+                print(f"ℹ️ Cache de contexto indisponível ({e}); enviando o prompt completo.")
+                self.registro.registrar(chave, None, time.time() + CACHE_RETRY_AFTER, model)
+                return None
+            self.registro.registrar(chave, nome, expira_em, model)
+            return nome
+
+    def generate(self, prefixo, documento, model, config=None, **kwargs):
+        """
+        Gera a resposta para `prefixo + documento`. Com cache, só `documento` é enviado.
+        Se o cache não existir mais no servidor, ele é descartado e a chamada é refeita
+        com o prompt completo. `kwargs` vão para `generate_content_sync` (timeout, cancel_token...).
+        """
+        config = dict(config or {})
+        nome = self.nome_do_cache(model, prefixo)
+        if nome is None:
+            return self.client.generate_content_sync(contents=prefixo + documento, model=model, config=config, **kwargs)
+        try:
+            return self.client.generate_content_sync(
+                contents=documento, model=model, config={**config, 'cached_content': nome}, **kwargs
+            )
+        except APIError as e:
+            if not cache_ausente(e):
+                raise
+            print(f"⚠️ Cache de contexto '{nome}' recusado ({e}); reenviando o prompt completo.")
+            self.registro.remover(chave_do_prefixo(model, prefixo))
+            return self.client.generate_content_sync(contents=prefixo + documento, model=model, config=config, **kwargs)
+
+    def descartar(self, model, prefixo):
+        """Apaga o cache do prefixo (se houver) no servidor e no registro."""
+        chave = chave_do_prefixo(model, prefixo)
+        with self._lock:
+            entrada = self.registro.obter(chave)
+            self.registro.remover(chave)
+        if entrada and entrada['nome']:
+            try:
+                self.backend.apagar(entrada['nome'])
+            except Exception as e:
+                print(f"ℹ️ Não foi possível apagar o cache de contexto '{entrada['nome']}' ({e}); ele expira sozinho.")
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_context_cache(client):
+    """Retorna o `CacheContexto` compartilhado pelo processo (sobre o cliente informado)."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CacheContexto(client)
+        return _shared_cache
@@ -0,0 +1,155 @@
+"""
+Cancelamento cooperativo e prazos (deadlines) por etapa do pipeline.
+
+Um `CancelToken` é criado para cada execução. As etapas chamam `token.check()` em
+pontos seguros (entre páginas, entre lotes, etc.) e as chamadas bloqueantes de rede
+são aguardadas com `wait_future` / `run_cancellable`, que acordam a cada
+POLL_INTERVAL segundos para verificar o token. Assim, ao clicar em "Cancelar" (ou
+quando o prazo da etapa expira) a thread de trabalho é liberada imediatamente,
+mesmo que a requisição HTTP subjacente ainda esteja pendurada.
+"""
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+POLL_INTERVAL = 0.1 # Intervalo (segundos) entre verificações do token durante uma espera
+
+
+class Cancelled(Exception):
+    """A operação foi cancelada pelo usuário."""
+
+
+class DeadlineExceeded(Cancelled):
+    """O prazo de uma etapa (ou de uma requisição) expirou."""
+
+
+class RequestTimeout(DeadlineExceeded):
+    """
+    Uma única requisição não respondeu no seu prazo próprio (`timeout` de `wait_future`).
+    Ao contrário do prazo da etapa, pode ser tratada como uma falha da requisição.
+    """
+
+
+class CancelToken:
+    """
+    Sinal de cancelamento compartilhado entre a GUI e a thread de trabalho,
+    com prazo opcional para a etapa em andamento.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._stage = None
+        self._deadline = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancela a operação e executa os callbacks registrados (ex.: fechar conexões)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Erro ao liberar recurso no cancelamento: {e}")
+
+    def on_cancel(self, callback):
+        """Registra um callback chamado no cancelamento (imediatamente, se já cancelado)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remaining(self):
+        """Segundos restantes até o prazo da etapa atual (None se não houver prazo)."""
+        with self._lock:
+            deadline = self._deadline
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+
+    def check(self):
+        """Lança `Cancelled` se a operação foi cancelada ou `DeadlineExceeded` se o prazo expirou."""
+        if self._event.is_set():
+            raise Cancelled("Processo cancelado pelo usuário.")
+        with self._lock:
+            stage, deadline = self._stage, self._deadline
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded(f"Tempo limite excedido na etapa '{stage}'.")
+
+    @contextmanager
+    def stage(self, name, timeout=None):
+        """
+        Define o prazo (em segundos) da etapa `name` enquanto o bloco `with` estiver ativo.
+        Etapas aninhadas nunca estendem o prazo da etapa externa.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            previous = (self._stage, self._deadline)
+            if previous[1] is not None and (deadline is None or previous[1] < deadline):
+                deadline = previous[1]
+            self._stage, self._deadline = name, deadline
+        try:
+            self.check()
+            yield self
+        finally:
+            with self._lock:
+                self._stage, self._deadline = previous
+
+
+def wait_future(future, token=None, timeout=None):
+    """
+    Espera o resultado de um `concurrent.futures.Future` verificando o token
+    periodicamente. Em cancelamento ou timeout, o futuro é cancelado; o estouro do
+    `timeout` próprio desta espera lança `RequestTimeout`.
+
+    Args:
+        future (Future): Futuro a aguardar.
+        token (CancelToken): Token de cancelamento (opcional).
+        timeout (float): Prazo próprio desta espera, em segundos (opcional).
+    """
+    limit = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            if token is not None:
+                token.check()
+            if limit is not None and time.monotonic() >= limit:
+                raise RequestTimeout(f"A requisição não respondeu em {timeout} segundos.")
+        except Cancelled:
+            future.cancel()
+            raise
+        try:
+            return future.result(timeout=POLL_INTERVAL)
+        except FutureTimeoutError:
+            continue
+
+
+def run_cancellable(fn, token=None, timeout=None):
+    """
+    Executa `fn()` (ex.: `request.execute`) em uma thread auxiliar e espera o resultado
+    com `wait_future`. Se a espera for interrompida, a thread auxiliar é abandonada
+    (é daemon) e a thread chamadora fica livre na hora.
+    """
+    if token is None and timeout is None:
+        return fn()
+
+    future = Future()
+
+    def runner():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=runner, name="cancellable-call", daemon=True).start()
+    return wait_future(future, token, timeout)
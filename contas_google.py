@@ -0,0 +1,244 @@
+"""
+Pool de contas Google para multiplicar a vazão da Forms API.
+
+As cotas da Forms API são por usuário: com uma única identidade OAuth, o número de
+Forms criados por minuto fica limitado pela cota dessa conta. Este módulo mantém um
+pool de contas (cada uma com seu arquivo de credenciais e seu token salvo) e um
+escalonador que atribui cada Forms inteiro à conta livre com mais cota restante na
+janela atual. Com mais de uma conta, cada Forms criado é registrado com a conta dona
+em DONOS_FILE (com uma só, o dono é sempre ela e nada é gravado).
+
+Formato de CONTAS_FILE (lista JSON):
+
+    [
+        {"nome": "conta1", "credenciais": "chave.json", "token": "token_conta1.json"},
+        {"nome": "conta2", "credenciais": "chave.json", "token": "token_conta2.json",
+         "cota_por_minuto": 300}
+    ]
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+
+from cancelamento import POLL_INTERVAL
+
+CONTAS_FILE = 'contas.json' # Pool de contas; se não existir, usa só o CREDENTIALS_FILE
+DONOS_FILE = 'formularios_contas.jsonl' # Registro de qual conta criou cada Forms
+FORMS_QUOTA_PER_MINUTE = 300 # Requisições de escrita por minuto por conta (ajuste à cota do seu projeto)
+QUOTA_WINDOW = 60 # Janela (segundos) da cota por minuto
+
+
+def custo_formulario(form):
+    """Requisições de escrita de um Forms planejado (core.build_forms): create + um batchUpdate por lote (o primeiro ativa o quiz)."""
+    return 1 + len(form['batches'])
+
+
+def carregar_credenciais(credentials_file, scopes, token_file=None):
+    """
+    Carrega as credenciais OAuth de uma conta. Usa o token salvo (renovando-o se
+    expirado) e só abre o navegador para login quando não há token válido.
+    """
+    creds = None
+    if token_file and os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, scopes)
+    if creds and creds.expired and creds.refresh_token:
+        try:
+            creds.refresh(Request())
+        except Exception as e:
+            print(f"⚠️ Não foi possível renovar o token '{token_file}': {e}")
+            creds = None
+    if not creds or not creds.valid:
+        flow = InstalledAppFlow.from_client_secrets_file(credentials_file, scopes)
+        creds = flow.run_local_server(port=0) # Abre o navegador para o login desta conta
+    if token_file:
+        with open(token_file, 'w', encoding='utf-8') as f:
+            f.write(creds.to_json())
+    return creds
+
+
+class ContaGoogle:
+    """Uma identidade OAuth com seu objeto de serviço e o uso de cota na janela atual."""
+    def __init__(self, nome, service=None, credentials_file=None, token_file=None,
+                 cota_por_minuto=FORMS_QUOTA_PER_MINUTE):
+        self.nome = nome
+        self.service = service
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.cota_por_minuto = cota_por_minuto
+        self.ocupada = False # Um Forms por vez por conta (o objeto de serviço não é thread-safe)
+        self._uso = deque() # (instante, requisições) cobradas na janela
+
+    def conectar(self, scopes):
+        """Autentica a conta e constrói o objeto de serviço da Forms API."""
+        creds = carregar_credenciais(self.credentials_file, scopes, self.token_file)
+        self.service = build('forms', 'v1', credentials=creds)
+        return self.service
+
+    def _limpar_janela(self, agora):
+        while self._uso and self._uso[0][0] <= agora - QUOTA_WINDOW:
+            self._uso.popleft()
+
+    def restante(self, agora=None):
+        """Requisições ainda disponíveis na janela de cota atual."""
+        agora = time.monotonic() if agora is None else agora
+        self._limpar_janela(agora)
+        return self.cota_por_minuto - sum(n for _, n in self._uso)
+
+    def espera_para(self, custo, agora=None):
+        """Segundos até a conta ter `custo` requisições livres (0 se já tiver)."""
+        agora = time.monotonic() if agora is None else agora
+        livre = self.restante(agora)
+        for instante, n in self._uso: # Do uso mais antigo (que expira primeiro) ao mais novo
+            if livre >= custo:
+                break
+            livre += n
+            if livre >= custo:
+                return max(0.0, instante + QUOTA_WINDOW - agora)
+        return 0.0
+
+    def cobrar(self, custo, agora=None):
+        self._uso.append((time.monotonic() if agora is None else agora, custo))
+
+    def close(self):
+        if self.service is not None and hasattr(self.service, 'close'):
+            self.service.close()
+
+    def __repr__(self):
+        return f"ContaGoogle({self.nome!r}, restante={self.restante()})"
+
+
+class PoolContas:
+    """
+    Escalonador de Forms entre contas. `atribuir(custo)` escolhe, entre as contas
+    livres, a de maior cota restante que comporte o Forms inteiro, cobra o custo e a
+    marca como ocupada até `liberar`. Se nenhuma comporta, espera a janela andar.
+    """
+    def __init__(self, contas, donos_file=DONOS_FILE):
+        if not contas:
+            raise ValueError("O pool precisa de pelo menos uma conta.")
+        self.contas = list(contas)
+        self.donos_file = donos_file
+        self._cond = threading.Condition()
+        self._registro_lock = threading.Lock()
+
+    @classmethod
+    def de_servico(cls, service, nome='principal', donos_file=DONOS_FILE):
+        """Pool de uma conta só, a partir de um objeto de serviço já autenticado."""
+        return cls([ContaGoogle(nome, service=service)], donos_file=donos_file)
+
+    @classmethod
+    def carregar(cls, path=CONTAS_FILE, donos_file=DONOS_FILE):
+        """Lê a configuração das contas (veja o formato no topo do módulo)."""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        contas = [
+            ContaGoogle(
+                item.get('nome') or f"conta{i + 1}",
+                credentials_file=item['credenciais'],
+                token_file=item.get('token') or f"token_conta{i + 1}.json",
+                cota_por_minuto=item.get('cota_por_minuto', FORMS_QUOTA_PER_MINUTE),
+            )
+            for i, item in enumerate(config)
+        ]
+        return cls(contas, donos_file=donos_file)
+
+    def conectar(self, scopes, progress_callback=None):
+        """Autentica todas as contas que ainda não têm objeto de serviço."""
+        for i, conta in enumerate(self.contas):
+            if conta.service is None:
+                if progress_callback:
+                    progress_callback(f"Autenticando conta {i + 1}/{len(self.contas)} ({conta.nome})...")
+                conta.conectar(scopes)
+        return self
+
+    def __len__(self):
+        return len(self.contas)
+
+    def __iter__(self):
+        return iter(self.contas)
+
+    def conta(self, nome):
+        """Conta do pool com o nome `nome` (ValueError se não existir)."""
+        for conta in self.contas:
+            if conta.nome == nome:
+                return conta
+        raise ValueError(f"A conta '{nome}' não está no pool.")
+
+    def atribuir(self, custo, cancel_token=None, nome=None):
+        """
+        Reserva uma conta para um Forms de `custo` requisições, esperando (e verificando
+        o token) se todas estiverem ocupadas ou sem cota. Com `nome`, só essa conta serve
+        (ex.: continuar um Forms que ela já criou).
+        """
+        candidatas = [self.conta(nome)] if nome else self.contas
+        with self._cond:
+            while True:
+                if cancel_token:
+                    cancel_token.check()
+                agora = time.monotonic()
+                livres = [c for c in candidatas if not c.ocupada]
+                # Um Forms maior que a cota inteira só precisa da janela vazia
+                cabem = [c for c in livres if c.restante(agora) >= min(custo, c.cota_por_minuto)]
+                if cabem:
+                    conta = max(cabem, key=lambda c: c.restante(agora))
+                    conta.cobrar(custo, agora)
+                    conta.ocupada = True
+                    return conta
+                esperas = [c.espera_para(min(custo, c.cota_por_minuto), agora) for c in livres]
+                espera = min(esperas) if esperas else POLL_INTERVAL
+                self._cond.wait(min(max(espera, 0.01), POLL_INTERVAL))
+
+    def liberar(self, conta):
+        with self._cond:
+            conta.ocupada = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def conta_para(self, custo, cancel_token=None, nome=None):
+        """`with pool.conta_para(custo) as conta:` — atribui e libera a conta."""
+        conta = self.atribuir(custo, cancel_token, nome)
+        try:
+            yield conta
+        finally:
+            self.liberar(conta)
+
+    def registrar_dono(self, form_id, conta, titulo=''):
+        """Registra (em DONOS_FILE) qual conta criou o Forms `form_id`. Com uma conta só, não grava nada."""
+        if not self.donos_file or len(self.contas) == 1:
+            return
+        registro = {
+            'form_id': form_id,
+            'conta': conta.nome,
+            'titulo': titulo,
+            'criado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._registro_lock:
+            with open(self.donos_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def close(self):
+        for conta in self.contas:
+            conta.close()
+
+
+def dono_do_formulario(form_id, donos_file=DONOS_FILE):
+    """Nome da conta que criou o Forms `form_id` (None se não registrado)."""
+    if not os.path.exists(donos_file):
+        return None
+    dono = None
+    with open(donos_file, 'r', encoding='utf-8') as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha:
+                registro = json.loads(linha)
+                if registro.get('form_id') == form_id:
+                    dono = registro.get('conta')
+    return dono
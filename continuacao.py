@@ -0,0 +1,157 @@
+"""
+Leitura tolerante do JSON devolvido pelo Gemini e continuação de respostas truncadas.
+
+Quando o modelo atinge o limite de tokens de saída no meio de um simulado grande, a
+lista JSON chega cortada (finish_reason MAX_TOKENS, colchete sem fechamento). Em vez de
+descartar tudo e refazer a extração inteira, `extrair_json` aproveita os objetos completos
+até o corte e `completar_resposta` pede ao modelo só as questões posteriores ao último
+`numero` completo, juntando as partes numa única lista JSON.
+
+`extrair_json` também substitui a busca por expressão regular não gulosa, que parava no
+primeiro "]" (o fim da lista de alternativas da primeira questão) quando a resposta não
+vinha num bloco ```json.
+"""
+import json
+import re
+
+MAX_CONTINUATIONS = 3 # Pedidos de continuação por resposta (cada um retoma de onde o anterior parou)
+
+_decoder = json.JSONDecoder()
+
+
+def _inicio_do_json(texto):
+    """Posição do primeiro '[' ou '{' do JSON (de preferência dentro de um bloco ```json)."""
+    bloco = re.search(r"```(?:json)?\s*([\[{])", texto)
+    if bloco:
+        return bloco.start(1)
+    posicoes = [p for p in (texto.find('['), texto.find('{')) if p != -1]
+    return min(posicoes) if posicoes else None
+
+
+def _pular_separadores(texto, pos):
+    while pos < len(texto) and (texto[pos].isspace() or texto[pos] == ','):
+        pos += 1
+    return pos
+
+
+def extrair_json(texto):
+    """
+    Decodifica o JSON da resposta do modelo (com ou sem bloco markdown).
+
+    Returns:
+        tuple: (dados, completo). Com o JSON íntegro, `dados` é o valor decodificado e
+               `completo` é True. Com uma lista truncada (inclusive dentro de um objeto como
+               {"perguntas": [...]}), `dados` traz só os itens completos e `completo` é False.
+
+    Raises:
+        ValueError: Se não houver JSON na resposta.
+    """
+    inicio = _inicio_do_json(texto)
+    if inicio is None:
+        raise ValueError("Não foi possível encontrar um JSON válido na resposta da IA.")
+    try:
+        dados, _ = _decoder.raw_decode(texto, inicio)
+        return dados, True
+    except json.JSONDecodeError:
+        pass
+
+    # JSON cortado: recupera os itens completos da primeira lista
+    if texto[inicio] != '[':
+        inicio = texto.find('[', inicio)
+        if inicio == -1:
+            return [], False
+    itens = []
+    pos = _pular_separadores(texto, inicio + 1)
+    while pos < len(texto) and texto[pos] != ']':
+        try:
+            item, pos = _decoder.raw_decode(texto, pos)
+        except json.JSONDecodeError:
+            break
+        itens.append(item)
+        pos = _pular_separadores(texto, pos)
+    return itens, False
+
+
+def lista_de_questoes(dados):
+    """Normaliza o JSON decodificado para uma lista de objetos de questão."""
+    if isinstance(dados, dict):
+        # Trata o caso em que o modelo retorna um dicionário com uma chave 'perguntas': [...]
+        return next((v for v in dados.values() if isinstance(v, list)), [dados])
+    if not isinstance(dados, list):
+        raise TypeError("O JSON decodificado não é uma lista de perguntas válida.")
+    return dados
+
+
+def resposta_truncada(response):
+    """Indica se o modelo parou por atingir o limite de tokens de saída (finish_reason MAX_TOKENS)."""
+    candidatos = getattr(response, 'candidates', None) or []
+    motivo = getattr(candidatos[0], 'finish_reason', None) if candidatos else None
+    return motivo is not None and 'MAX_TOKENS' in str(motivo)
+
+
+def _numero(item):
+    try:
+        return int(str(item.get('numero', '')).strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def ultimo_numero(itens):
+    """Maior `numero` entre as questões completas (None se nenhuma tiver número)."""
+    numeros = [n for n in map(_numero, itens) if n is not None]
+    return max(numeros) if numeros else None
+
+
+def prompt_de_continuacao(ultimo):
+    """Complemento do prompt que pede só as questões após a de número `ultimo`."""
+    return (
+        f"\n\nATENÇÃO: as questões de número 1 a {ultimo} já foram extraídas. "
+        f"Retorne SOMENTE as questões com número maior que {ultimo}, no mesmo formato "
+        "de lista JSON, sem repetir as anteriores."
+    )
+
+
+def completar_resposta(response, continuar, progress_callback=None, max_continuacoes=MAX_CONTINUATIONS):
+    """
+    Se a resposta foi truncada, pede a continuação a partir da última questão completa
+    e junta as partes.
+
+    Args:
+        response: A primeira resposta do modelo.
+        continuar (callable): Recebe o último `numero` completo e retorna a resposta do modelo
+                              para o prompt com `prompt_de_continuacao(ultimo)`.
+        progress_callback (function): Recebe (valor, texto) a cada continuação (opcional).
+        max_continuacoes (int): Máximo de pedidos de continuação.
+
+    Returns:
+        str: O texto da resposta original (se completa) ou uma lista JSON com todas as questões.
+    """
+    texto = (response.text or '').strip()
+    try:
+        dados, completo = extrair_json(texto)
+    except ValueError:
+        return texto # Sem JSON: o parser reporta o erro
+    if completo and not resposta_truncada(response):
+        return texto
+
+    itens = lista_de_questoes(dados) if completo else dados
+    for _ in range(max_continuacoes):
+        ultimo = ultimo_numero(itens)
+        if ultimo is None:
+            break # Sem questão completa numerada, não há de onde continuar
+        print(f"ℹ️ Resposta da IA truncada após a questão {ultimo}; pedindo só as seguintes.")
+        if progress_callback:
+            progress_callback(40, f"2/5 - Resposta truncada, pedindo as questões após a {ultimo}...")
+        response = continuar(ultimo)
+        try:
+            dados, completo = extrair_json((response.text or '').strip())
+        except ValueError:
+            break
+        novos = [item for item in (lista_de_questoes(dados) if completo else dados)
+                 if _numero(item) is None or _numero(item) > ultimo]
+        itens.extend(novos)
+        if (completo and not resposta_truncada(response)) or not novos:
+            break
+    else:
+        print(f"⚠️ Resposta ainda truncada após {max_continuacoes} continuações; usando as questões obtidas.")
+    return json.dumps(itens, ensure_ascii=False)
@@ -0,0 +1,299 @@
+"""
+Modelo compartilhado de questão e construção das requisições da Google Forms API.
+
+`Question` usa __slots__, guarda as alternativas já limpas e sem duplicatas numa
+tupla e pré-calcula o tipo (RADIO/CHECKBOX) e os índices das respostas corretas uma
+única vez. Os três pontos de entrada (App.py, appForms.py e apiPDF.py) usam este
+módulo, em vez de cada um redescobrir as colunas 'A'..'Z' de cada questão.
+
+Para compatibilidade com o código baseado em dicionários (banco_questoes,
+deduplicacao), `Question.get` aceita as chaves antigas: 'Número', 'Enunciado',
+'Correta', 'A', 'B', ...
+"""
+import re
+
+from banco_questoes import normalizar_texto
+
+OPTION_KEYS = tuple(chr(65 + i) for i in range(26)) # 'A'..'Z'
+_OPTION_INDEX = {key: i for i, key in enumerate(OPTION_KEYS)}
+CHECKBOX_SEPARATORS = (';', ' e ', ',') # Separadores que indicam múltiplas respostas corretas
+_LETTER_ANSWER = re.compile(r'^(?:letra\s+)?([a-z])\s*(?:[).:-]\s*(.*))?$', re.IGNORECASE) # "C", "Letra C", "C) texto"
+BATCH_SIZE = 10 # Questões por chamada batchUpdate
+PACKED_BATCH_SIZE = 40 # Requisições (questões + quebras de página) por batchUpdate no Forms único
+
+# Layouts dos Forms (veja `build_forms`)
+LAYOUT_PARTS = 'partes' # Um Forms por parte de `max_per_form` questões
+LAYOUT_SINGLE = 'unico' # Um só Forms, com uma quebra de página a cada `max_per_form` questões
+
+# Requisição que ativa o modo Quiz de um formulário recém-criado
+QUIZ_SETTINGS_REQUEST = {
+    'updateSettings': {
+        'settings': {'quizSettings': {'isQuiz': True}},
+        'updateMask': 'quizSettings.isQuiz'
+    }
+}
+
+
+def _is_empty(value):
+    # None, NaN (células vazias do pandas) ou texto em branco
+    return value is None or (isinstance(value, float) and value != value) or not str(value).strip()
+
+
+def limpar_texto(texto):
+    """Remove quebras de linha e espaços desnecessários de uma string."""
+    if not isinstance(texto, str):
+        texto = str(texto)
+    return texto.replace('\r', ' ').replace('\n', ' ').strip()
+
+
+def compute_answer_key(enunciado, options, correta):
+    """
+    Determina o tipo da questão e os índices (em `options`) das alternativas corretas.
+
+    A questão é CHECKBOX se o texto da 'Correta' tiver separadores de múltiplas respostas
+    ou se o enunciado começar com "quais"; nesse caso, são corretas as alternativas contidas
+    no texto da 'Correta'. Caso contrário é RADIO e a correta é a alternativa idêntica.
+    Sem correspondência exata, compara os textos normalizados (acentos, caixa, pontuação e
+    espaços) e, na RADIO, aceita a letra da alternativa ("C", "Letra C", "C) texto").
+
+    Returns:
+        tuple: (tuple de índices corretos, str 'RADIO' ou 'CHECKBOX'); sem índices se a
+               'Correta' não corresponder a nenhuma alternativa.
+    """
+    if not correta:
+        return (), 'RADIO'
+
+    normalizadas = [normalizar_texto(opt) for opt in options]
+    alvo = normalizar_texto(correta)
+
+    is_checkbox = any(sep in correta.lower() for sep in CHECKBOX_SEPARATORS) and correta.count(' ') > 1
+    if is_checkbox or enunciado.lower().startswith("quais"):
+        indices = tuple(i for i, opt in enumerate(options) if opt in correta)
+        if not indices:
+            indices = tuple(i for i, n in enumerate(normalizadas) if n and f" {n} " in f" {alvo} ")
+        return indices, 'CHECKBOX'
+
+    indices = tuple(i for i, opt in enumerate(options) if opt == correta)
+    if not indices:
+        indices = tuple(i for i, n in enumerate(normalizadas) if n and n == alvo)[:1]
+    if not indices:
+        letra = _LETTER_ANSWER.match(correta)
+        if letra:
+            i = ord(letra.group(1).lower()) - ord('a')
+            resto = normalizar_texto(letra.group(2) or '')
+            if i < len(options) and (not resto or resto == normalizadas[i]):
+                indices = (i,)
+    return indices, 'RADIO'
+
+
+class Question:
+    """Questão de múltipla escolha, compacta e imutável na prática."""
+    __slots__ = ('numero', 'enunciado', 'options', 'correta', 'answer_indices', 'question_type')
+
+    def __init__(self, numero, enunciado, options, correta=''):
+        self.numero = '' if _is_empty(numero) else str(numero).strip()
+        self.enunciado = '' if _is_empty(enunciado) else limpar_texto(enunciado)
+        self.correta = '' if _is_empty(correta) else limpar_texto(correta)
+
+        # Alternativas limpas, sem vazias e sem duplicatas (mantendo a ordem)
+        seen = set()
+        cleaned = []
+        for option in options:
+            if _is_empty(option):
+                continue
+            option = limpar_texto(option)
+            if option not in seen:
+                seen.add(option)
+                cleaned.append(option)
+        self.options = tuple(cleaned)
+
+        self.answer_indices, self.question_type = compute_answer_key(self.enunciado, self.options, self.correta)
+
+    @classmethod
+    def from_dict(cls, row):
+        """Cria a partir do formato antigo (dict ou linha do pandas) com 'Número', 'Enunciado', 'Correta', 'A'..'Z'."""
+        if isinstance(row, cls):
+            return row
+        return cls(
+            row.get('Número', ''),
+            row.get('Enunciado', ''),
+            [row.get(key) for key in OPTION_KEYS if key in row],
+            row.get('Correta', ''),
+        )
+
+    @classmethod
+    def from_gemini(cls, item):
+        """Cria a partir de um objeto do JSON do Gemini (numero, enunciado, alternativas, correta)."""
+        return cls(
+            item.get('numero', ''),
+            item.get('enunciado', '') or '',
+            item.get('alternativas', []) or [],
+            item.get('correta', '') or '',
+        )
+
+    @property
+    def title(self):
+        """Título do item no Forms: 'Q<número>: <enunciado>'."""
+        return limpar_texto(f"Q{self.numero}: {self.enunciado}")
+
+    @property
+    def answers(self):
+        """Textos das alternativas corretas."""
+        return tuple(self.options[i] for i in self.answer_indices)
+
+    def get(self, key, default=''):
+        """Acesso compatível com o formato antigo de dicionário."""
+        if key == 'Número':
+            return self.numero
+        if key == 'Enunciado':
+            return self.enunciado
+        if key == 'Correta':
+            return self.correta
+        index = _OPTION_INDEX.get(key)
+        if index is not None and index < len(self.options):
+            return self.options[index]
+        return default
+
+    def to_dict(self):
+        """Converte para o formato antigo de dicionário (ex.: para gerar Excel)."""
+        row = {'Número': self.numero, 'Enunciado': self.enunciado}
+        row.update(zip(OPTION_KEYS, self.options))
+        row['Correta'] = self.correta
+        return row
+
+    def __repr__(self):
+        return f"Question(numero={self.numero!r}, enunciado={self.enunciado[:40]!r}, options={len(self.options)})"
+
+
+def as_question(obj):
+    """Aceita um `Question` ou um dict/linha no formato antigo e retorna um `Question`."""
+    return obj if isinstance(obj, Question) else Question.from_dict(obj)
+
+
+def build_question_item(question, index, shuffle=True):
+    """
+    Monta a requisição `createItem` de uma questão.
+
+    Returns:
+        dict or None: A requisição, ou None se a questão não tiver alternativas.
+    """
+    if not question.options:
+        return None
+    if not question.answer_indices:
+        # Publicada sem correção automática: avisa em vez de deixar o item sem nota em silêncio
+        motivo = f"gabarito '{question.correta}' não corresponde a nenhuma alternativa" if question.correta else "sem gabarito"
+        print(f"⚠️ Q{question.numero}: {motivo}; a questão entra no Forms sem correção automática.")
+
+    question_body = {
+        'required': True,
+        'choiceQuestion': {
+            'type': question.question_type,
+            'options': [{'value': opt} for opt in question.options],
+            'shuffle': shuffle # Misturar a ordem das opções
+        }
+    }
+    if question.answer_indices:
+        question_body['grading'] = {
+            'pointValue': 1,
+            'correctAnswers': {'answers': [{'value': question.options[i]} for i in question.answer_indices]}
+        }
+
+    return {
+        'createItem': {
+            'item': {'title': question.title, 'questionItem': {'question': question_body}},
+            'location': {'index': index}
+        }
+    }
+
+
+def build_item_requests(questions, start_index=0):
+    """
+    Monta as requisições `createItem` de uma lista de questões, com índices crescentes.
+    Questões sem alternativas são ignoradas.
+
+    Args:
+        questions (iterable): `Question`s (ou dicts no formato antigo).
+        start_index (int): Índice do primeiro item no formulário.
+
+    Returns:
+        list: Lista de requisições para `forms().batchUpdate`.
+    """
+    requests = []
+    index = start_index
+    for question in questions:
+        request = build_question_item(as_question(question), index)
+        if request is not None:
+            requests.append(request)
+            index += 1
+    return requests
+
+
+def build_page_break_item(title, index):
+    """Monta a requisição `createItem` de uma quebra de página (início de uma nova seção)."""
+    return {
+        'createItem': {
+            'item': {'title': title, 'pageBreakItem': {}},
+            'location': {'index': index}
+        }
+    }
+
+
+def build_sectioned_requests(questions, section_size):
+    """
+    Monta as requisições de todas as questões num único formulário, com uma quebra de
+    página antes de cada grupo de `section_size` questões (exceto o primeiro).
+
+    Returns:
+        list: Requisições `createItem` (questões e quebras de página), com índices crescentes.
+    """
+    questions = [as_question(q) for q in questions]
+    requests = []
+    for start in range(0, len(questions), section_size):
+        part = questions[start:start + section_size]
+        if start:
+            title = f"Parte {start // section_size + 1} ({len(part)} Q)"
+            requests.append(build_page_break_item(title, len(requests)))
+        requests.extend(build_item_requests(part, len(requests)))
+    return requests
+
+
+def _planned_form(title, requests, batch_size, inicio, fim):
+    batches = [{'requests': [QUIZ_SETTINGS_REQUEST]}]
+    batches.extend({'requests': requests[j:j + batch_size]} for j in range(0, len(requests), batch_size))
+    return {'title': title, 'create': {'info': {'title': limpar_texto(title)}}, 'batches': batches,
+            'questoes': sum('questionItem' in r['createItem']['item'] for r in requests), 'intervalo': [inicio, fim]}
+
+
+def build_forms(questions, form_title, max_per_form, batch_size=None, layout=LAYOUT_PARTS):
+    """
+    Monta todas as requisições dos Forms, sem acessar a rede.
+
+    Com LAYOUT_PARTS, divide as questões em Forms de até `max_per_form` questões (lotes
+    de BATCH_SIZE). Com LAYOUT_SINGLE, monta um só Forms com todas as questões e uma
+    quebra de página a cada `max_per_form`, em lotes de até PACKED_BATCH_SIZE requisições:
+    cada parte a menos economiza um create, um updateSettings e os lotes parciais.
+
+    Returns:
+        list: Um dict por Forms com 'title', 'create' (corpo de `forms().create`),
+              'batches' (corpos de `forms().batchUpdate`, em ordem: o primeiro ativa o
+              modo Quiz e os demais adicionam até `batch_size` itens cada) e 'questoes'
+              (questões com alternativas, sem contar as quebras de página), além de
+              'intervalo' ([início, fim) das questões deste Forms na lista recebida).
+    """
+    questions = [as_question(q) for q in questions]
+    if not questions:
+        return []
+    if layout == LAYOUT_SINGLE:
+        requests = build_sectioned_requests(questions, max_per_form)
+        title = f"{form_title} ({len(questions)} Q)"
+        return [_planned_form(title, requests, batch_size or PACKED_BATCH_SIZE, 0, len(questions))]
+    if layout != LAYOUT_PARTS:
+        raise ValueError(f"Layout de Forms desconhecido: '{layout}' (use '{LAYOUT_PARTS}' ou '{LAYOUT_SINGLE}').")
+
+    forms = []
+    for start in range(0, len(questions), max_per_form):
+        part = questions[start:start + max_per_form]
+        title = f"{form_title} - Parte {len(forms) + 1} ({len(part)} Q)"
+        forms.append(_planned_form(title, build_item_requests(part), batch_size or BATCH_SIZE,
+                                    start, start + len(part)))
+    return forms
@@ -0,0 +1,189 @@
+"""
+Detecção de questões quase duplicadas com MinHash + LSH (banding).
+
+A mesma questão costuma aparecer em PDFs diferentes com pequenas variações de
+redação. Aqui cada questão vira um conjunto de shingles (5-gramas de caracteres do
+enunciado + alternativas normalizados), resumido por uma assinatura MinHash. O LSH
+agrupa as assinaturas em faixas (bands) para encontrar pares candidatos sem comparar
+todas as questões entre si, o que mantém o custo sub-quadrático mesmo com 100k+ questões.
+Duas questões com respostas corretas diferentes nunca são mescladas, por mais parecidas
+que sejam (ex.: "Qual..." e "Qual... NÃO...", com as mesmas alternativas).
+
+Usa numpy (já instalado junto com o pandas) quando disponível; caso contrário, cai
+para uma implementação em Python puro, mais lenta.
+"""
+import json
+import random
+import zlib
+from collections import defaultdict
+
+from banco_questoes import alternativas_da_questao, normalizar_texto
+
+try:
+    import numpy as np
+except ImportError: # numpy é opcional
+    np = None
+
+NEAR_DUP_THRESHOLD = 0.9 # Similaridade (Jaccard estimado) a partir da qual duas questões são consideradas a mesma
+NUM_PERM = 128 # Número de permutações (tamanho da assinatura MinHash)
+SHINGLE_SIZE = 5 # Tamanho dos shingles (em caracteres)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles_questao(question_row, k=SHINGLE_SIZE):
+    """Conjunto de k-gramas de caracteres do enunciado e das alternativas normalizados."""
+    texto = normalizar_texto(question_row.get('Enunciado', ''))
+    for alt in sorted(normalizar_texto(a) for a in alternativas_da_questao(question_row)):
+        texto += ' | ' + alt
+    if len(texto) <= k:
+        return {texto}
+    return {texto[i:i + k] for i in range(len(texto) - k + 1)}
+
+
+def resposta_questao(question_row):
+    """Resposta correta normalizada (texto da 'Correta'), usada para nunca mesclar questões com gabaritos diferentes."""
+    return normalizar_texto(question_row.get('Correta', ''))
+
+
+def parametros_lsh(threshold, num_perm=NUM_PERM):
+    """
+    Escolhe o número de faixas (b) e linhas por faixa (r), com b * r <= num_perm,
+    cujo limiar aproximado (1/b) ** (1/r) fica mais próximo do limiar pedido.
+    """
+    melhor = None
+    for r in range(1, num_perm + 1):
+        b = num_perm // r
+        erro = abs((1 / b) ** (1 / r) - threshold)
+        if melhor is None or erro < melhor[0]:
+            melhor = (erro, b, r)
+    return melhor[1], melhor[2]
+
+
+class MinHasher:
+    """Gera assinaturas MinHash com `num_perm` funções de hash universais (a * x + b) mod p."""
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, _MERSENNE_PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, _MERSENNE_PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)
+            self._b = np.array(self.b, dtype=np.uint64)
+
+    def assinatura(self, shingles):
+        """Retorna a assinatura MinHash (tupla de `num_perm` inteiros) de um conjunto de shingles."""
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+        if np is not None:
+            hv = np.array(hashes, dtype=np.uint64)[:, None]
+            # Overflow em uint64 é intencional: continua sendo uma família de hash válida
+            with np.errstate(over='ignore'):
+                valores = np.bitwise_and((hv * self._a + self._b) % np.uint64(_MERSENNE_PRIME), np.uint64(_MAX_HASH))
+            return tuple(valores.min(axis=0).tolist())
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in zip(self.a, self.b)
+        )
+
+
+def similaridade(sig1, sig2):
+    """Jaccard estimado: fração de posições iguais entre duas assinaturas."""
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+
+def agrupar_quase_duplicadas(questions_list, threshold=NEAR_DUP_THRESHOLD, num_perm=NUM_PERM):
+    """
+    Agrupa questões quase duplicadas.
+
+    Args:
+        questions_list (list): Lista de dicionários de questões.
+        threshold (float): Similaridade mínima (0 a 1) para considerar duas questões iguais
+                           (além de terem a mesma resposta correta).
+        num_perm (int): Tamanho da assinatura MinHash.
+
+    Returns:
+        list: Grupos (listas de índices em `questions_list`, em ordem crescente) com 2 ou mais questões.
+    """
+    hasher = MinHasher(num_perm)
+    assinaturas = [hasher.assinatura(shingles_questao(q)) for q in questions_list]
+    respostas = [resposta_questao(q) for q in questions_list]
+    bands, rows = parametros_lsh(threshold, num_perm)
+
+    # Union-find para juntar os pares confirmados
+    pai = list(range(len(questions_list)))
+
+    def raiz(i):
+        while pai[i] != i:
+            pai[i] = pai[pai[i]]
+            i = pai[i]
+        return i
+
+    verificados = set()
+    for band in range(bands):
+        inicio = band * rows
+        buckets = defaultdict(list)
+        for idx, sig in enumerate(assinaturas):
+            buckets[sig[inicio:inicio + rows]].append(idx)
+
+        for membros in buckets.values():
+            if len(membros) < 2:
+                continue
+            for pos, i in enumerate(membros):
+                for j in membros[pos + 1:]:
+                    if raiz(i) == raiz(j) or (i, j) in verificados:
+                        continue
+                    verificados.add((i, j))
+                    # Confirma o candidato com a mesma resposta e a similaridade estimada pela assinatura completa
+                    if respostas[i] == respostas[j] and similaridade(assinaturas[i], assinaturas[j]) >= threshold:
+                        ri, rj = raiz(i), raiz(j)
+                        pai[max(ri, rj)] = min(ri, rj) # A raiz é sempre o menor índice do grupo
+
+    grupos = defaultdict(list)
+    for idx in range(len(questions_list)):
+        grupos[raiz(idx)].append(idx)
+    return [membros for membros in grupos.values() if len(membros) > 1]
+
+
+def remover_quase_duplicadas(questions_list, threshold=NEAR_DUP_THRESHOLD, num_perm=NUM_PERM):
+    """
+    Remove as questões quase duplicadas, mantendo a primeira ocorrência de cada grupo.
+
+    Returns:
+        tuple: (list de questões mantidas, list relatório dos grupos mesclados).
+               Cada item do relatório tem 'mantida' (questão) e 'removidas' (lista de questões).
+    """
+    if threshold is None or len(questions_list) < 2:
+        return list(questions_list), []
+
+    grupos = agrupar_quase_duplicadas(questions_list, threshold, num_perm)
+    removidas = set()
+    relatorio = []
+    for membros in grupos:
+        removidas.update(membros[1:])
+        relatorio.append({
+            'mantida': questions_list[membros[0]],
+            'removidas': [questions_list[i] for i in membros[1:]],
+        })
+
+    mantidas = [q for i, q in enumerate(questions_list) if i not in removidas]
+    return mantidas, relatorio
+
+
+def formatar_relatorio(relatorio):
+    """Texto legível com os grupos de quase duplicadas que foram mesclados."""
+    linhas = [f"{len(relatorio)} grupo(s) de questões quase duplicadas mesclados:"]
+    for n, grupo in enumerate(relatorio, 1):
+        mantida = grupo['mantida']
+        linhas.append(f"  [{n}] Mantida Q{mantida.get('Número', '')}: {str(mantida.get('Enunciado', ''))[:80]}")
+        for q in grupo['removidas']:
+            linhas.append(f"      - Removida Q{q.get('Número', '')}: {str(q.get('Enunciado', ''))[:80]}")
+    return '\n'.join(linhas)
+
+
+def salvar_relatorio(relatorio, path):
+    """Salva o relatório de grupos mesclados em JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        # core.Question é serializado no formato antigo de dicionário
+        json.dump(relatorio, f, ensure_ascii=False, indent=2,
+                  default=lambda o: o.to_dict() if hasattr(o, 'to_dict') else str(o))
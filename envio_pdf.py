@@ -0,0 +1,161 @@
+"""
+Envio direto do PDF ao Gemini, como alternativa à extração local de texto.
+
+Em vez de extrair o texto localmente (o que perde o layout: colunas, tabelas, questões
+com figuras) e enviá-lo como string, os bytes do PDF vão como arquivo anexado à chamada
+e o próprio modelo lê as páginas. PDFs grandes são divididos em partes de
+PDF_PAGES_PER_PART páginas (mais PDF_OVERLAP_PAGES de sobreposição, para não perder
+questões que atravessam a divisão), enviadas em paralelo; as questões repetidas na
+sobreposição são descartadas na mesclagem. Partes acima de INLINE_PDF_LIMIT bytes vão
+pela Files API em vez de inline e são apagadas de lá assim que a parte termina
+(continuações incluídas), sem esperar a expiração de 48 h nem ocupar a cota de arquivos.
+
+Cada página custa um número fixo de tokens (veja agendador_gemini.TOKENS_PER_PDF_PAGE),
+informado ao agendador de cotas. O cache de contexto não é usado neste modo: as
+instruções vão junto de cada parte. Para comparar com o envio de texto em cada tipo de
+documento, veja benchmark_envio.py.
+"""
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import PyPDF2
+from google.genai import types
+
+from agendador_gemini import estimar_tokens_pdf
+from continuacao import completar_resposta, prompt_de_continuacao
+from perfilamento import propagar
+from reprocessamento import mesclar_questoes
+
+PDF_PAGES_PER_PART = 10 # Páginas por chamada (PDFs menores vão inteiros)
+PDF_OVERLAP_PAGES = 1 # Páginas seguintes incluídas em cada parte
+INLINE_PDF_LIMIT = 18 * 1024 * 1024 # Acima disso, a parte vai pela Files API (limite inline: 20 MB por requisição)
+MAX_PARALLEL_PARTS = 4 # Partes enviadas ao Gemini ao mesmo tempo
+PDF_MIME_TYPE = 'application/pdf'
+
+
+class PartePdf:
+    """Intervalo de páginas [inicio, fim) de um PDF, com os bytes de um PDF só com elas."""
+    __slots__ = ('inicio', 'fim', 'dados')
+
+    def __init__(self, inicio, fim, dados):
+        self.inicio = inicio
+        self.fim = fim
+        self.dados = dados
+
+    @property
+    def paginas(self):
+        return self.fim - self.inicio
+
+    def descricao(self, total):
+        if self.inicio == 0 and self.fim == total:
+            return "o PDF anexado"
+        return f"as páginas {self.inicio + 1} a {self.fim} do PDF anexado"
+
+
+def dividir_pdf(pdf_path, paginas_por_parte=PDF_PAGES_PER_PART, overlap=PDF_OVERLAP_PAGES):
+    """
+    Divide o PDF em partes de `paginas_por_parte` páginas (cada uma com `overlap` páginas
+    da seguinte). Um PDF que cabe numa parte vai com os bytes originais, sem regravação.
+
+    Returns:
+        tuple: (lista de `PartePdf`, total de páginas).
+    """
+    with open(pdf_path, 'rb') as f:
+        dados = f.read()
+    reader = PyPDF2.PdfReader(io.BytesIO(dados))
+    total = len(reader.pages)
+    if total <= paginas_por_parte:
+        return [PartePdf(0, total, dados)], total
+
+    partes = []
+    for inicio in range(0, total, paginas_por_parte):
+        fim = min(inicio + paginas_por_parte + overlap, total)
+        writer = PyPDF2.PdfWriter()
+        for p in range(inicio, fim):
+            writer.add_page(reader.pages[p])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        partes.append(PartePdf(inicio, fim, buffer.getvalue()))
+    return partes, total
+
+
+def anexo_do_pdf(client, dados):
+    """Conteúdo do arquivo para a chamada: inline até INLINE_PDF_LIMIT, senão enviado pela Files API."""
+    if len(dados) <= INLINE_PDF_LIMIT:
+        return types.Part.from_bytes(data=dados, mime_type=PDF_MIME_TYPE)
+    return client.sdk_client.files.upload(file=io.BytesIO(dados), config={'mime_type': PDF_MIME_TYPE})
+
+
+def liberar_anexo(client, anexo):
+    """Apaga da Files API um anexo enviado por `anexo_do_pdf` (anexos inline não ocupam nada)."""
+    if isinstance(anexo, types.Part):
+        return
+    try:
+        client.sdk_client.files.delete(name=anexo.name)
+    except Exception as e:
+        print(f"ℹ️ Não foi possível apagar o arquivo '{anexo.name}' da Files API ({e}); ele expira em 48 h.")
+
+
+def extrair_questoes_do_pdf(pdf_path, instrucoes, parse, client, progress_callback=None, cancel_token=None,
+                            job=None, paginas_por_parte=PDF_PAGES_PER_PART, max_workers=MAX_PARALLEL_PARTS,
+                            model="gemini-2.5-flash"):
+    """
+    Extrai as questões enviando o PDF (ou partes dele) diretamente ao Gemini.
+
+    Args:
+        pdf_path (str): Caminho do PDF.
+        instrucoes (str): Instruções de extração (as mesmas do envio de texto).
+        parse (callable): Converte o texto da resposta numa lista de questões.
+        client (GeminiClient): Cliente usado nas chamadas (`generate_content_sync`).
+        progress_callback (function): Recebe (valor 10-50, texto) (opcional).
+        cancel_token (CancelToken): Verificado antes de cada parte e durante as chamadas (opcional).
+        job (str): Identificação do trabalho nas cotas do Gemini.
+        paginas_por_parte (int): Páginas por chamada.
+        max_workers (int): Partes enviadas ao mesmo tempo.
+
+    Returns:
+        list: As questões de todas as partes, em ordem, sem as repetidas na sobreposição.
+    """
+    partes, total = dividir_pdf(pdf_path, paginas_por_parte)
+    if progress_callback:
+        progress_callback(15, f"2/5 - Enviando o PDF ({total} páginas, {len(partes)} parte(s)) para a IA...")
+
+    def processar(parte):
+        if cancel_token:
+            cancel_token.check()
+        anexo = anexo_do_pdf(client, parte.dados)
+        pedido = f"{instrucoes}Extraia as questões de {parte.descricao(total)}."
+
+        def gerar(prompt):
+            return client.generate_content_sync(
+                contents=[anexo, prompt], model=model, config={"temperature": 0.1},
+                cancel_token=cancel_token, job=job, tokens=estimar_tokens_pdf(parte.paginas, prompt)
+            )
+
+        try:
+            response = gerar(pedido)
+            if not response.text:
+                raise Exception(f"A resposta da API Gemini está vazia (páginas {parte.inicio + 1} a {parte.fim}).")
+            # Saída truncada: pede só as questões seguintes, com o mesmo anexo
+            texto = completar_resposta(response, lambda ultimo: gerar(pedido + prompt_de_continuacao(ultimo)))
+        finally:
+            liberar_anexo(client, anexo)
+        return parse(texto)
+
+    if len(partes) == 1:
+        return processar(partes[0])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(partes)), thread_name_prefix="partes-pdf") as executor:
+        futures = [executor.submit(propagar(processar), parte) for parte in partes]
+        listas = []
+        try:
+            for n, future in enumerate(futures):
+                listas.append(future.result())
+                if progress_callback:
+                    progress_callback(15 + int((n + 1) / len(partes) * 35),
+                                      f"2/5 - Partes do PDF processadas pela IA: {n + 1}/{len(partes)}...")
+        except BaseException:
+            for future in futures:
+                future.cancel() # Não envia as partes que ainda estavam na fila
+            raise
+    return mesclar_questoes(listas)
@@ -0,0 +1,229 @@
+"""
+Cliente Gemini assíncrono e compartilhado pelo processo.
+
+Mantém um único `genai.Client` (e, portanto, as conexões HTTP) vivo durante toda a
+execução, usando a superfície assíncrona do SDK (`client.aio`). As chamadas rodam em
+um event loop dedicado numa thread de fundo, de modo que as GUIs (que usam threads
+comuns) possam chamar `generate_content_sync` sem se preocupar com asyncio.
+
+Opcionalmente, cada tentativa pode ser "hedged" (veja hedging.py): se demorar mais que
+o percentil configurado das latências recentes, uma cópia é disparada e vale a primeira.
+
+Antes de ocupar uma vaga do semáforo, cada tentativa passa pelo agendador de cotas
+(veja agendador_gemini.py), que a segura até caber nos orçamentos de requisições e
+tokens por minuto, dividindo-os de forma justa entre os jobs.
+"""
+import asyncio
+import random
+import threading
+import time
+
+from google import genai
+from google.genai.errors import APIError
+
+from agendador_gemini import GEMINI_RPM, GEMINI_TPM, AgendadorGemini, estimar_tokens_pedido, tokens_da_resposta
+from cancelamento import wait_future
+from hedging import HedgePolicy, run_hedged
+
+# ==============================================================================
+# ⚙️ CONFIGURAÇÕES PADRÃO
+# ==============================================================================
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+MAX_CONCURRENT_REQUESTS = 4 # Máximo de chamadas simultâneas ao modelo (semáforo)
+REQUEST_TIMEOUT = 300 # Tempo máximo (segundos) de cada tentativa de chamada
+MAX_RETRIES = 3 # Número de novas tentativas em erros temporários da API
+BACKOFF_BASE = 2.0 # Espera base (segundos) do backoff exponencial entre tentativas
+RETRIABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504} # Códigos HTTP considerados temporários
+HEDGING_ENABLED = False # Se True, dispara cópias de requisições lentas (veja hedging.py)
+
+
+def is_retriable_error(error):
+    """
+    Indica se um `APIError` é temporário (limite de taxa, sobrecarga, timeout do servidor)
+    e pode ser repetido com segurança.
+    """
+    return getattr(error, 'code', None) in RETRIABLE_STATUS_CODES
+
+
+class GeminiClient:
+    """
+    Wrapper de longa duração sobre o SDK do Gemini com semáforo de concorrência,
+    orçamentos RPM/TPM, timeout por requisição e retry com backoff exponencial.
+    """
+    def __init__(self, api_key=None, max_concurrency=MAX_CONCURRENT_REQUESTS,
+                 timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE,
+                 hedging=HEDGING_ENABLED, hedge_policy=None, rpm=GEMINI_RPM, tpm=GEMINI_TPM):
+        self.api_key = api_key # Se None, o SDK usa a variável de ambiente GEMINI_API_KEY
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hedging = hedging
+        self.hedge_policy = hedge_policy or HedgePolicy() # Também mantém o histograma de latências
+        # Sem nenhum dos orçamentos (None), as chamadas não passam pelo agendador
+        self.agendador = AgendadorGemini(rpm, tpm) if (rpm or tpm) else None
+
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Cria o cliente do SDK e o event loop de fundo na primeira utilização."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            try:
+                self._client = genai.Client(api_key=self.api_key) if self.api_key else genai.Client()
+            except Exception:
+                raise Exception("Erro ao inicializar o cliente Gemini. Verifique a chave de API.")
+
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="gemini-loop", daemon=True)
+            self._thread.start()
+
+    @property
+    def sdk_client(self):
+        """O `genai.Client` compartilhado (inicializado sob demanda)."""
+        self._ensure_started()
+        return self._client
+
+    def _get_semaphore(self):
+        # Criado dentro do loop de fundo para ficar associado a ele
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call_once(self, contents, model, config, timeout, job=None, tokens=None):
+        """
+        Uma única chamada ao modelo: espera a vez no agendador de cotas e depois roda dentro
+        do semáforo, registrando a latência no histograma.
+        """
+        entrada = None
+        if self.agendador is not None:
+            # A espera pela cota fica fora do semáforo, para não prender uma vaga
+            entrada = await self.agendador.adquirir(tokens or estimar_tokens_pedido(contents, config), job)
+        response = None
+        try:
+            async with self._get_semaphore():
+                start = time.monotonic()
+                response = await asyncio.wait_for(
+                    self._client.aio.models.generate_content(model=model, contents=contents, config=config),
+                    timeout
+                )
+                self.hedge_policy.histogram.record(time.monotonic() - start)
+                return response
+        finally:
+            if entrada is not None:
+                # Troca a estimativa pelos tokens contados pela API (quando informados)
+                self.agendador.liberar(entrada, tokens_da_resposta(response))
+
+    async def generate_content(self, contents, model=DEFAULT_MODEL, config=None, timeout=None, hedging=None,
+                               job=None, tokens=None):
+        """
+        Chama `client.aio.models.generate_content` respeitando o semáforo de concorrência,
+        com timeout por tentativa e retry com backoff em erros temporários.
+
+        Args:
+            contents: Conteúdo enviado ao modelo (texto ou partes).
+            model (str): Nome do modelo Gemini.
+            config (dict): Configuração de geração (temperatura, etc.).
+            timeout (float): Timeout por tentativa; usa o padrão do cliente se None.
+            hedging (bool): Ativa/desativa o hedging nesta chamada; usa o padrão do cliente se None.
+            job (str): Job que faz a chamada (ex.: nome do PDF), para a divisão justa das cotas.
+            tokens (int): Tokens estimados da chamada, para o agendador; se None, estimados pelo texto
+                          (informe-os quando `contents` tiver arquivos, ex.: `estimar_tokens_pdf`).
+
+        Returns:
+            GenerateContentResponse: A resposta do modelo.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        hedging = self.hedging if hedging is None else hedging
+        semaphore = self._get_semaphore()
+        attempt = 0
+        while True:
+            try:
+                # O semáforo é liberado durante o backoff para não bloquear outras chamadas
+                if hedging:
+                    # A cópia só é disparada se houver vaga no semáforo
+                    return await run_hedged(
+                        lambda: self._call_once(contents, model, config, timeout, job, tokens),
+                        self.hedge_policy,
+                        can_hedge=lambda: not semaphore.locked()
+                    )
+                return await self._call_once(contents, model, config, timeout, job, tokens)
+            except APIError as e:
+                if attempt >= self.max_retries or not is_retriable_error(e):
+                    raise
+            except asyncio.TimeoutError:
+                if attempt >= self.max_retries:
+                    raise TimeoutError(f"A API Gemini não respondeu em {timeout} segundos.")
+
+            # Backoff exponencial com jitter antes da próxima tentativa
+            delay = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def submit(self, coro):
+        """
+        Agenda uma corrotina no event loop compartilhado.
+
+        Returns:
+            concurrent.futures.Future: Futuro com o resultado da corrotina.
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def generate_content_sync(self, contents, model=DEFAULT_MODEL, config=None, timeout=None, cancel_token=None,
+                              hedging=None, job=None, tokens=None):
+        """
+        Versão bloqueante de `generate_content`, para uso a partir de threads comuns.
+        Com `cancel_token`, a espera é interrompida no cancelamento (ou prazo da etapa)
+        e a tarefa assíncrona é cancelada, liberando a conexão.
+        """
+        self._ensure_started()
+        future = self.submit(self.generate_content(
+            contents, model=model, config=config, timeout=timeout, hedging=hedging, job=job, tokens=tokens
+        ))
+        if cancel_token is None:
+            return future.result()
+        return wait_future(future, cancel_token)
+
+    def latency_stats(self):
+        """Percentis de latência e contadores de hedge (para logs/diagnóstico)."""
+        return self.hedge_policy.stats()
+
+    def queue_stats(self):
+        """Profundidade da fila e tempos de espera pelas cotas (veja `AgendadorGemini.metrics`)."""
+        return self.agendador.metrics() if self.agendador is not None else {}
+
+    def close(self):
+        """Para o event loop de fundo e descarta o cliente."""
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._client = None
+            self._semaphore = None
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_gemini_client(**kwargs):
+    """
+    Retorna o cliente Gemini compartilhado pelo processo, criando-o na primeira chamada.
+    Os argumentos só têm efeito na criação (veja `GeminiClient`).
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = GeminiClient(**kwargs)
+        return _shared_client
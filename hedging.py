@@ -0,0 +1,119 @@
+"""
+Requisições "hedged" para reduzir a latência de cauda.
+
+Se uma requisição não termina depois de um percentil configurável das latências
+recentes, uma cópia é disparada; fica valendo a que terminar primeiro e a outra é
+cancelada. Um limite na taxa de hedges evita dobrar a carga (e a cota) quando o
+serviço inteiro fica lento.
+"""
+import asyncio
+import math
+import threading
+from collections import deque
+
+HEDGE_PERCENTILE = 95 # Percentil das latências recentes após o qual a cópia é disparada
+HEDGE_MAX_RATE = 0.1 # Fração máxima das requisições que podem ganhar uma cópia
+HEDGE_MIN_SAMPLES = 10 # Amostras necessárias antes de usar o percentil
+HEDGE_INITIAL_DELAY = None # Atraso usado enquanto não há amostras suficientes (None = não faz hedge)
+LATENCY_WINDOW = 200 # Quantidade de latências recentes mantidas no histograma
+
+
+class LatencyHistogram:
+    """Histograma (janela deslizante) das latências mais recentes, em segundos."""
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        """Percentil `p` (0 a 100) das amostras, pelo método do posto mais próximo. None se vazio."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(1, math.ceil(p / 100 * len(samples)))
+        return samples[rank - 1]
+
+
+class HedgePolicy:
+    """Decide quando disparar a cópia de uma requisição e contabiliza os hedges."""
+    def __init__(self, histogram=None, percentile=HEDGE_PERCENTILE, max_rate=HEDGE_MAX_RATE,
+                 min_samples=HEDGE_MIN_SAMPLES, initial_delay=HEDGE_INITIAL_DELAY):
+        self.histogram = histogram or LatencyHistogram()
+        self.percentile = percentile
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        """Segundos de espera antes de disparar a cópia (None = não fazer hedge)."""
+        if len(self.histogram) < self.min_samples:
+            return self.initial_delay
+        return self.histogram.percentile(self.percentile)
+
+    def allow_hedge(self):
+        """Respeita o limite de taxa: no máximo max_rate * requisições hedges (com folga de 1)."""
+        return self.hedges < self.max_rate * self.requests + 1
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'samples': len(self.histogram),
+            'p50': self.histogram.percentile(50),
+            f'p{self.percentile}': self.histogram.percentile(self.percentile),
+        }
+
+
+async def run_hedged(make_call, policy, can_hedge=None):
+    """
+    Executa `make_call()` (fábrica de corrotinas) com hedging.
+
+    Args:
+        make_call (callable): Cria uma nova corrotina da requisição a cada chamada.
+        policy (HedgePolicy): Política de atraso e limite de taxa.
+        can_hedge (callable): Checagem extra no momento do hedge (ex.: há vaga no semáforo).
+
+    Returns:
+        O resultado da primeira cópia que terminar com sucesso. Se todas falharem,
+        a exceção da requisição original é propagada.
+    """
+    policy.requests += 1
+    primary = asyncio.ensure_future(make_call())
+    backup = None
+    try:
+        delay = policy.hedge_delay()
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not policy.allow_hedge() or (can_hedge and not can_hedge()):
+            return await primary
+
+        policy.hedges += 1
+        backup = asyncio.ensure_future(make_call())
+        pending = {primary, backup}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        policy.hedge_wins += 1
+                    return task.result()
+        # As duas falharam: propaga o erro da requisição original
+        return primary.result()
+    finally:
+        # Cancela a perdedora (ou ambas, se quem chamou foi cancelado)
+        for task in (primary, backup):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,189 @@
+"""
+Validação e envio tolerante a falhas dos lotes de `batchUpdate` da Forms API.
+
+Um `batchUpdate` é atômico: um único item malformado (alternativa vazia, valor
+repetido, gabarito fora das alternativas) derruba o lote inteiro. Antes do envio,
+`separar_invalidas` retira os itens com problemas detectáveis localmente. Se mesmo
+assim um lote falhar com erro de requisição (HTTP 400), `enviar_com_bissecao` o
+divide ao meio recursivamente até isolar os itens recusados: os bons são criados e
+só os ruins são reportados, com cerca de O(log n) chamadas extras por item ruim.
+
+Como itens podem ficar de fora, o índice (`location.index`) de cada item é
+recalculado no envio a partir da quantidade de itens já criados no formulário.
+
+Se a bisseção for interrompida por outro erro (timeout, 5xx, cancelamento) depois de
+parte do lote já ter sido criada, a exceção propagada leva o progresso parcial (veja
+`progresso_parcial`), para que quem chamou ajuste os índices seguintes e não reenvie os
+itens já criados.
+"""
+import copy
+
+BAD_REQUEST_STATUS = 400 # Erro de requisição: algum item do lote é inválido
+
+
+def titulo_do_item(request):
+    """Título do item de uma requisição `createItem` (para relatórios)."""
+    return request.get('createItem', {}).get('item', {}).get('title', '')
+
+
+def validar_requisicao(request):
+    """
+    Checa localmente uma requisição `createItem` de questão de múltipla escolha.
+
+    Returns:
+        list: Descrições dos problemas encontrados (vazia se a requisição é válida).
+    """
+    item = request.get('createItem', {}).get('item')
+    if item is None:
+        return [] # Outros tipos de requisição não são validados aqui
+
+    problemas = []
+    if not str(item.get('title', '')).strip():
+        problemas.append("título vazio")
+
+    question = item.get('questionItem', {}).get('question', {})
+    choice = question.get('choiceQuestion')
+    if choice is None:
+        return problemas
+
+    valores = [str(opt.get('value', '')) for opt in choice.get('options', [])]
+    if not valores:
+        problemas.append("sem alternativas")
+    if any(not v.strip() for v in valores):
+        problemas.append("alternativa vazia")
+    repetidas = sorted({v for v in valores if valores.count(v) > 1})
+    if repetidas:
+        problemas.append(f"alternativa repetida: {', '.join(repetidas)}")
+
+    respostas = [a.get('value') for a in question.get('grading', {}).get('correctAnswers', {}).get('answers', [])]
+    fora = [r for r in respostas if r not in valores]
+    if fora:
+        problemas.append(f"gabarito fora das alternativas: {', '.join(map(str, fora))}")
+    if choice.get('type') == 'RADIO' and len(respostas) > 1:
+        problemas.append("mais de uma resposta correta numa questão de escolha única")
+    return problemas
+
+
+def separar_invalidas(requests):
+    """
+    Returns:
+        tuple: (requisições válidas, lista de (requisição, motivo) das inválidas).
+    """
+    validas, invalidas = [], []
+    for request in requests:
+        problemas = validar_requisicao(request)
+        if problemas:
+            invalidas.append((request, "; ".join(problemas)))
+        else:
+            validas.append(request)
+    return validas, invalidas
+
+
+def reindexar(requests, start_index):
+    """Cópias das requisições `createItem` com índices crescentes a partir de `start_index`."""
+    reindexadas = []
+    index = start_index
+    for request in requests:
+        if 'createItem' in request:
+            request = copy.deepcopy(request)
+            request['createItem'].setdefault('location', {})['index'] = index
+            index += 1
+        reindexadas.append(request)
+    return reindexadas
+
+
+def status_do_erro(error):
+    """Código HTTP de um erro da API do Google (None se não houver)."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def _somar_parcial(erro, criadas, enviadas):
+    erro.criadas_parciais = getattr(erro, 'criadas_parciais', 0) + criadas
+    erro.enviadas_parciais = getattr(erro, 'enviadas_parciais', 0) + enviadas
+
+
+def progresso_parcial(erro):
+    """
+    Progresso de um lote interrompido por `erro`.
+
+    Returns:
+        tuple: (int itens criados, int requisições válidas já resolvidas — criadas ou recusadas —,
+                um prefixo do lote na ordem de envio).
+    """
+    return getattr(erro, 'criadas_parciais', 0), getattr(erro, 'enviadas_parciais', 0)
+
+
+def enviar_com_bissecao(enviar, requests, start_index, erros=(Exception,)):
+    """
+    Envia `requests` com `enviar(lista)` (que executa um batchUpdate). Se o lote for
+    recusado com HTTP 400, divide-o ao meio e reenvia cada metade, recursivamente,
+    até isolar os itens ruins. Outros erros são propagados com o progresso parcial
+    (veja `progresso_parcial`).
+
+    Args:
+        enviar (callable): Recebe a lista de requisições (já reindexadas) e as envia.
+        requests (list): Requisições `createItem` do lote.
+        start_index (int): Quantidade de itens já existentes no formulário.
+        erros (tuple): Tipos de exceção da API tratados (ex.: (HttpError,)).
+
+    Returns:
+        tuple: (int itens criados (só `createItem`, que ocupam índices), lista de (requisição,
+               motivo) recusados, int chamadas feitas).
+    """
+    if not requests:
+        return 0, [], 0
+    try:
+        enviar(reindexar(requests, start_index))
+        return sum('createItem' in r for r in requests), [], 1
+    except erros as e:
+        if status_do_erro(e) != BAD_REQUEST_STATUS:
+            raise
+        if len(requests) == 1:
+            return 0, [(requests[0], str(e))], 1
+        erro_lote = e
+
+    meio = len(requests) // 2
+    criadas_esq, ruins_esq, chamadas_esq = enviar_com_bissecao(enviar, requests[:meio], start_index, erros)
+    try:
+        criadas_dir, ruins_dir, chamadas_dir = enviar_com_bissecao(
+            enviar, requests[meio:], start_index + criadas_esq, erros
+        )
+    except BaseException as e:
+        _somar_parcial(e, criadas_esq, meio) # A metade esquerda já foi resolvida
+        raise
+    if not ruins_esq and not ruins_dir:
+        # As duas metades passaram sozinhas: o problema era do lote como um todo
+        print(f"⚠️ Lote recusado inteiro, mas aceito em partes: {erro_lote}")
+    return criadas_esq + criadas_dir, ruins_esq + ruins_dir, 1 + chamadas_esq + chamadas_dir
+
+
+def enviar_lote(enviar, requests, start_index, erros=(Exception,), pular=0):
+    """
+    Valida e envia um lote: itens inválidos localmente nem são enviados; os recusados
+    pela API são isolados por bisseção.
+
+    Args:
+        pular (int): Requisições válidas do início do lote já resolvidas numa tentativa
+                     interrompida (`progresso_parcial`), que não são reenviadas.
+
+    Returns:
+        tuple: (int itens criados, lista de (requisição, motivo) rejeitados).
+    """
+    validas, rejeitadas = separar_invalidas(requests)
+    criadas, recusadas, _ = enviar_com_bissecao(enviar, validas[pular:], start_index, erros)
+    return criadas, rejeitadas + recusadas
+
+
+def formatar_rejeitadas(rejeitadas, form_title=''):
+    """Texto legível com as questões rejeitadas e o motivo de cada uma."""
+    prefixo = f" no Forms '{form_title}'" if form_title else ""
+    return "\n".join(
+        f"⚠️ Questão rejeitada{prefixo}: '{titulo_do_item(request)[:80]}' — {motivo}"
+        for request, motivo in rejeitadas
+    )
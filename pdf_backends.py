@@ -0,0 +1,211 @@
+"""
+Backends de extração de texto de PDF com seleção automática por benchmark.
+
+Cada backend abre o PDF e devolve o texto página a página. Além do PyPDF2 (sempre
+disponível, mas um dos extratores mais lentos), são suportados o pypdfium2 e o
+pdfminer.six quando instalados. No modo 'auto', um micro-benchmark extrai algumas
+páginas com cada backend disponível e escolhe o mais rápido cujo texto passa na
+checagem de qualidade.
+"""
+import io
+import os
+import threading
+import time
+
+import PyPDF2
+
+try:
+    import pypdfium2 as pdfium
+except ImportError: # Opcional: pip install pypdfium2
+    pdfium = None
+
+try:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+except ImportError: # Opcional: pip install pdfminer.six
+    PDFPage = None
+
+PDF_BACKEND = 'auto' # 'auto' ou o nome de um backend ('pypdfium2', 'pdfminer', 'pypdf2')
+BENCHMARK_PAGES = 3 # Páginas usadas no micro-benchmark do modo 'auto'
+MIN_LENGTH_RATIO = 0.7 # Texto precisa ter ao menos 70% do tamanho do maior texto obtido
+MIN_ALNUM_RATIO = 0.5 # Fração mínima de caracteres alfanuméricos (fora espaços)
+
+# O PDFium não é thread-safe: toda chamada ao pypdfium2 (abrir, extrair, fechar) passa por
+# este lock, já que vários PDFs podem ser extraídos ao mesmo tempo (ex.: jobs do servico_jobs.py)
+_pdfium_lock = threading.RLock()
+
+
+class PdfDocumentText:
+    """Documento aberto por um backend: número de páginas e texto de cada página."""
+    def __init__(self, num_pages, page_text, close=None):
+        self.num_pages = num_pages
+        self._page_text = page_text
+        self._close = close
+
+    def page_text(self, index):
+        return self._page_text(index) or ""
+
+    def close(self):
+        if self._close:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PdfTextBackend:
+    """Interface de um backend de extração de texto."""
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def open(self, pdf_path):
+        """Abre o PDF e retorna um `PdfDocumentText`."""
+        raise NotImplementedError
+
+
+class PyPDF2Backend(PdfTextBackend):
+    name = 'pypdf2'
+
+    def open(self, pdf_path):
+        f = open(pdf_path, 'rb')
+        reader = PyPDF2.PdfReader(f)
+        return PdfDocumentText(len(reader.pages), lambda i: reader.pages[i].extract_text(), f.close)
+
+
+class PdfiumBackend(PdfTextBackend):
+    name = 'pypdfium2'
+
+    @classmethod
+    def available(cls):
+        return pdfium is not None
+
+    def open(self, pdf_path):
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(pdf_path)
+            num_pages = len(pdf)
+
+        def page_text(i):
+            with _pdfium_lock:
+                page = pdf[i]
+                textpage = page.get_textpage()
+                try:
+                    return textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+
+        def close():
+            with _pdfium_lock:
+                pdf.close()
+
+        return PdfDocumentText(num_pages, page_text, close)
+
+
+class PdfminerBackend(PdfTextBackend):
+    name = 'pdfminer'
+
+    @classmethod
+    def available(cls):
+        return PDFPage is not None
+
+    def open(self, pdf_path):
+        f = open(pdf_path, 'rb')
+        pages = list(PDFPage.get_pages(f))
+        rsrcmgr = PDFResourceManager()
+
+        def page_text(i):
+            output = io.StringIO()
+            device = TextConverter(rsrcmgr, output, laparams=LAParams())
+            try:
+                PDFPageInterpreter(rsrcmgr, device).process_page(pages[i])
+                return output.getvalue()
+            finally:
+                device.close()
+
+        return PdfDocumentText(len(pages), page_text, f.close)
+
+
+# Ordem de preferência em caso de empate (os mais rápidos primeiro)
+BACKENDS = {backend.name: backend for backend in (PdfiumBackend, PdfminerBackend, PyPDF2Backend)}
+
+
+def available_backends():
+    """Nomes dos backends instalados."""
+    return [name for name, backend in BACKENDS.items() if backend.available()]
+
+
+def get_backend(name):
+    """Instancia o backend `name`, com erro claro se não existir ou não estiver instalado."""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de PDF desconhecido: '{name}'. Opções: {', '.join(BACKENDS)}")
+    if not BACKENDS[name].available():
+        raise ValueError(f"Backend de PDF '{name}' não está instalado.")
+    return BACKENDS[name]()
+
+
+def quality_ok(text, reference_length):
+    """
+    Checagem de qualidade do texto extraído: não vazio, majoritariamente alfanumérico
+    (descarta lixo de codificação) e sem perder boa parte do conteúdo em relação ao
+    maior texto obtido por outro backend.
+    """
+    stripped = ''.join(text.split())
+    if not stripped:
+        return False
+    alnum_ratio = sum(c.isalnum() for c in stripped) / len(stripped)
+    return alnum_ratio >= MIN_ALNUM_RATIO and len(stripped) >= MIN_LENGTH_RATIO * reference_length
+
+
+def benchmark_backends(pdf_path, sample_pages=BENCHMARK_PAGES, names=None):
+    """
+    Mede cada backend extraindo as primeiras `sample_pages` páginas do PDF.
+
+    Returns:
+        list: Um dict por backend com 'name', 'seconds', 'chars' e 'ok' (passou na
+              checagem de qualidade), ordenado do mais rápido para o mais lento.
+    """
+    results = []
+    for name in names or available_backends():
+        start = time.perf_counter()
+        try:
+            with get_backend(name).open(pdf_path) as doc:
+                text = "\n".join(doc.page_text(i) for i in range(min(sample_pages, doc.num_pages)))
+        except Exception as e:
+            print(f"⚠️ Backend de PDF '{name}' falhou no benchmark: {e}")
+            continue
+        results.append({'name': name, 'seconds': time.perf_counter() - start, 'text': text})
+
+    reference = max((len(''.join(r['text'].split())) for r in results), default=0)
+    for r in results:
+        text = r.pop('text')
+        r['chars'] = len(text)
+        r['ok'] = quality_ok(text, reference)
+    return sorted(results, key=lambda r: r['seconds'])
+
+
+_auto_choices = {} # (caminho, mtime, tamanho) -> backend escolhido no modo 'auto'
+
+
+def choose_backend(pdf_path, backend=PDF_BACKEND):
+    """
+    Resolve o backend de um job. Com 'auto', roda o micro-benchmark (uma vez por
+    arquivo) e escolhe o mais rápido que passa na checagem de qualidade.
+    """
+    if backend != 'auto':
+        return get_backend(backend)
+
+    stat = os.stat(pdf_path)
+    key = (os.path.abspath(pdf_path), stat.st_mtime, stat.st_size)
+    if key not in _auto_choices:
+        results = benchmark_backends(pdf_path)
+        passing = [r for r in results if r['ok']]
+        _auto_choices[key] = passing[0]['name'] if passing else PyPDF2Backend.name
+    return get_backend(_auto_choices[key])
@@ -0,0 +1,204 @@
+"""
+Perfilamento por amostragem das execuções do pipeline, separado por etapa.
+
+As etapas (extração, espera do Gemini, parsing, montagem das requisições, I/O do Forms)
+são marcadas no código com `etapa(nome)`, como bloco `with` ou decorador. Sem um
+perfilador ativo na thread, a marcação não faz nada além de um teste.
+
+Com `perfilar(base)`, o perfilador fica associado à thread que o iniciou (e às threads
+auxiliares criadas por ela com `propagar`), e uma thread de fundo tira a cada
+PROFILE_INTERVAL segundos a pilha dessas threads quando estão dentro de alguma etapa
+(`sys._current_frames`), sem instrumentar cada chamada de função. Assim, vários trabalhos
+perfilados ao mesmo tempo (ex.: jobs do servico_jobs.py) têm cada um o seu perfil, sem
+as pilhas dos outros. Por ser amostragem de tempo de parede, as esperas de rede (Gemini,
+Forms) aparecem como tempo gasto na chamada que bloqueou. Ao final são gravados, ao lado
+dos artefatos da execução:
+
+- <base>_perfil.folded: pilhas no formato "colapsado" (uma linha "etapa;f1;f2 contagem"),
+  aceito por flamegraph.pl, inferno e speedscope;
+- <base>_perfil.json: tempo de parede, número de chamadas e amostras por etapa, além do
+  custo da própria amostragem.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_INTERVAL = 0.01 # Intervalo (segundos) entre amostras: 100 Hz
+FOLDED_SUFFIX = '_perfil.folded'
+RESUMO_SUFFIX = '_perfil.json'
+
+_local = threading.local() # .perfilador: o perfilador da thread atual (ou nenhum)
+
+
+def _perfilador_atual():
+    return getattr(_local, 'perfilador', None)
+
+
+@contextmanager
+def etapa(nome):
+    """Marca uma etapa do pipeline na thread atual (bloco `with` ou decorador)."""
+    perfilador = _perfilador_atual()
+    if perfilador is None:
+        yield
+        return
+    pilha = perfilador.etapas.setdefault(threading.get_ident(), [])
+    pilha.append(nome)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        pilha.pop()
+        perfilador.registrar_tempo(nome, time.perf_counter() - inicio)
+
+
+def propagar(funcao):
+    """
+    Envolve `funcao` para rodar em outra thread (ex.: `executor.submit(propagar(f), ...)`)
+    com o perfilador da thread atual, de modo que as etapas dela entrem no mesmo perfil.
+    """
+    perfilador = _perfilador_atual()
+    if perfilador is None:
+        return funcao
+
+    def executar(*args, **kwargs):
+        anterior = _perfilador_atual()
+        _local.perfilador = perfilador
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _local.perfilador = anterior
+    return executar
+
+
+def _nome_do_frame(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Perfilador:
+    """Amostrador das pilhas das suas threads em etapa, com tempos de parede por etapa."""
+    def __init__(self, intervalo=PROFILE_INTERVAL):
+        self.intervalo = intervalo
+        self.amostras = Counter() # (etapa, tupla de code objects da raiz à folha) -> contagem
+        self.tempos = {} # etapa -> [segundos, chamadas]
+        self.custo = 0.0 # Tempo gasto pela própria amostragem
+        self.etapas = {} # ident da thread -> pilha de nomes de etapa em que ela está
+        self.inicio = None
+        self.fim = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        """Associa o perfilador à thread atual e começa a amostragem."""
+        if _perfilador_atual() is not None:
+            raise RuntimeError("Esta thread já está sendo perfilada.")
+        _local.perfilador = self
+        self.inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, name="perfilador", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        if _perfilador_atual() is self:
+            _local.perfilador = None
+        self.fim = time.perf_counter()
+
+    def registrar_tempo(self, nome, segundos):
+        with self._lock:
+            total = self.tempos.setdefault(nome, [0.0, 0])
+            total[0] += segundos
+            total[1] += 1
+
+    def _amostrar(self):
+        proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            inicio = time.perf_counter()
+            frames = sys._current_frames()
+            for ident, pilha in list(self.etapas.items()):
+                if not pilha or ident == proprio or ident not in frames:
+                    continue
+                codes = []
+                frame = frames[ident]
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                self.amostras[(pilha[-1], tuple(reversed(codes)))] += 1
+            del frames
+            self.custo += time.perf_counter() - inicio
+
+    # --- Saída ---
+
+    def linhas_colapsadas(self):
+        """Pilhas no formato colapsado ("etapa;f1;f2 contagem"), agregadas por nome de função."""
+        linhas = Counter()
+        for (nome, codes), contagem in self.amostras.items():
+            linhas[";".join([nome] + [_nome_do_frame(c) for c in codes])] += contagem
+        return [f"{pilha} {contagem}" for pilha, contagem in sorted(linhas.items())]
+
+    def resumo(self):
+        """Tempo de parede, chamadas e amostras por etapa (dict serializável em JSON)."""
+        por_etapa = Counter()
+        for (nome, _), contagem in self.amostras.items():
+            por_etapa[nome] += contagem
+        duracao = (self.fim or time.perf_counter()) - self.inicio
+        return {
+            'duracao': round(duracao, 3),
+            'intervalo': self.intervalo,
+            'amostras': sum(por_etapa.values()),
+            'custo_amostragem': round(self.custo, 4),
+            'etapas': {
+                nome: {'segundos': round(segundos, 3), 'chamadas': chamadas, 'amostras': por_etapa.get(nome, 0)}
+                for nome, (segundos, chamadas) in sorted(self.tempos.items(), key=lambda t: -t[1][0])
+            },
+        }
+
+    def salvar(self, base_path):
+        """Grava <base>_perfil.folded e <base>_perfil.json. Returns: (caminho .folded, caminho .json)."""
+        folded_path = base_path + FOLDED_SUFFIX
+        resumo_path = base_path + RESUMO_SUFFIX
+        with open(folded_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(self.linhas_colapsadas()) + "\n")
+        with open(resumo_path, 'w', encoding='utf-8') as f:
+            json.dump(self.resumo(), f, ensure_ascii=False, indent=2)
+        return folded_path, resumo_path
+
+
+def formatar_resumo(resumo):
+    """Texto legível do resumo por etapa."""
+    linhas = [f"⏱️ Perfil: {resumo['duracao']:.1f}s, {resumo['amostras']} amostras "
+              f"(custo da amostragem {resumo['custo_amostragem']:.3f}s)"]
+    for nome, dados in resumo['etapas'].items():
+        linhas.append(f"   {nome}: {dados['segundos']:.2f}s em {dados['chamadas']} chamada(s)")
+    return "\n".join(linhas)
+
+
+@contextmanager
+def perfilar(base_path, intervalo=PROFILE_INTERVAL):
+    """
+    Perfila o bloco (na thread atual e nas que ela propagar) e grava o resultado ao lado
+    dos artefatos (<base>_perfil.*), mesmo se o bloco falhar. Se a thread já estiver sendo
+    perfilada, o bloco entra no perfil em andamento.
+    """
+    try:
+        perfilador = Perfilador(intervalo).iniciar()
+    except RuntimeError as e:
+        print(f"ℹ️ {e} O bloco entra no perfil em andamento.")
+        yield _perfilador_atual()
+        return
+    try:
+        yield perfilador
+    finally:
+        perfilador.parar()
+        try:
+            folded_path, _ = perfilador.salvar(base_path)
+            print(formatar_resumo(perfilador.resumo()))
+            print(f"✅ Perfil salvo em: {folded_path}")
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar o perfil: {e}")
@@ -0,0 +1,249 @@
+"""
+Planejamento offline e reprodução dos Forms.
+
+O modo de planejamento monta, sem acessar a rede, todas as requisições de cada Forms
+(create + batchUpdate do modo Quiz e dos lotes de questões) e grava um plano JSONL
+compacto: uma linha de cabeçalho e uma linha por Forms. O reprodutor executa o plano
+depois (ex.: numa janela de cota fora do pico), com um Forms por conta em paralelo e
+sem as pausas fixas entre lotes (o ritmo fica a cargo do escalonador de cotas).
+
+O progresso da reprodução é gravado num arquivo de estado ao lado do plano
+(<plano>.estado.jsonl); reproduzir o mesmo plano de novo retoma de onde parou,
+reaproveitando os Forms já criados (na mesma conta) e pulando os lotes já enviados.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from cancelamento import RequestTimeout, run_cancellable
+from contas_google import PoolContas
+from core import LAYOUT_PARTS, build_forms
+from lotes_forms import enviar_lote, formatar_rejeitadas, progresso_parcial
+from perfilamento import etapa, propagar
+
+PLAN_VERSION = 1
+ESTADO_SUFFIX = '.estado.jsonl' # Arquivo de estado da reprodução: <plano>.estado.jsonl
+REQUEST_TIMEOUT = 60 # Prazo de cada execute() durante a reprodução
+
+
+def _json_compacto(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def salvar_plano(questions_list, form_title, plan_path, max_por_form, layout=LAYOUT_PARTS):
+    """
+    Grava o plano de criação dos Forms (nenhuma chamada de rede é feita).
+
+    Args:
+        questions_list (list): `Question`s (ou dicts no formato antigo).
+        form_title (str): Título base dos Forms.
+        plan_path (str): Caminho do arquivo de plano (.jsonl).
+        max_por_form (int): Máximo de questões por Forms (por página, no layout 'unico').
+        layout (str): core.LAYOUT_PARTS (um Forms por parte) ou core.LAYOUT_SINGLE (um Forms só).
+
+    Returns:
+        list: Os Forms planejados (veja core.build_forms).
+    """
+    forms = build_forms(questions_list, form_title, max_por_form, layout=layout)
+    cabecalho = {
+        'plano': PLAN_VERSION,
+        'titulo': form_title,
+        'forms': len(forms),
+        'questoes': sum(form['questoes'] for form in forms),
+        'criado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(plan_path, 'w', encoding='utf-8') as f:
+        f.write(_json_compacto(cabecalho) + "\n")
+        for form in forms:
+            f.write(_json_compacto(form) + "\n")
+    return forms
+
+
+def ler_plano(plan_path):
+    """Lê um plano gravado por `salvar_plano`. Returns: (cabeçalho, lista de Forms)."""
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        linhas = [json.loads(linha) for linha in f if linha.strip()]
+    if not linhas or linhas[0].get('plano') != PLAN_VERSION:
+        raise ValueError(f"'{plan_path}' não é um plano de Forms válido.")
+    return linhas[0], linhas[1:]
+
+
+class EstadoReproducao:
+    """
+    Progresso da reprodução de um plano, em JSONL só de acréscimo: cada Forms criado
+    ({'form', 'form_id', 'conta'}), cada lote enviado ({'form', 'lote', 'criadas'}) e cada
+    lote interrompido no meio da bisseção ({'form', 'lote', 'criadas', 'parcial'}, com
+    'parcial' = requisições válidas do início do lote já resolvidas).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.forms = {} # índice do Forms -> {'form_id', 'conta'}
+        self.lotes = {} # índice do Forms -> set de lotes já enviados
+        self.itens = {} # índice do Forms -> itens já criados nele (base dos índices dos próximos)
+        self.parciais = {} # (índice do Forms, lote) -> requisições válidas já resolvidas do lote
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    linha = linha.strip()
+                    if not linha:
+                        continue
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue # Última linha truncada por uma interrupção
+                    if 'form_id' in registro:
+                        self.forms[registro['form']] = registro
+                        continue
+                    if 'parcial' in registro:
+                        chave = (registro['form'], registro['lote'])
+                        self.parciais[chave] = self.parciais.get(chave, 0) + registro['parcial']
+                    else:
+                        self.lotes.setdefault(registro['form'], set()).add(registro['lote'])
+                    self.itens[registro['form']] = self.itens.get(registro['form'], 0) + registro.get('criadas', 0)
+
+    def _gravar(self, registro):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(_json_compacto(registro) + "\n")
+                f.flush()
+
+    def registrar_criacao(self, indice, form_id, conta):
+        self.forms[indice] = {'form': indice, 'form_id': form_id, 'conta': conta}
+        self._gravar(self.forms[indice])
+
+    def registrar_lote(self, indice, lote, criadas=0):
+        self.lotes.setdefault(indice, set()).add(lote)
+        self.itens[indice] = self.itens.get(indice, 0) + criadas
+        self._gravar({'form': indice, 'lote': lote, 'criadas': criadas})
+
+    def registrar_parcial(self, indice, lote, criadas, enviadas):
+        """Registra o início de um lote já resolvido antes de uma interrupção."""
+        chave = (indice, lote)
+        self.parciais[chave] = self.parciais.get(chave, 0) + enviadas
+        self.itens[indice] = self.itens.get(indice, 0) + criadas
+        self._gravar({'form': indice, 'lote': lote, 'criadas': criadas, 'parcial': enviadas})
+
+    def pendentes(self, indice, total_lotes):
+        """Lotes do Forms `indice` ainda não enviados."""
+        feitos = self.lotes.get(indice, set())
+        return [lote for lote in range(total_lotes) if lote not in feitos]
+
+
+def reproduzir_plano(plan_path, service, progress_callback=None, cancel_token=None,
+                     estado_path=None, request_timeout=REQUEST_TIMEOUT):
+    """
+    Executa um plano gravado por `salvar_plano`, retomando do arquivo de estado.
+
+    Args:
+        plan_path (str): Caminho do plano.
+        service (Resource or PoolContas): Serviço da Forms API ou pool de contas; os Forms
+                                          rodam em paralelo, um por conta.
+        progress_callback (function): Recebe (valor 0-100, texto) (opcional).
+        cancel_token (CancelToken): Verificado entre lotes (opcional).
+        estado_path (str): Arquivo de estado; padrão: <plano>.estado.jsonl.
+        request_timeout (float): Prazo de cada execute().
+
+    Returns:
+        list: Um dict por Forms com 'titulo', 'form_id', 'conta', 'link', 'falhas' (lotes
+              que falharam e serão tentados de novo na próxima reprodução) e 'rejeitadas'
+              (questões recusadas, que ficam de fora).
+    """
+    contas = service if isinstance(service, PoolContas) else PoolContas.de_servico(service)
+    _, forms = ler_plano(plan_path)
+    estado = EstadoReproducao(estado_path or plan_path + ESTADO_SUFFIX)
+
+    total = sum(1 + len(form['batches']) for form in forms) or 1
+    # Requisições já feitas em reproduções anteriores (Forms criados + lotes enviados)
+    feitos = {'n': len(estado.forms) + sum(len(lotes) for lotes in estado.lotes.values())}
+    feitos_lock = threading.Lock()
+
+    def avancar(texto):
+        with feitos_lock:
+            feitos['n'] += 1
+            n = feitos['n']
+        if progress_callback:
+            progress_callback(int(100 * n / total), f"{texto} ({n}/{total} requisições)")
+
+    @etapa('forms')
+    def reproduzir_form(i, form):
+        criado = estado.forms.get(i)
+        pendentes = estado.pendentes(i, len(form['batches']))
+        resultado = {'titulo': form['title'], 'form_id': None, 'conta': None, 'link': None, 'falhas': 0, 'rejeitadas': 0}
+        if criado and not pendentes:
+            resultado.update(form_id=criado['form_id'], conta=criado['conta'])
+        else:
+            custo = len(pendentes) + (0 if criado else 1)
+            # Um Forms já criado só pode ser continuado pela conta dona
+            with contas.conta_para(custo, cancel_token, nome=criado['conta'] if criado else None) as conta:
+                forms_api = conta.service.forms()
+                if criado:
+                    form_id = criado['form_id']
+                else:
+                    if cancel_token:
+                        cancel_token.check()
+                    try:
+                        form_id = run_cancellable(
+                            forms_api.create(body=form['create']).execute, cancel_token, request_timeout
+                        )['formId']
+                    except (HttpError, RequestTimeout) as e:
+                        # Uma requisição lenta conta como falha; o Forms é refeito ao retomar o plano
+                        print(f"⚠️ Erro ao criar o Forms {i + 1} do plano: {e}")
+                        resultado['falhas'] = len(pendentes)
+                        return resultado
+                    estado.registrar_criacao(i, form_id, conta.nome)
+                    contas.registrar_dono(form_id, conta, form['title'])
+                    avancar(f"Forms {i + 1}/{len(forms)} criado")
+
+                def enviar(batch_requests):
+                    run_cancellable(
+                        forms_api.batchUpdate(formId=form_id, body={'requests': batch_requests}).execute,
+                        cancel_token, request_timeout
+                    )
+
+                for lote in pendentes:
+                    if cancel_token:
+                        cancel_token.check()
+                    try:
+                        # Itens ruins são isolados por bisseção; os índices seguem os itens já criados
+                        # e o início já resolvido de um lote interrompido antes não é reenviado
+                        criadas, rejeitadas = enviar_lote(
+                            enviar, form['batches'][lote]['requests'], estado.itens.get(i, 0), erros=(HttpError,),
+                            pular=estado.parciais.get((i, lote), 0)
+                        )
+                    except BaseException as e:
+                        criadas, enviadas = progresso_parcial(e)
+                        if enviadas:
+                            estado.registrar_parcial(i, lote, criadas, enviadas)
+                        if not isinstance(e, (HttpError, RequestTimeout)):
+                            raise
+                        print(f"⚠️ Erro ao reproduzir lote {lote + 1} do Forms {i + 1}: {e}")
+                        resultado['falhas'] += 1
+                        continue
+                    if rejeitadas:
+                        print(formatar_rejeitadas(rejeitadas, form['title']))
+                        resultado['rejeitadas'] += len(rejeitadas)
+                    estado.registrar_lote(i, lote, criadas)
+                    avancar(f"Forms {i + 1}/{len(forms)}: lote {lote + 1}/{len(form['batches'])}")
+                resultado.update(form_id=form_id, conta=conta.nome)
+
+        resultado['link'] = f"https://docs.google.com/forms/d/{resultado['form_id']}/edit"
+        print(f"✅ Forms '{form['title']}' reproduzido na conta '{resultado['conta']}'. Link: {resultado['link']}")
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=len(contas), thread_name_prefix="plano-forms") as executor:
+        futures = [executor.submit(propagar(reproduzir_form), i, form) for i, form in enumerate(forms)]
+        try:
+            resultados = [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel() # Não inicia os Forms que ainda estavam na fila
+            raise
+
+    if progress_callback:
+        progress_callback(100, "Reprodução do plano concluída.")
+    return resultados
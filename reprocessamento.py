@@ -0,0 +1,216 @@
+"""
+Reprocessamento incremental de PDFs por páginas.
+
+Cada página é identificada por um hash do seu conteúdo bruto (fluxo de conteúdo do
+PDF, lido sem extrair o texto). As páginas são agrupadas em segmentos com fronteiras
+definidas pelo próprio conteúdo (como no chunking do rsync): inserir ou corrigir uma
+página muda só o segmento dela, sem deslocar os demais. As questões extraídas de cada
+segmento ficam no banco, indexadas pelo hash do segmento.
+
+Ao processar uma nova versão de um PDF conhecido, só os segmentos alterados têm o
+texto extraído e enviado ao Gemini; os demais vêm do banco. Cada segmento é enviado
+com a página seguinte como sobreposição, para não perder questões que atravessam a
+fronteira; as repetidas na sobreposição são descartadas na mesclagem (só entre segmentos
+vizinhos, já que a numeração pode recomeçar no mesmo PDF).
+"""
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import PyPDF2
+
+from banco_questoes import alternativas_da_questao, fingerprint_questao, normalizar_texto
+from perfilamento import propagar
+
+SEGMENT_AVG_PAGES = 4 # Tamanho médio (em páginas) dos segmentos
+SEGMENT_MAX_PAGES = 8 # Tamanho máximo de um segmento
+SEGMENT_OVERLAP_PAGES = 1 # Páginas seguintes enviadas junto como contexto
+MAX_PARALLEL_SEGMENTS = 4 # Segmentos enviados ao Gemini ao mesmo tempo
+
+
+def hashes_das_paginas(pdf_path, doc=None):
+    """
+    Hash do conteúdo bruto de cada página. Páginas sem fluxo de conteúdo legível usam
+    o texto extraído por `doc` (um `PdfDocumentText`), se informado.
+    """
+    hashes = []
+    with open(pdf_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        for i, page in enumerate(reader.pages):
+            try:
+                contents = page.get_contents()
+                data = contents.get_data() if contents is not None else b""
+            except Exception:
+                data = b""
+            if not data and doc is not None:
+                data = doc.page_text(i).encode('utf-8')
+            hashes.append(hashlib.sha1(data).hexdigest())
+    return hashes
+
+
+def segmentar(hashes, avg_pages=SEGMENT_AVG_PAGES, max_pages=SEGMENT_MAX_PAGES):
+    """
+    Divide as páginas em segmentos. Um segmento termina numa página cujo hash cai na
+    fronteira (1 em `avg_pages`) ou quando atinge `max_pages`.
+
+    Returns:
+        list: Intervalos (início, fim) de páginas, com fim exclusivo.
+    """
+    segmentos = []
+    inicio = 0
+    for i, h in enumerate(hashes):
+        if int(h[:8], 16) % avg_pages == avg_pages - 1 or i + 1 - inicio >= max_pages:
+            segmentos.append((inicio, i + 1))
+            inicio = i + 1
+    if inicio < len(hashes):
+        segmentos.append((inicio, len(hashes)))
+    return segmentos
+
+
+def chave_do_segmento(hashes, inicio, fim, overlap=SEGMENT_OVERLAP_PAGES):
+    """Hash de um segmento: páginas do intervalo mais as de sobreposição (o texto enviado)."""
+    paginas = hashes[inicio:min(fim + overlap, len(hashes))]
+    return hashlib.sha1(":".join(paginas).encode('ascii')).hexdigest()
+
+
+def _mesma_questao(a, b):
+    # Mesmo número (ou ambas sem número) e um enunciado contido no outro: uma das cópias pode
+    # estar cortada no começo (questão que atravessa a fronteira) ou no fim (fim da sobreposição)
+    if str(a.get('Número', '') or '').strip() != str(b.get('Número', '') or '').strip():
+        return False
+    if fingerprint_questao(a) == fingerprint_questao(b):
+        return True
+    ea, eb = normalizar_texto(a.get('Enunciado', '')), normalizar_texto(b.get('Enunciado', ''))
+    return bool(ea and eb) and (ea in eb or eb in ea)
+
+
+def _completude(q):
+    return (len(alternativas_da_questao(q)), bool(normalizar_texto(q.get('Correta', ''))),
+            len(normalizar_texto(q.get('Enunciado', ''))))
+
+
+def mesclar_questoes(listas):
+    """
+    Junta as questões dos segmentos, em ordem. As questões da sobreposição ficam no fim da
+    lista de um segmento e no começo da do seguinte; só essas repetidas são descartadas
+    (a numeração pode recomeçar no mesmo PDF, ex.: vários simulados). De cada par fica a
+    cópia mais completa (mais alternativas, com gabarito, enunciado maior) e, no empate,
+    a do segmento seguinte, que é o dono da página.
+    """
+    mescladas = []
+    anterior = []
+    for questions in listas:
+        questions = list(questions)
+        # Maior trecho final do segmento anterior que se repete no começo deste
+        repetidas = 0
+        for k in range(min(len(anterior), len(questions)), 0, -1):
+            if all(_mesma_questao(a, b) for a, b in zip(anterior[-k:], questions)):
+                repetidas = k
+                break
+        for j, q in enumerate(anterior[len(anterior) - repetidas:]):
+            if _completude(q) > _completude(questions[j]):
+                questions[j] = q
+        mescladas.extend(anterior[:len(anterior) - repetidas])
+        anterior = questions
+    mescladas.extend(anterior)
+    return mescladas
+
+
+class Segmento:
+    """Um intervalo de páginas: chave, questões do banco (se conhecido) e texto (se a enviar)."""
+    __slots__ = ('inicio', 'fim', 'chave', 'questoes', 'texto')
+
+    def __init__(self, inicio, fim, chave):
+        self.inicio = inicio
+        self.fim = fim
+        self.chave = chave
+        self.questoes = None
+        self.texto = None
+
+    @property
+    def alterado(self):
+        return self.questoes is None
+
+
+def preparar_segmentos(pdf_path, banco, backend, progress_callback=None, cancel_token=None):
+    """
+    Calcula os segmentos do PDF, busca no banco as questões dos já processados e extrai
+    o texto (com a sobreposição) só dos alterados.
+
+    Args:
+        pdf_path (str): Caminho do PDF.
+        banco (BancoQuestoes): Banco com as questões por segmento.
+        backend (PdfTextBackend): Backend de extração de texto (veja pdf_backends.py).
+        progress_callback (function): Recebe (valor 0-10, texto) (opcional).
+        cancel_token (CancelToken): Verificado entre páginas (opcional).
+
+    Returns:
+        list: Os `Segmento`s, em ordem de páginas.
+    """
+    with backend.open(pdf_path) as doc:
+        hashes = hashes_das_paginas(pdf_path, doc)
+        segmentos = []
+        for inicio, fim in segmentar(hashes):
+            segmento = Segmento(inicio, fim, chave_do_segmento(hashes, inicio, fim))
+            segmento.questoes = banco.questoes_do_segmento(segmento.chave)
+            segmentos.append(segmento)
+
+        alterados = [s for s in segmentos if s.alterado]
+        paginas = sorted({p for s in alterados for p in range(s.inicio, min(s.fim + SEGMENT_OVERLAP_PAGES, len(hashes)))})
+        textos = {}
+        for n, p in enumerate(paginas):
+            if cancel_token:
+                cancel_token.check() # Interrompe entre páginas se cancelado ou fora do prazo
+            textos[p] = doc.page_text(p)
+            if progress_callback:
+                progress_callback(int((n + 1) / len(paginas) * 10), f"1/5 - Extraindo página alterada {n + 1} de {len(paginas)}...")
+
+    for s in alterados:
+        fim = min(s.fim + SEGMENT_OVERLAP_PAGES, len(hashes))
+        s.texto = "\n".join(textos[p] for p in range(s.inicio, fim) if textos[p]).strip()
+    return segmentos
+
+
+def processar_segmentos(segmentos, extrair_questoes, banco, origem=None, progress_callback=None,
+                        cancel_token=None, max_workers=MAX_PARALLEL_SEGMENTS):
+    """
+    Envia ao Gemini os segmentos alterados (em paralelo), guarda as questões de cada um
+    no banco e mescla tudo, em ordem de páginas, com as questões dos inalterados.
+
+    Args:
+        segmentos (list): Saída de `preparar_segmentos`.
+        extrair_questoes (callable): Recebe o texto de um segmento e retorna suas questões.
+        banco (BancoQuestoes): Onde as questões de cada segmento são guardadas.
+        origem (str): Nome do arquivo, registrado junto dos segmentos.
+        progress_callback (function): Recebe (valor 10-50, texto) (opcional).
+        cancel_token (CancelToken): Verificado antes de cada envio (opcional).
+
+    Returns:
+        list: Todas as questões do PDF.
+    """
+    alterados = [s for s in segmentos if s.alterado]
+    if progress_callback:
+        progress_callback(15, f"2/5 - {len(segmentos) - len(alterados)} de {len(segmentos)} trechos reaproveitados, "
+                              f"enviando {len(alterados)} para a IA...")
+
+    def processar(segmento):
+        if cancel_token:
+            cancel_token.check()
+        questions = extrair_questoes(segmento.texto) if segmento.texto else []
+        banco.registrar_segmento(segmento.chave, questions, origem)
+        return questions
+
+    if alterados:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(alterados)), thread_name_prefix="segmentos") as executor:
+            futures = [executor.submit(propagar(processar), s) for s in alterados]
+            try:
+                for n, (segmento, future) in enumerate(zip(alterados, futures)):
+                    segmento.questoes = future.result()
+                    if progress_callback:
+                        progress_callback(15 + int((n + 1) / len(alterados) * 35),
+                                          f"2/5 - Trechos processados pela IA: {n + 1}/{len(alterados)}...")
+            except BaseException:
+                for future in futures:
+                    future.cancel() # Não envia os segmentos que ainda estavam na fila
+                raise
+
+    return mesclar_questoes(s.questoes for s in segmentos)
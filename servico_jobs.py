@@ -0,0 +1,466 @@
+"""
+Modo serviço: processamento de PDFs e planilhas como jobs, por HTTP local.
+
+Em vez de cada operador rodar o seu App.py (com OAuth, cliente Gemini e conexões da
+Forms API próprios), um único processo recebe os arquivos como jobs. Os jobs ficam
+numa fila persistente (SQLite, JOBS_DB) e os arquivos em JOBS_DIR/<id>/; um pool de
+SERVICE_WORKERS threads executa as mesmas funções do pipeline do App.py, reaproveitando
+o cliente Gemini compartilhado (conexões, cache de contexto e agendador de cotas), o
+banco de questões e as contas Google autenticadas uma única vez na subida. Jobs que
+estavam em execução quando o serviço parou voltam para a fila ao reiniciar.
+
+Endpoints (respostas em JSON):
+    POST /jobs?arquivo=<nome>&titulo=<título>   corpo = bytes do .pdf ou .xlsx
+                                                 (&perfil=1 grava o perfil só deste job em JOBS_DIR/<id>/)
+    GET  /jobs                                   últimos jobs
+    GET  /jobs/<id>                              estado, progresso e posição na fila
+    GET  /jobs/<id>/resultado                    links dos Forms (ou plano) do job concluído
+    POST /jobs/<id>/cancelar                     cancela um job na fila ou em execução
+    GET  /metricas                               fila de jobs e cotas do Gemini
+
+Uso: python servico_jobs.py [--porta 8765] [--workers 4]
+     curl --data-binary @simulado.pdf "http://127.0.0.1:8765/jobs?arquivo=simulado.pdf"
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+import App as pipeline
+from banco_questoes import BancoQuestoes, BANCO_FILE
+from cancelamento import CancelToken, Cancelled, DeadlineExceeded
+from contas_google import PoolContas
+from core import Question
+from gemini_client import get_gemini_client
+from perfilamento import perfilar
+
+SERVICE_HOST = '127.0.0.1' # Só aceita conexões da própria máquina (use um proxy para expor na rede)
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 4 # Jobs processados ao mesmo tempo
+JOBS_DB = 'jobs.db' # Fila persistente dos jobs
+JOBS_DIR = 'jobs' # Arquivos enviados e artefatos de cada job (JOBS_DIR/<id>/)
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+TIPOS_POR_EXTENSAO = {'.pdf': 'pdf', '.xlsx': 'excel', '.xls': 'excel'}
+
+# Estados de um job
+NA_FILA = 'na_fila'
+PROCESSANDO = 'processando'
+CONCLUIDO = 'concluido'
+ERRO = 'erro'
+CANCELADO = 'cancelado'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    arquivo TEXT NOT NULL,
+    titulo TEXT NOT NULL,
+    perfil INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL,
+    resultado TEXT,
+    erro TEXT,
+    criado_em REAL NOT NULL,
+    iniciado_em REAL,
+    concluido_em REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_estado ON jobs (estado, id);
+"""
+
+
+def nome_seguro(nome):
+    """Nome de arquivo sem diretórios nem caracteres problemáticos."""
+    nome = re.sub(r'[^\w.\- ]', '_', os.path.basename(nome or '')).strip(' .')
+    return nome or 'arquivo'
+
+
+class FilaJobs:
+    """
+    Fila persistente de jobs (SQLite). Como no banco de questões, cada operação abre sua
+    própria conexão; o progresso em andamento fica só em memória.
+    """
+    def __init__(self, path=JOBS_DB, jobs_dir=JOBS_DIR):
+        self.path = path
+        self.jobs_dir = jobs_dir
+        self._cond = threading.Condition() # Acorda os workers quando chega um job
+        self._progresso = {} # id -> (valor, texto) dos jobs em execução
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+            # Jobs interrompidos por uma parada do serviço voltam para a fila
+            recuperados = conn.execute(
+                "UPDATE jobs SET estado = ?, iniciado_em = NULL WHERE estado = ?", (NA_FILA, PROCESSANDO)
+            ).rowcount
+        if recuperados:
+            print(f"ℹ️ {recuperados} job(s) interrompido(s) voltaram para a fila.")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def pasta(self, job_id):
+        return os.path.join(self.jobs_dir, str(job_id))
+
+    def caminho_arquivo(self, job):
+        return os.path.join(self.pasta(job['id']), job['arquivo'])
+
+    @property
+    def trava(self):
+        """Trava da fila; com ela, nenhum job passa de na fila para em processamento."""
+        return self._cond
+
+    def enfileirar(self, arquivo, conteudo, titulo=None, perfil=False):
+        """
+        Grava o arquivo e coloca o job na fila.
+
+        Returns:
+            int: O id do job.
+        """
+        arquivo = nome_seguro(arquivo)
+        tipo = TIPOS_POR_EXTENSAO.get(os.path.splitext(arquivo)[1].lower())
+        if tipo is None:
+            raise ValueError(f"Tipo de arquivo não suportado: '{arquivo}' (envie .pdf ou .xlsx).")
+        titulo = titulo or os.path.splitext(arquivo)[0]
+        with self._cond:
+            with closing(self._connect()) as conn, conn:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (tipo, arquivo, titulo, perfil, estado, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+                    (tipo, arquivo, titulo, int(perfil), NA_FILA, time.time())
+                ).lastrowid
+                # O arquivo é gravado antes do commit: um worker nunca vê um job sem arquivo
+                os.makedirs(self.pasta(job_id), exist_ok=True)
+                with open(os.path.join(self.pasta(job_id), arquivo), 'wb') as f:
+                    f.write(conteudo)
+            self._cond.notify()
+        return job_id
+
+    def proximo(self, timeout=None, ao_retirar=None):
+        """
+        Retira o job mais antigo da fila (marcando-o em processamento), ou None após `timeout`.
+        `ao_retirar(job)` é chamado sob a trava da fila, junto com a troca de estado.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                with closing(self._connect()) as conn, conn:
+                    row = conn.execute(
+                        "SELECT * FROM jobs WHERE estado = ? ORDER BY id LIMIT 1", (NA_FILA,)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute(
+                            "UPDATE jobs SET estado = ?, iniciado_em = ? WHERE id = ?",
+                            (PROCESSANDO, time.time(), row['id'])
+                        )
+                        self._progresso[row['id']] = (0, "Iniciando...")
+                        job = dict(row)
+                        if ao_retirar:
+                            ao_retirar(job)
+                        return job
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self._cond.wait(restante)
+
+    def atualizar_progresso(self, job_id, valor, texto):
+        self._progresso[job_id] = (valor, texto)
+
+    def finalizar(self, job_id, estado, resultado=None, erro=None):
+        """Registra o fim de um job (concluído, com erro ou cancelado)."""
+        self._progresso.pop(job_id, None)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET estado = ?, resultado = ?, erro = ?, concluido_em = ? WHERE id = ?",
+                (estado, json.dumps(resultado, ensure_ascii=False) if resultado is not None else None,
+                 erro, time.time(), job_id)
+            )
+
+    def cancelar_na_fila(self, job_id):
+        """Cancela um job que ainda não começou. Returns: True se estava na fila."""
+        with self._cond, closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE jobs SET estado = ?, concluido_em = ? WHERE id = ? AND estado = ?",
+                (CANCELADO, time.time(), job_id, NA_FILA)
+            ).rowcount > 0
+
+    def obter(self, job_id):
+        """Estado do job (dict), com progresso e posição na fila, ou None se não existe."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job['estado'] == NA_FILA:
+                job['posicao'] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE estado = ? AND id < ?", (NA_FILA, job_id)
+                ).fetchone()[0] + 1
+        job['resultado'] = json.loads(job['resultado']) if job['resultado'] else None
+        valor, texto = self._progresso.get(job_id, (100 if job['estado'] == CONCLUIDO else 0, None))
+        job['progresso'] = valor
+        job['mensagem'] = texto
+        return job
+
+    def listar(self, limite=50):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, tipo, arquivo, titulo, estado, criado_em, concluido_em FROM jobs ORDER BY id DESC LIMIT ?",
+                (limite,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def contagem(self):
+        """Quantidade de jobs por estado."""
+        with closing(self._connect()) as conn:
+            return dict(conn.execute("SELECT estado, COUNT(*) FROM jobs GROUP BY estado").fetchall())
+
+
+def ler_questoes_excel(file_path):
+    """Questões de uma planilha no formato gerado pelo apiPDF.py (uma linha por questão)."""
+    df = pd.read_excel(file_path)
+    df = df[df['Enunciado'].notna()]
+    return [Question.from_dict(row) for row in df.to_dict('records')]
+
+
+class ServicoJobs:
+    """Pool de workers que executa os jobs da fila com os clientes já aquecidos."""
+    def __init__(self, fila, banco, contas, workers=SERVICE_WORKERS):
+        self.fila = fila
+        self.banco = banco
+        self.contas = contas # PoolContas (None no modo FORMS_PLAN_ONLY)
+        self.workers = workers
+        self._tokens = {} # id -> CancelToken dos jobs em execução
+        self._parar = threading.Event()
+        self._threads = []
+
+    def iniciar(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._trabalhar, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def parar(self):
+        """Para de pegar jobs. Os em execução voltam para a fila na próxima subida do serviço."""
+        self._parar.set()
+
+    def cancelar(self, job_id):
+        """Cancela o job (na fila ou em execução). Returns: True se havia o que cancelar."""
+        # Sob a trava da fila, o job não troca de estado entre as duas verificações: ou ainda
+        # está na fila, ou o worker que o retirou já registrou o token
+        with self.fila.trava:
+            if self.fila.cancelar_na_fila(job_id):
+                return True
+            token = self._tokens.get(job_id)
+            if token is None:
+                return False
+            token.cancel()
+            return True
+
+    def _registrar_token(self, job):
+        job['token'] = self._tokens[job['id']] = CancelToken()
+
+    def _trabalhar(self):
+        while not self._parar.is_set():
+            job = self.fila.proximo(timeout=1, ao_retirar=self._registrar_token)
+            if job is None:
+                continue
+            token = job.pop('token')
+            print(f"ℹ️ Job {job['id']} ({job['arquivo']}) iniciado em {threading.current_thread().name}.")
+            try:
+                perfil_base = os.path.splitext(self.fila.caminho_arquivo(job))[0] if job['perfil'] else None
+                with perfilar(perfil_base) if perfil_base else nullcontext():
+                    resultado = self.executar(job, token)
+                self.fila.finalizar(job['id'], CONCLUIDO, resultado)
+                print(f"✅ Job {job['id']} concluído.")
+            except DeadlineExceeded as e:
+                self.fila.finalizar(job['id'], ERRO, erro=str(e))
+            except Cancelled:
+                self.fila.finalizar(job['id'], CANCELADO, erro="Cancelado.")
+            except Exception as e:
+                print(f"⚠️ Job {job['id']} falhou: {e}")
+                self.fila.finalizar(job['id'], ERRO, erro=str(e))
+            finally:
+                with self.fila.trava:
+                    self._tokens.pop(job['id'], None)
+
+    def executar(self, job, token):
+        """
+        Executa um job com as funções do pipeline (App.py).
+
+        Returns:
+            dict: 'questoes' (novas), 'duplicadas', 'forms' (links) e 'plano' (caminho, no
+                  modo FORMS_PLAN_ONLY), além de 'avisos' (erros não fatais na criação dos Forms).
+        """
+        caminho = self.fila.caminho_arquivo(job)
+        progresso = lambda valor, texto: self.fila.atualizar_progresso(job['id'], valor, texto)
+        avisos = []
+        job_nome = f"job-{job['id']}" # Cada job tem sua parte justa das cotas do Gemini
+
+        if job['tipo'] == 'pdf':
+            questions_list, duplicadas, raw_text = pipeline.extrair_questoes_pdf(
+                caminho, self.banco, progresso, token, job=job_nome
+            )
+        else:
+            progresso(10, "Lendo a planilha...")
+            questions_list, duplicadas = self.banco.filtrar_novas(ler_questoes_excel(caminho))
+            raw_text = None
+        # As questões só entram no banco depois que o Forms (ou o plano) for criado
+        registro = pipeline.RegistroBanco(self.banco, job['arquivo'], raw_text)
+
+        resultado = {'questoes': len(questions_list), 'duplicadas': len(duplicadas), 'forms': [], 'plano': None,
+                     'avisos': avisos}
+        if not questions_list:
+            progresso(100, "Nenhuma questão nova.")
+            return resultado
+
+        base = os.path.splitext(caminho)[0]
+        relatorio_path = base + "_duplicadas.json"
+        if pipeline.FORMS_PLAN_ONLY:
+            plano = base + "_plano.jsonl"
+            _, resultado['questoes'] = pipeline.planejar_forms_google(
+                job['titulo'], questions_list, plano, progresso, relatorio_path=relatorio_path, ao_publicar=registro
+            )
+            registro.concluir(resultado['questoes'])
+            resultado['plano'] = plano
+            return resultado
+
+        token.check()
+        with token.stage('forms', pipeline.STAGE_TIMEOUTS.get('forms')):
+            resultado['forms'], resultado['questoes'] = pipeline.criar_forms_google(
+                self.contas, job['titulo'], questions_list, progresso,
+                relatorio_path=relatorio_path,
+                error_callback=lambda titulo, mensagem: avisos.append(f"{titulo}: {mensagem}"),
+                cancel_token=token,
+                ao_publicar=registro
+            )
+        registro.concluir(resultado['questoes'])
+        return resultado
+
+    def metricas(self):
+        contagem = self.fila.contagem()
+        return {
+            'fila': contagem.get(NA_FILA, 0),
+            'em_execucao': contagem.get(PROCESSANDO, 0),
+            'jobs_por_estado': contagem,
+            'workers': self.workers,
+            'gemini': get_gemini_client().queue_stats(),
+            'gemini_latencia': get_gemini_client().latency_stats(),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    servico = None # ServicoJobs, definido em `criar_servidor`
+
+    def _responder(self, status, dados):
+        corpo = json.dumps(dados, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _rota(self):
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split('/') if p]
+        return partes, {k: v[0] for k, v in parse_qs(url.query).items()}
+
+    def _job_id(self, partes):
+        try:
+            return int(partes[1])
+        except (IndexError, ValueError):
+            return None
+
+    def do_GET(self):
+        partes, _ = self._rota()
+        fila = self.servico.fila
+        if partes == ['jobs']:
+            return self._responder(200, fila.listar())
+        if partes == ['metricas']:
+            return self._responder(200, self.servico.metricas())
+        if partes[:1] == ['jobs'] and len(partes) in (2, 3):
+            job = fila.obter(self._job_id(partes))
+            if job is None:
+                return self._responder(404, {'erro': "Job não encontrado."})
+            if len(partes) == 2:
+                return self._responder(200, job)
+            if partes[2] == 'resultado':
+                if job['estado'] != CONCLUIDO:
+                    return self._responder(409, {'erro': f"Job ainda não concluído (estado: {job['estado']}).",
+                                                 'estado': job['estado']})
+                return self._responder(200, job['resultado'])
+        self._responder(404, {'erro': "Rota não encontrada."})
+
+    def do_POST(self):
+        partes, query = self._rota()
+        if partes == ['jobs']:
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            if not tamanho:
+                return self._responder(400, {'erro': "Envie o arquivo no corpo da requisição."})
+            if tamanho > MAX_UPLOAD_BYTES:
+                return self._responder(413, {'erro': f"Arquivo maior que {MAX_UPLOAD_BYTES} bytes."})
+            arquivo = query.get('arquivo') or self.headers.get('X-Arquivo')
+            try:
+                job_id = self.servico.fila.enfileirar(
+                    arquivo, self.rfile.read(tamanho), query.get('titulo'), perfil=query.get('perfil') == '1'
+                )
+            except ValueError as e:
+                return self._responder(400, {'erro': str(e)})
+            return self._responder(202, {'id': job_id, 'estado': NA_FILA, 'status': f"/jobs/{job_id}"})
+        if partes[:1] == ['jobs'] and len(partes) == 3 and partes[2] == 'cancelar':
+            job_id = self._job_id(partes)
+            if self.servico.cancelar(job_id):
+                return self._responder(200, {'id': job_id, 'cancelado': True})
+            return self._responder(409, {'erro': "Job inexistente ou já finalizado."})
+        self._responder(404, {'erro': "Rota não encontrada."})
+
+    def log_message(self, format, *args):
+        pass # Sem uma linha no console por requisição de status
+
+
+def criar_servidor(servico, host=SERVICE_HOST, port=SERVICE_PORT):
+    handler = type('Handler', (_Handler,), {'servico': servico})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço local de jobs PDF/Excel → Google Forms.")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--porta', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS)
+    args = parser.parse_args()
+
+    progresso = lambda valor, texto: print(f"ℹ️ {texto}")
+    erro = lambda titulo, mensagem: print(f"⚠️ {titulo}: {mensagem}")
+
+    contas = None
+    if not pipeline.FORMS_PLAN_ONLY:
+        # Autenticação única: todos os jobs usam as mesmas contas (cada conta, um Forms por vez)
+        service = pipeline.autenticar_google(progresso, erro)
+        if not service:
+            raise SystemExit(1)
+        contas = service if isinstance(service, PoolContas) else PoolContas.de_servico(service)
+    # Cria já o cliente compartilhado com a configuração do App.py (as métricas o consultam)
+    get_gemini_client(hedging=pipeline.GEMINI_HEDGING, rpm=pipeline.GEMINI_RPM, tpm=pipeline.GEMINI_TPM)
+
+    servico = ServicoJobs(FilaJobs(), BancoQuestoes(BANCO_FILE), contas, args.workers).iniciar()
+    servidor = criar_servidor(servico, args.host, args.porta)
+    print(f"✅ Serviço de jobs em http://{args.host}:{args.porta} ({args.workers} workers).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servico.parar()
+        if contas is not None:
+            contas.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Orçamentos RPM/TPM e divisão justa das chamadas entre jobs."""
+import asyncio
+
+from agendador_gemini import AgendadorGemini
+
+
+def test_job_menos_servido_passa_na_frente_na_fila():
+    async def cenario():
+        agendador = AgendadorGemini(rpm=2, tpm=None, window=0.3)
+        await agendador.adquirir(100, 'A')
+        await asyncio.sleep(0.1)
+        await agendador.adquirir(100, 'A') # Janela cheia, com A já servido
+
+        ordem = []
+
+        async def pedir(job):
+            await agendador.adquirir(100, job)
+            ordem.append(job)
+
+        pedido_a = asyncio.create_task(pedir('A'))
+        await asyncio.sleep(0.01)
+        pedido_b = asyncio.create_task(pedir('B')) # Chega depois, mas B ainda não consumiu nada
+        await asyncio.gather(pedido_a, pedido_b)
+        return ordem
+
+    assert asyncio.run(cenario()) == ['B', 'A']
+
+
+def test_mesmo_job_e_atendido_em_ordem_de_chegada():
+    async def cenario():
+        agendador = AgendadorGemini(rpm=1, tpm=None, window=0.1)
+        ordem = []
+
+        async def pedir(i):
+            await agendador.adquirir(10, 'A')
+            ordem.append(i)
+
+        await asyncio.gather(*(pedir(i) for i in range(3)))
+        return ordem
+
+    assert asyncio.run(cenario()) == [0, 1, 2]
+
+
+def test_tokens_reais_substituem_a_estimativa():
+    async def cenario():
+        agendador = AgendadorGemini(rpm=None, tpm=1000, window=60)
+        entrada = await agendador.adquirir(900, 'A')
+        agendador.liberar(entrada, tokens_reais=200)
+        # Com a contagem real, a próxima chamada cabe na mesma janela
+        await asyncio.wait_for(agendador.adquirir(700, 'B'), timeout=1)
+        return agendador.metrics()
+
+    metricas = asyncio.run(cenario())
+    assert metricas['tokens_janela'] == 900
+    assert metricas['requisicoes_janela'] == 2
+    assert metricas['fila'] == 0
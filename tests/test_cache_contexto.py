@@ -0,0 +1,95 @@
+"""Cache de contexto com um serviço de cache e um cliente Gemini falsos (sem rede)."""
+import itertools
+import time
+from types import SimpleNamespace
+
+from google.genai.errors import APIError
+
+from cache_contexto import CacheContexto, RegistroCaches, cache_ausente
+
+
+class CacheBackendFalso:
+    """Serviço de cache em memória, com a mesma interface de `GeminiCacheBackend`."""
+    def __init__(self):
+        self.caches = {} # nome -> (prefixo, expira_em)
+        self.criados = 0
+        self._ids = itertools.count(1)
+
+    def criar(self, model, prefixo, ttl):
+        nome = f"cachedContents/falso-{next(self._ids)}"
+        expira_em = time.time() + ttl
+        self.caches[nome] = (prefixo, expira_em)
+        self.criados += 1
+        return nome, expira_em
+
+    def apagar(self, nome):
+        self.caches.pop(nome, None)
+
+    def resolver(self, nome):
+        """Prefixo guardado no cache, ou APIError 404 se não existe/expirou (como a API real)."""
+        prefixo, expira_em = self.caches.get(nome, (None, 0))
+        if prefixo is None or expira_em <= time.time():
+            raise APIError(404, {'error': {'message': f"CachedContent not found: {nome}"}})
+        return prefixo
+
+
+class ClienteGeminiFalso:
+    """Registra o prompt efetivo de cada chamada (prefixo do cache + conteúdo enviado)."""
+    def __init__(self, backend):
+        self.backend = backend
+        self.chamadas = [] # (conteúdo enviado, prompt efetivo)
+
+    def generate_content_sync(self, contents, model=None, config=None, **kwargs):
+        nome = (config or {}).get('cached_content')
+        prompt = (self.backend.resolver(nome) if nome else '') + contents
+        self.chamadas.append((contents, prompt))
+        return SimpleNamespace(text='[]')
+
+
+def _cache(min_tokens=10):
+    backend = CacheBackendFalso()
+    cliente = ClienteGeminiFalso(backend)
+    return CacheContexto(cliente, backend=backend, registro=RegistroCaches(None), min_tokens=min_tokens), cliente, backend
+
+
+def test_continuacoes_enviam_so_o_pedido_e_reusam_o_cache():
+    cache, cliente, backend = _cache()
+    prefixo = "instruções + documento " * 20
+    cache.generate(prefixo, "continue após 10", "m")
+    cache.generate(prefixo, "continue após 20", "m")
+    assert backend.criados == 1
+    assert [enviado for enviado, _ in cliente.chamadas] == ["continue após 10", "continue após 20"]
+    assert cliente.chamadas[1][1] == prefixo + "continue após 20"
+
+
+def test_prefixo_pequeno_vai_sem_cache():
+    cache, cliente, backend = _cache(min_tokens=10_000)
+    cache.generate("curto", " doc", "m")
+    assert backend.criados == 0
+    assert cliente.chamadas == [("curto doc", "curto doc")]
+
+
+def test_cache_sumido_no_servidor_reenvia_o_prompt_completo():
+    cache, cliente, backend = _cache()
+    prefixo = "p" * 200
+    cache.generate(prefixo, "a", "m")
+    backend.caches.clear()
+    cache.generate(prefixo, "b", "m")
+    assert cliente.chamadas[-1] == (prefixo + "b", prefixo + "b")
+
+
+def test_descartar_apaga_o_cache():
+    cache, _, backend = _cache()
+    prefixo = "p" * 200
+    cache.generate(prefixo, "a", "m")
+    cache.descartar("m", prefixo)
+    assert backend.caches == {}
+    cache.generate(prefixo, "b", "m")
+    assert backend.criados == 2
+
+
+def test_so_erros_do_cache_contam_como_falta_de_cache():
+    assert cache_ausente(APIError(404, {'error': {'message': 'x'}}))
+    assert cache_ausente(APIError(400, {'error': {'message': 'CachedContent not found: cachedContents/1'}}))
+    assert not cache_ausente(APIError(400, {'error': {'message': 'Invalid JSON payload'}}))
+    assert not cache_ausente(APIError(500, {'error': {'message': 'cached content not found'}}))
@@ -0,0 +1,56 @@
+"""Leitura do JSON truncado do Gemini e continuação da resposta."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from continuacao import completar_resposta, extrair_json
+
+
+def resposta(texto, truncada=False):
+    motivo = 'FinishReason.MAX_TOKENS' if truncada else 'FinishReason.STOP'
+    return SimpleNamespace(text=texto, candidates=[SimpleNamespace(finish_reason=motivo)])
+
+
+def test_json_completo_com_texto_em_volta():
+    texto = 'Segue a lista:\n[{"numero": 1, "alternativas": ["a", "b"]}, {"numero": 2, "alternativas": []}]\nFim.'
+    dados, completo = extrair_json(texto)
+    assert completo
+    assert [q['numero'] for q in dados] == [1, 2]
+
+
+def test_lista_truncada_guarda_os_itens_completos():
+    texto = '```json\n[{"numero": 1, "alternativas": ["a", "b"]},\n {"numero": 2, "enunciado": "Qual'
+    dados, completo = extrair_json(texto)
+    assert not completo
+    assert dados == [{'numero': 1, 'alternativas': ['a', 'b']}]
+
+
+def test_lista_truncada_dentro_de_objeto():
+    dados, completo = extrair_json('{"perguntas": [{"numero": 1}, {"numero": 2}, {"num')
+    assert not completo
+    assert dados == [{'numero': 1}, {'numero': 2}]
+
+
+def test_sem_json():
+    with pytest.raises(ValueError):
+        extrair_json("Não encontrei questões neste documento.")
+
+
+def test_completar_resposta_pede_so_as_questoes_seguintes():
+    pedidos = []
+
+    def continuar(ultimo):
+        pedidos.append(ultimo)
+        # O modelo repete a última questão completa antes de seguir
+        return resposta('[{"numero": 2}, {"numero": 3}, {"numero": 4}]')
+
+    texto = completar_resposta(resposta('[{"numero": 1}, {"numero": 2}, {"nu', truncada=True), continuar)
+
+    assert pedidos == [2]
+    assert [q['numero'] for q in json.loads(texto)] == [1, 2, 3, 4]
+
+
+def test_resposta_completa_nao_pede_continuacao():
+    texto = '[{"numero": 1}]'
+    assert completar_resposta(resposta(texto), lambda ultimo: pytest.fail("continuação desnecessária")) == texto
@@ -0,0 +1,70 @@
+"""Bisseção dos lotes recusados e progresso parcial de um lote interrompido."""
+import pytest
+
+from lotes_forms import enviar_com_bissecao, enviar_lote, progresso_parcial
+
+
+class ErroApi(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+
+
+def item(titulo):
+    opcoes = [{'value': 'a'}, {'value': 'b'}]
+    return {'createItem': {'item': {'title': titulo, 'questionItem': {'question': {
+        'choiceQuestion': {'type': 'RADIO', 'options': opcoes}}}}, 'location': {'index': 0}}}
+
+
+class FormsFalso:
+    """Recusa (400) qualquer lote com 'ruim'; os demais com um título de `fora_do_ar` falham (503)."""
+    def __init__(self, fora_do_ar=()):
+        self.fora_do_ar = set(fora_do_ar)
+        self.criados = [] # (título, índice) dos itens aceitos
+
+    def enviar(self, requests):
+        titulos = [r['createItem']['item']['title'] for r in requests]
+        if 'ruim' in titulos:
+            raise ErroApi(400)
+        if self.fora_do_ar & set(titulos):
+            raise ErroApi(503)
+        self.criados += [(r['createItem']['item']['title'], r['createItem']['location']['index']) for r in requests]
+
+
+def test_bissecao_isola_o_item_recusado_e_reindexa_os_demais():
+    forms = FormsFalso()
+    lote = [item('a'), item('ruim'), item('c'), item('d')]
+
+    criadas, recusadas, chamadas = enviar_com_bissecao(forms.enviar, lote, 5, erros=(ErroApi,))
+
+    assert criadas == 3
+    assert [titulo for titulo, _ in forms.criados] == ['a', 'c', 'd']
+    assert [indice for _, indice in forms.criados] == [5, 6, 7]
+    assert [r['createItem']['item']['title'] for r, _ in recusadas] == ['ruim']
+    assert chamadas == 5 # lote, [a, ruim], [a], [ruim], [c, d]
+
+
+def test_interrupcao_leva_o_progresso_da_metade_ja_resolvida():
+    forms = FormsFalso(fora_do_ar={'d'})
+    lote = [item('a'), item('ruim'), item('c'), item('d')]
+
+    with pytest.raises(ErroApi) as erro:
+        enviar_com_bissecao(forms.enviar, lote, 0, erros=(ErroApi,))
+
+    assert erro.value.status_code == 503
+    assert progresso_parcial(erro.value) == (1, 2) # 'a' criada; 'a' e 'ruim' resolvidas
+
+
+def test_progresso_parcial_de_erro_sem_progresso():
+    assert progresso_parcial(ErroApi(503)) == (0, 0)
+
+
+def test_enviar_lote_retomado_nao_reenvia_o_inicio_resolvido():
+    forms = FormsFalso()
+    lote = [item('a'), item('ruim'), item('c'), item('d'), item('')]
+
+    criadas, rejeitadas = enviar_lote(forms.enviar, lote, 1, erros=(ErroApi,), pular=2)
+
+    assert criadas == 2
+    assert forms.criados == [('c', 1), ('d', 2)]
+    assert [motivo for _, motivo in rejeitadas] == ['título vazio'] # Validação local, sem envio
@@ -0,0 +1,79 @@
+"""Retomada da reprodução de um plano a partir do arquivo de estado."""
+import httplib2
+from googleapiclient.errors import HttpError
+
+from core import Question
+from plano_forms import EstadoReproducao, reproduzir_plano, salvar_plano
+
+
+def test_estado_e_recarregado_do_arquivo(tmp_path):
+    path = str(tmp_path / 'plano.estado.jsonl')
+    estado = EstadoReproducao(path)
+    estado.registrar_criacao(0, 'F1', 'principal')
+    estado.registrar_lote(0, 0)
+    estado.registrar_lote(0, 1, criadas=10)
+    estado.registrar_parcial(0, 2, criadas=3, enviadas=4)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"form": 0, "lote": 3, "cri') # Interrompido no meio da gravação
+
+    retomado = EstadoReproducao(path)
+
+    assert retomado.forms[0]['form_id'] == 'F1'
+    assert retomado.pendentes(0, 4) == [2, 3]
+    assert retomado.itens[0] == 13
+    assert retomado.parciais[(0, 2)] == 4
+
+
+class Execucao:
+    def __init__(self, resultado):
+        self.resultado = resultado
+
+    def execute(self):
+        return self.resultado()
+
+
+class ServicoFalso:
+    """Forms API falsa; com `falhar_em`, o batchUpdate desse lote de itens (1 = primeiro) dá HTTP 503."""
+    def __init__(self, falhar_em=None):
+        self.falhar_em = falhar_em
+        self.criacoes = 0
+        self.lotes_de_itens = [] # Requisições de cada batchUpdate com itens aceito
+
+    def forms(self):
+        return self
+
+    def create(self, body):
+        def criar():
+            self.criacoes += 1
+            return {'formId': 'F1'}
+        return Execucao(criar)
+
+    def batchUpdate(self, formId, body):
+        def enviar():
+            if not any('createItem' in r for r in body['requests']):
+                return {} # Ativação do modo Quiz
+            if len(self.lotes_de_itens) + 1 == self.falhar_em:
+                raise HttpError(httplib2.Response({'status': 503}), b'indisponivel')
+            self.lotes_de_itens.append(body['requests'])
+            return {}
+        return Execucao(enviar)
+
+
+def test_reproducao_retoma_so_o_lote_que_falhou(tmp_path):
+    plan_path = str(tmp_path / 'plano.jsonl')
+    questoes = [Question.from_dict({'Enunciado': f'Questão {n}', 'A': 'sim', 'B': 'não', 'Correta': 'A'})
+                for n in range(1, 16)]
+    salvar_plano(questoes, 'Simulado', plan_path, 100) # Um Forms: Quiz + lotes de 10 e 5 questões
+
+    primeira = reproduzir_plano(plan_path, ServicoFalso(falhar_em=2))
+    assert primeira[0]['falhas'] == 1
+
+    servico = ServicoFalso()
+    segunda = reproduzir_plano(plan_path, servico)
+
+    assert segunda[0]['falhas'] == 0
+    assert segunda[0]['form_id'] == 'F1'
+    assert servico.criacoes == 0 # O Forms criado na primeira reprodução é reaproveitado
+    assert len(servico.lotes_de_itens) == 1
+    indices = [r['createItem']['location']['index'] for r in servico.lotes_de_itens[0]]
+    assert indices == list(range(10, 15)) # Continua após os 10 itens já criados
@@ -0,0 +1,82 @@
+"""
+Ponte thread-safe entre as threads de trabalho e a interface Tkinter.
+
+O Tkinter não é thread-safe: widgets só devem ser tocados pela thread principal.
+As threads de trabalho publicam eventos numa fila e a thread principal drena essa
+fila num ritmo fixo (FRAME_INTERVAL_MS). Atualizações de progresso são coalescidas:
+entre dois quadros, apenas o valor mais recente é aplicado.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+FRAME_INTERVAL_MS = 33 # Intervalo entre drenagens da fila (~30 quadros por segundo)
+
+
+class UIBridge:
+    """
+    Fila de eventos de UI drenada pela thread principal do Tkinter.
+
+    Deve ser criada na thread principal, depois da janela raiz.
+    """
+    def __init__(self, master, interval_ms=FRAME_INTERVAL_MS):
+        self.master = master
+        self.interval_ms = interval_ms
+        self._events = queue.SimpleQueue()
+        self._progress = None # Último (valor, texto) publicado e ainda não aplicado
+        self._progress_lock = threading.Lock()
+        self._progress_handler = None
+        self._main_thread = threading.get_ident()
+        self.master.after(self.interval_ms, self._drain)
+
+    def set_progress_handler(self, handler):
+        """Define a função (executada na thread principal) que aplica (valor, texto) na tela."""
+        self._progress_handler = handler
+
+    def post_progress(self, value, text):
+        """Publica um progresso. Só o último valor publicado antes do próximo quadro é aplicado."""
+        with self._progress_lock:
+            self._progress = (value, text)
+
+    def post(self, callback, *args, **kwargs):
+        """Agenda `callback(*args, **kwargs)` na thread principal, sem esperar o resultado."""
+        self._events.put((callback, args, kwargs, None))
+
+    def call(self, callback, *args, **kwargs):
+        """
+        Executa `callback(*args, **kwargs)` na thread principal e espera o resultado.
+        Útil para diálogos (messagebox, filedialog) disparados por uma thread de trabalho.
+        """
+        if threading.get_ident() == self._main_thread:
+            return callback(*args, **kwargs)
+        future = Future()
+        self._events.put((callback, args, kwargs, future))
+        return future.result()
+
+    def _drain(self):
+        """Aplica o progresso mais recente e executa os eventos pendentes (thread principal)."""
+        try:
+            # O progresso é aplicado antes dos eventos, para que um diálogo modal aberto
+            # em seguida já encontre a barra e o status atualizados
+            with self._progress_lock:
+                progress, self._progress = self._progress, None
+            if progress is not None and self._progress_handler:
+                self._progress_handler(*progress)
+
+            while True:
+                try:
+                    callback, args, kwargs, future = self._events.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    result = callback(*args, **kwargs)
+                except Exception as e:
+                    if future is None:
+                        print(f"⚠️ Erro ao atualizar a interface: {e}")
+                    else:
+                        future.set_exception(e)
+                else:
+                    if future is not None:
+                        future.set_result(result)
+        finally:
+            self.master.after(self.interval_ms, self._drain)